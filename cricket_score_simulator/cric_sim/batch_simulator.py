@@ -0,0 +1,289 @@
+import numpy as np
+from encoding_index import EncodingIndex, load_player_ratings, load_vocabularies, NEW_PLAYER_EXPERIENCE
+from outcome_sampler import sample_outcomes
+
+####################### Feature layout used by the trained models ###############################
+## categorical bits come first (same order as create_train_data.py), numerical features after
+NUMERIC_FEATURES = ["over","curr_score","curr_wickers","current_run_rate","req_run_rate",
+    "batsman_score","balls_faced_batsman","batsman_strike_rate","runs_conceded_by_bowler",
+    "balls_bowled_bowler","wickets_by_bower","bowler_economy",
+    "batsman_prop0","batsman_prop1","batsman_prop2","batsman_prop3",
+    "batsman_prop4","batsman_prop5","batsman_prop6","batsman_prop7",
+    "bowler_prop0","bowler_prop1","bowler_prop2","bowler_prop3","bowler_prop4",
+    "bowler_prop5","bowler_prop6","bowler_prop7","bowler_prop8",
+    "explosivity","running_rating","power_play_rating","end_over_explosivity",
+    "wicket_taking_rating","bowling_consistency_rating"]
+
+## the NN was trained without the props of the (hardly occurring) 5s and 7s
+FEATURE_SETS = {
+    "rf":NUMERIC_FEATURES,
+    "nn":[f for f in NUMERIC_FEATURES if f not in ["batsman_prop5","batsman_prop7",
+                                                  "bowler_prop5","bowler_prop7"]],
+}
+#################################################################################################
+
+BALLS_PER_INNINGS = 120
+
+
+def default_bowling_order(playing11):
+    ### last five of the XI share the 20 overs, nobody bowls more than 4 ###
+    attack = playing11[-5:]
+    return [attack[over_num % len(attack)] for over_num in range(20)]
+
+
+def calc_rate(runs,balls):
+    ## runs per over rounded like calc_runrate/calc_economy_rate in the notebooks, 0 before a ball ##
+    overs = np.maximum(balls,1)/6
+    return np.where(balls > 0,np.round(runs/overs),0)
+
+
+class SimulationResult:
+    """Per match scores of N simulated matches, team 0/1 refer to (team1,team2) of the fixture."""
+
+    def __init__(self,teams,batting_first,first_score,first_wickets,second_score,second_wickets):
+        self.teams = teams
+        self.batting_first = batting_first
+        self.first_score = first_score
+        self.first_wickets = first_wickets
+        self.second_score = second_score
+        self.second_wickets = second_wickets
+
+        ######## -1 for a tie ########
+        self.winner = np.where(second_score > first_score,1 - batting_first,
+                               np.where(second_score < first_score,batting_first,-1))
+
+    def __len__(self):
+        return len(self.winner)
+
+    def team_scores(self,team):
+        ### runs made by a team, whichever innings it batted in ###
+        return np.where(self.batting_first == team,self.first_score,self.second_score)
+
+    def win_probability(self,team):
+        return np.count_nonzero(self.winner == team)/len(self)
+
+    def tie_probability(self):
+        return np.count_nonzero(self.winner == -1)/len(self)
+
+    def score_distribution(self,team,percentiles=(5,25,50,75,95)):
+        scores = self.team_scores(team)
+        return {"mean":scores.mean(),
+                **{"p{}".format(p):v for p,v in zip(percentiles,np.percentile(scores,percentiles))}}
+
+
+class BatchMatchSimulator:
+    """Advance N independent T20 matches ball by ball in lockstep, one model call per ball-step."""
+
+    def __init__(self,team1,team2,playing11_1,playing11_2,venue,predict_proba,outcome_labels,
+                 wicket_label=8,bowling_orders=None,feature_set="rf",min_max=None,index=None,
+                 temperature=1.0,top_k=None,ratings=None,vocab=None):
+
+        self.index = index if index is not None else EncodingIndex.load_or_build()
+        self.ratings = ratings if ratings is not None else load_player_ratings()
+        self.vocab = vocab if vocab is not None else load_vocabularies()
+        self.teams = [team1,team2]
+        self.playing11s = [list(playing11_1),list(playing11_2)]
+        self.predict_proba = predict_proba
+        self.outcome_labels = np.asarray(outcome_labels)
+        self.is_wicket_label = self.outcome_labels == wicket_label
+        self.outcome_runs = np.where(self.is_wicket_label,0,self.outcome_labels).astype(np.int64)
+        self.numeric_features = FEATURE_SETS[feature_set]
+        self.numeric_pos = [NUMERIC_FEATURES.index(f) for f in self.numeric_features]
+        self.min_max = min_max
+        self.temperature = temperature
+        self.top_k = top_k
+
+        if bowling_orders is None:
+            bowling_orders = [default_bowling_order(xi) for xi in self.playing11s]
+        self._build_lookup_tables(venue,bowling_orders)
+
+    def _build_lookup_tables(self,venue,bowling_orders):
+
+        encode = self._encode_batch
+        self.venue_enc = encode("venue",[venue])[0]
+        self.innings_type_enc = list(encode("innings_type",["score_setter","chasing"]))
+        self.super_over_enc = encode("super_over",["No"])[0]
+
+        ######## team level encodings, stacked as [team1,team2] ########
+        self.curr_inn_enc = encode("current_innings",self.teams)
+        self.bowl_team_enc = encode("bowling_team_name",self.teams)
+
+        ######## batting side: one row per XI slot ########
+        self.bat_bits = np.stack([encode("batsman",xi) for xi in self.playing11s])
+        self.non_striker_bits = np.stack([encode("non_striker",xi) for xi in self.playing11s])
+        self.bat_exp = np.stack([self._experience("batting_experience",xi) for xi in self.playing11s])
+        self.bat_stats = np.stack([np.stack([self._ratings("batsman",p) for p in xi])
+                                   for xi in self.playing11s])
+
+        ######## bowling side: one row per bowler in the attack, over -->> attack slot ########
+        attacks = [list(dict.fromkeys(order)) for order in bowling_orders]
+        self.n_attack = max(len(a) for a in attacks)
+        pad = lambda rows: rows + [rows[-1]]*(self.n_attack - len(rows))
+        self.bowl_bits = np.stack([encode("bowler",pad(a)) for a in attacks])
+        self.bowl_exp = np.stack([self._experience("bowler_experience",pad(a)) for a in attacks])
+        self.bowl_stats = np.stack([np.stack(pad([self._ratings("bowler",p) for p in a]))
+                                    for a in attacks])
+        self.over_bowler = np.array([[a.index(p) for p in order] for a,order in zip(attacks,bowling_orders)])
+
+    def _encode_batch(self,table,names):
+        ### saved encoder vocabularies when written (unseen names -->> fallback code), the index otherwise ###
+        if self.vocab is not None and table in self.vocab.columns:
+            return self.vocab.encode_batch(table,names)
+        return np.stack([self.index.lookup(table,name) for name in names])
+
+    def _experience(self,table,players):
+        ### players missing from the index get the bits of a new player's bucket ###
+        if self.vocab is None:
+            return np.stack([self.index.lookup(table,p) for p in players])
+        new = self.vocab.encode(table,NEW_PLAYER_EXPERIENCE)
+        return np.stack([self.index.lookup(table,p) if p in self.index.ids[table] else new for p in players])
+
+    def _ratings(self,side,player):
+        ### standalone ratings table when written and it has the player, the index's copy of the rating columns otherwise ###
+        if self.ratings is not None and self.ratings.has(side,player):
+            return self.ratings.lookup(side,player)
+        return self.index.lookup(side + "_stats",player)
+
+    def _normalise(self,numeric):
+        ### min max scaling as normalise_feature in T20_Simulation, range widened by unseen values ###
+        for j,name in enumerate(self.numeric_features):
+            if name in self.min_max:
+                min_val = np.minimum(self.min_max[name]["min_val"],numeric[:,j])
+                max_val = np.maximum(self.min_max[name]["max_val"],numeric[:,j])
+                span = np.where(max_val > min_val,max_val - min_val,1)
+                numeric[:,j] = (numeric[:,j] - min_val)/span
+        return numeric
+
+    def build_features(self,state,live,innings_number,over_num,ball):
+        """(n_live, n_features) input matrix for every live match at the current ball."""
+
+        over = float(str(over_num)+"."+str(ball))
+        bt = state["bat_team"][live]
+        wt = 1 - bt
+        striker,non_striker = state["striker"][live],state["non_striker"][live]
+        bowler = self.over_bowler[wt,over_num]
+        n = len(live)
+
+        encoded = np.concatenate([
+            np.broadcast_to(self.venue_enc,(n,len(self.venue_enc))),
+            self.curr_inn_enc[bt],self.bowl_team_enc[wt],
+            np.broadcast_to(self.innings_type_enc[innings_number - 1],(n,2)),
+            self.bat_bits[bt,striker],self.bowl_bits[wt,bowler],self.non_striker_bits[bt,non_striker],
+            np.broadcast_to(self.super_over_enc,(n,2)),
+            self.bat_exp[bt,striker],self.bowl_exp[wt,bowler]],axis=1)
+
+        score,wickets,balls = state["score"][live],state["wickets"][live],state["balls"][live]
+        bat_runs,bat_balls = state["bat_runs"][live,striker],state["bat_balls"][live,striker]
+        bowl_runs,bowl_balls = state["bowl_runs"][live,bowler],state["bowl_balls"][live,bowler]
+        bat_div = np.maximum(bat_balls,1)[:,None]
+        bowl_div = np.maximum(bowl_balls,1)[:,None]
+
+        if innings_number == 2:
+            runs_left = np.maximum(state["target"][live] - score,0)
+            req_run_rate = np.round(runs_left/(np.maximum(BALLS_PER_INNINGS - balls,1)/6))
+        else:
+            req_run_rate = np.zeros(n)
+
+        numeric = np.column_stack([
+            np.full(n,over),score,wickets,calc_rate(score,balls),req_run_rate,
+            bat_runs,bat_balls,np.where(bat_balls > 0,bat_runs/np.maximum(bat_balls,1)*100,0),
+            bowl_runs,bowl_balls,state["bowl_wickets"][live,bowler],calc_rate(bowl_runs,bowl_balls),
+            state["bat_counts"][live,striker]/bat_div,
+            state["bowl_counts"][live,bowler]/bowl_div,
+            self.bat_stats[bt,striker],self.bowl_stats[wt,bowler]]).astype(np.float64)
+
+        numeric = numeric[:,self.numeric_pos]
+        if self.min_max is not None:
+            numeric = self._normalise(numeric)
+
+        return np.concatenate([encoded,numeric],axis=1),bowler
+
+    def _new_innings_state(self,bat_team,target=None):
+        n = len(bat_team)
+        return {
+            "bat_team":bat_team,"target":target,
+            "score":np.zeros(n,dtype=np.int64),"wickets":np.zeros(n,dtype=np.int64),
+            "balls":np.zeros(n,dtype=np.int64),
+            "striker":np.zeros(n,dtype=np.int64),"non_striker":np.ones(n,dtype=np.int64),
+            "next_in":np.full(n,2,dtype=np.int64),
+            "bat_runs":np.zeros((n,11),dtype=np.int64),"bat_balls":np.zeros((n,11),dtype=np.int64),
+            "bat_counts":np.zeros((n,11,8),dtype=np.int64),
+            "bowl_runs":np.zeros((n,self.n_attack),dtype=np.int64),
+            "bowl_balls":np.zeros((n,self.n_attack),dtype=np.int64),
+            "bowl_wickets":np.zeros((n,self.n_attack),dtype=np.int64),
+            "bowl_counts":np.zeros((n,self.n_attack,9),dtype=np.int64),
+        }
+
+    def simulate_innings(self,bat_team,innings_number,rng,target=None):
+        """Play one innings for every match, returns the state arrays at the close."""
+
+        state = self._new_innings_state(bat_team,target)
+        done = np.zeros(len(bat_team),dtype=bool)
+
+        for ball_step in range(BALLS_PER_INNINGS):
+            live = np.flatnonzero(~done)
+            if len(live) == 0:
+                break
+            over_num,ball = divmod(ball_step,6)
+
+            features,bowler = self.build_features(state,live,innings_number,over_num,ball + 1)
+            outcome = sample_outcomes(self.predict_proba(features),rng,self.temperature,self.top_k)
+            self._apply_outcomes(state,live,bowler,outcome)
+
+            ######## change of ends at the end of the over ########
+            if ball == 5:
+                state["striker"][live],state["non_striker"][live] = \
+                    state["non_striker"][live],state["striker"][live]
+
+            ######## retire matches whose innings has closed ########
+            finished = state["wickets"][live] >= 10
+            if target is not None:
+                finished |= state["score"][live] > target[live]
+            done[live[finished]] = True
+
+        return state
+
+    def _apply_outcomes(self,state,live,bowler,outcome):
+
+        runs = self.outcome_runs[outcome]
+        is_wicket = self.is_wicket_label[outcome]
+        striker = state["striker"][live]
+
+        state["score"][live] += runs
+        state["balls"][live] += 1
+        state["bat_runs"][live,striker] += runs
+        state["bat_balls"][live,striker] += 1
+        state["bat_counts"][live,striker,np.minimum(runs,7)] += 1
+        state["bowl_runs"][live,bowler] += runs
+        state["bowl_balls"][live,bowler] += 1
+        state["bowl_wickets"][live,bowler] += is_wicket
+        state["bowl_counts"][live,bowler,np.where(is_wicket,8,np.minimum(runs,7))] += 1
+
+        ######## new batsman on strike after a wicket ########
+        out = live[is_wicket]
+        state["wickets"][out] += 1
+        state["striker"][out] = np.minimum(state["next_in"][out],10)
+        state["next_in"][out] += 1
+
+        ######## odd runs rotate the strike ########
+        rotate = live[~is_wicket & (runs % 2 == 1)]
+        state["striker"][rotate],state["non_striker"][rotate] = \
+            state["non_striker"][rotate],state["striker"][rotate]
+
+    def simulate(self,n_matches,rng,batting_first=None):
+        """Simulate n_matches, batting_first gives the team (0/1) batting first in each match."""
+
+        if batting_first is None:
+            batting_first = np.zeros(n_matches,dtype=np.int64)
+        batting_first = np.asarray(batting_first,dtype=np.int64)
+
+        first = self.simulate_innings(batting_first,1,rng)
+        second = self.simulate_innings(1 - batting_first,2,rng,target=first["score"])
+
+        return SimulationResult(self.teams,batting_first,first["score"],first["wickets"],
+                                second["score"],second["wickets"])
+
+
+def simulator_for_random_forest(rf_model,team1,team2,playing11_1,playing11_2,venue,**kwargs):
+    return BatchMatchSimulator(team1,team2,playing11_1,playing11_2,venue,rf_model.predict_proba,
+                               rf_model.classes_,wicket_label=8,feature_set="rf",**kwargs)
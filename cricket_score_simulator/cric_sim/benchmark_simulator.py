@@ -0,0 +1,357 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import numpy as np
+import batch_simulator
+from batch_simulator import BALLS_PER_INNINGS, FEATURE_SETS, NUMERIC_FEATURES, default_bowling_order
+from outcome_sampler import sample_outcomes, NN_OUTCOMES
+
+##### machine readable results, one file per run #####
+RESULTS_DIR = "/home/shivargha/cricket_analytics/cricket_score_simulator/benchmark_results/"
+MIN_MAX_PATH = "min_max.json"
+
+####################### Reproducible fixtures ###############################
+## same dict layout as parallel_simulation's fixtures; playing11s left out are the first 11 names
+## of the team's squad in the encoding index (sorted), so a fixture only depends on the index
+FIXTURES = [
+    {"name":"india_v_australia","team1":"India","team2":"Australia","venue":"Melbourne","seed":2023},
+    {"name":"england_v_pakistan","team1":"England","team2":"Pakistan","venue":"Lahore","seed":7},
+]
+
+##### per ball paths: rf/rf2 -->> inference_random_forest/inference_rf2, nn/nn2 -->> model_inference/model_inference2 #####
+PATHS = ["rf","rf2","nn","nn2"]
+BATCH_SIZES = [1,64,1024]
+PHASES = ["encoding","assembly","model","sampling"]
+#############################################################################
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+
+class PhaseTimer:
+    """Per ball seconds of each phase, and the per ball totals."""
+
+    def __init__(self):
+        self.phases = {phase:[] for phase in PHASES}
+
+    def add(self,encoding,assembly,model,sampling):
+        for phase,seconds in zip(PHASES,(encoding,assembly,model,sampling)):
+            self.phases[phase].append(seconds)
+
+    def summary(self,wall_seconds,n_matches):
+        phases = {phase:np.asarray(seconds) for phase,seconds in self.phases.items()}
+        total = sum(phases.values())
+        n_balls = len(total)
+        return {
+            "balls":n_balls,"matches":n_matches,"wall_s":wall_seconds,
+            "balls_per_s":n_balls/wall_seconds,"matches_per_s":n_matches/wall_seconds,
+            "ball_p50_ms":float(np.percentile(total,50)*1e3),"ball_p99_ms":float(np.percentile(total,99)*1e3),
+            "phase_mean_ms":{phase:float(seconds.mean()*1e3) for phase,seconds in phases.items()},
+            "phase_share":{phase:float(seconds.sum()/total.sum()) for phase,seconds in phases.items()},
+        }
+
+
+def resolve_fixture(fixture,index):
+    fixture = dict(fixture)
+    for i,team in ((1,fixture["team1"]),(2,fixture["team2"])):
+        key = "playing11_{}".format(i)
+        if key not in fixture:
+            fixture[key] = sorted(index.players(team))[:11]
+    return fixture
+
+
+def load_min_max(path=MIN_MAX_PATH):
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+######################## Per ball path (frontend / notebook) ###############################
+## one match at a time, one model call per ball: encodings are looked up through
+## get_categorical_encodings, the input row is assembled, the model predicts and (for the *2
+## functions) an outcome is sampled. inference_rf2/model_inference2 are timed as their two steps.
+
+def encode_ball(gce,venue,bat_team,bowl_team,innings_number,striker,non_striker,bowler):
+
+    return (gce.get_venue_encodings(venue),gce.get_current_innings_encodings(bat_team),
+            gce.get_bowling_innings_encodings(bowl_team),gce.get_innings_type_encoding(innings_number),
+            gce.get_batsman_encodings(striker),gce.get_bowler_encodings(bowler),
+            gce.get_non_striker_encodings(non_striker),gce.get_super_over_encodings("No"),
+            gce.get_batting_experience(striker),gce.get_bowler_experience(bowler)), \
+        gce.get_batsman_stats(striker) + gce.get_bowler_stats(bowler)
+
+
+def assemble_ball(encodings,ratings,state,innings_number,over_num,ball,striker,bowler,numeric_pos,min_max,names):
+
+    over = float(str(over_num)+"."+str(ball))
+    score,wickets,balls = state["score"],state["wickets"],state["balls"]
+    bat_runs,bat_balls = state["bat_runs"][striker],state["bat_balls"][striker]
+    bowl_runs,bowl_balls = state["bowl_runs"].get(bowler,0),state["bowl_balls"].get(bowler,0)
+    rate = lambda runs,n: round(runs/(n/6)) if n > 0 else 0
+    req_run_rate = 0
+    if innings_number == 2:
+        req_run_rate = round(max(state["target"] - score,0)/(max(BALLS_PER_INNINGS - balls,1)/6))
+
+    numeric = np.array([over,score,wickets,rate(score,balls),req_run_rate,
+        bat_runs,bat_balls,bat_runs/bat_balls*100 if bat_balls > 0 else 0,
+        bowl_runs,bowl_balls,state["bowl_wickets"].get(bowler,0),rate(bowl_runs,bowl_balls)]
+        + list(state["bat_counts"][striker]/max(bat_balls,1))
+        + list(state["bowl_counts"].get(bowler,np.zeros(9))/max(bowl_balls,1)) + list(ratings),dtype=np.float64)[numeric_pos]
+    if min_max is not None:
+        for j,name in enumerate(names):
+            if name in min_max:
+                lo,hi = min_max[name]["min_val"],min_max[name]["max_val"]
+                numeric[j] = (numeric[j] - lo)/(hi - lo if hi > lo else 1)
+    return np.concatenate(encodings + (numeric,)).reshape(1,-1)
+
+
+def _new_state(xi_size=11,target=None):
+    return {"score":0,"wickets":0,"balls":0,"striker":0,"non_striker":1,"next_in":2,"target":target,
+            "bat_runs":[0]*xi_size,"bat_balls":[0]*xi_size,"bat_counts":np.zeros((xi_size,8)),
+            "bowl_runs":{},"bowl_balls":{},"bowl_wickets":{},"bowl_counts":{}}
+
+
+def _apply(state,runs,is_wicket,bowler):
+
+    striker = state["striker"]
+    for table in ("bowl_runs","bowl_balls","bowl_wickets"):
+        state[table].setdefault(bowler,0)
+    state["bowl_counts"].setdefault(bowler,np.zeros(9))
+    state["score"] += runs
+    state["balls"] += 1
+    state["bat_runs"][striker] += runs
+    state["bat_balls"][striker] += 1
+    state["bat_counts"][striker,min(runs,7)] += 1
+    state["bowl_runs"][bowler] += runs
+    state["bowl_balls"][bowler] += 1
+    state["bowl_wickets"][bowler] += is_wicket
+    state["bowl_counts"][bowler][8 if is_wicket else min(runs,7)] += 1
+    if is_wicket:
+        state["wickets"] += 1
+        state["striker"] = min(state["next_in"],10)
+        state["next_in"] += 1
+    elif runs % 2 == 1:
+        state["striker"],state["non_striker"] = state["non_striker"],state["striker"]
+
+
+def model_step(path):
+    """ball(x, rng) -->> (outcome label, model seconds, sampling seconds) for one inference path."""
+
+    import model_inference
+    if path in ("rf","rf2"):
+        predict,predict_proba = model_inference.inference_random_forest,None
+        if path == "rf2":
+            model = model_inference.get_forest()
+            predict_proba,labels = model.predict_proba,model.classes_
+    else:
+        import inference_nn
+        predict,predict_proba = inference_nn.model_inference,None
+        if path == "nn2":
+            network = inference_nn.get_network()
+            predict_proba,labels = lambda x: network.predict(x,verbose=0),NN_OUTCOMES
+
+    def ball(x,rng):
+        start = time.perf_counter()
+        if predict_proba is None:
+            outcome = np.ravel(predict(x))[0]
+            return int(outcome),time.perf_counter() - start,0.0
+        proba = predict_proba(x)
+        model_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        outcome = sample_outcomes(proba,rng,labels=labels)[0]
+        return int(outcome),model_seconds,time.perf_counter() - start
+    return ball
+
+
+def run_per_ball(fixture,path,n_matches,min_max=None):
+    """Play n_matches of the fixture ball by ball through one inference path."""
+
+    import get_categorical_encodings as gce
+
+    feature_set = "nn" if path.startswith("nn") else "rf"
+    names = FEATURE_SETS[feature_set]
+    numeric_pos = [NUMERIC_FEATURES.index(f) for f in names]
+    min_max = min_max if feature_set == "nn" else None
+    ##### labels of each path: the forest predicts 8 for a wicket, the network 5 (and 6 for a six) #####
+    wicket = 5 if feature_set == "nn" else 8
+
+    step = model_step(path)
+    rng = np.random.default_rng(fixture["seed"])
+    teams = [fixture["team1"],fixture["team2"]]
+    xis = [fixture["playing11_1"],fixture["playing11_2"]]
+    orders = fixture.get("bowling_orders") or [default_bowling_order(xi) for xi in xis]
+    timer = PhaseTimer()
+    wall = time.perf_counter()
+    for _ in range(n_matches):
+        target = None
+        for innings_number,bat in ((1,0),(2,1)):
+            bowl = 1 - bat
+            state = _new_state(target=target)
+            for ball_step in range(BALLS_PER_INNINGS):
+                if state["wickets"] >= 10 or (target is not None and state["score"] > target):
+                    break
+                over_num,ball = divmod(ball_step,6)
+                striker,non_striker = xis[bat][state["striker"]],xis[bat][state["non_striker"]]
+                bowler = orders[bowl][over_num]
+
+                t0 = time.perf_counter()
+                encodings,ratings = encode_ball(gce,fixture["venue"],teams[bat],teams[bowl],innings_number,
+                                                striker,non_striker,bowler)
+                t1 = time.perf_counter()
+                x = assemble_ball(encodings,ratings,state,innings_number,over_num,ball + 1,state["striker"],
+                                  bowler,numeric_pos,min_max,names)
+                t2 = time.perf_counter()
+                outcome,model_seconds,sampling_seconds = step(x,rng)
+                timer.add(t1 - t0,t2 - t1,model_seconds,sampling_seconds)
+
+                _apply(state,0 if outcome == wicket else outcome,outcome == wicket,bowler)
+                if ball == 5:
+                    state["striker"],state["non_striker"] = state["non_striker"],state["striker"]
+            target = state["score"]
+    return timer.summary(time.perf_counter() - wall,n_matches)
+
+
+######################## Batch engine (BatchMatchSimulator) ###############################
+
+def run_batch(fixture,n_matches,index):
+    """Throughput of the lockstep engine with the forest: n_matches advanced together, phases
+    timed by wrapping the feature builder, the model and the sampler of one simulator."""
+
+    from model_inference import get_forest
+
+    model = get_forest()
+    timer = {phase:0.0 for phase in PHASES}
+
+    start = time.perf_counter()
+    simulator = batch_simulator.simulator_for_random_forest(model,fixture["team1"],fixture["team2"],
+        fixture["playing11_1"],fixture["playing11_2"],fixture["venue"],
+        bowling_orders=fixture.get("bowling_orders"),index=index)
+    timer["encoding"] = time.perf_counter() - start
+
+    def timed(phase,function):
+        def wrapper(*args,**kwargs):
+            start = time.perf_counter()
+            result = function(*args,**kwargs)
+            timer[phase] += time.perf_counter() - start
+            return result
+        return wrapper
+
+    simulator.build_features = timed("assembly",simulator.build_features)
+    simulator.predict_proba = timed("model",simulator.predict_proba)
+    sampler = batch_simulator.sample_outcomes
+    batch_simulator.sample_outcomes = timed("sampling",sampler)
+    steps = []
+    try:
+        rng = np.random.default_rng(fixture["seed"])
+        wall = time.perf_counter()
+        original_apply = simulator._apply_outcomes
+        def count_step(state,live,bowler,outcome):
+            steps.append(len(live))
+            return original_apply(state,live,bowler,outcome)
+        simulator._apply_outcomes = count_step
+        simulator.simulate(n_matches,rng,batting_first=rng.integers(0,2,n_matches))
+        wall = time.perf_counter() - wall
+    finally:
+        batch_simulator.sample_outcomes = sampler
+
+    n_balls = int(np.sum(steps))
+    return {"balls":n_balls,"matches":n_matches,"ball_steps":len(steps),"wall_s":wall,
+            "balls_per_s":n_balls/wall,"matches_per_s":n_matches/wall,
+            "step_mean_ms":wall/len(steps)*1e3,
+            "phase_total_ms":{phase:seconds*1e3 for phase,seconds in timer.items()}}
+
+
+def cold_start():
+    """Seconds to import the lookups (index, vocabularies, ratings) and to load the forest."""
+
+    start = time.perf_counter()
+    import get_categorical_encodings
+    import model_inference
+    imported = time.perf_counter()
+    model_inference.get_forest()
+    loaded = time.perf_counter()
+    return {"import_s":imported - start,"forest_load_s":loaded - imported}
+
+
+def run(fixtures=FIXTURES,paths=PATHS,n_matches=3,batch_sizes=BATCH_SIZES,min_max_path=MIN_MAX_PATH):
+    """Every fixture through every path; a path whose model (or name) is missing is recorded as an error."""
+
+    results = {"meta":{"time":time.strftime("%Y-%m-%dT%H:%M:%S"),"python":platform.python_version(),
+                       "numpy":np.__version__,"machine":platform.machine(),"cpus":os.cpu_count()},
+               "cold_start":cold_start(),"runs":[]}
+    import get_categorical_encodings as gce
+    min_max = load_min_max(min_max_path)
+
+    for fixture in fixtures:
+        fixture = resolve_fixture(fixture,gce.index)
+        for path in paths:
+            record = {"fixture":fixture["name"],"engine":"per_ball","path":path}
+            try:
+                record.update(run_per_ball(fixture,path,n_matches,min_max))
+            except Exception as e:
+                record["error"] = repr(e)
+            results["runs"].append(record)
+        for batch_size in batch_sizes:
+            record = {"fixture":fixture["name"],"engine":"batch","path":"rf2","batch":batch_size}
+            try:
+                record.update(run_batch(fixture,batch_size,gce.index))
+            except Exception as e:
+                record["error"] = repr(e)
+            results["runs"].append(record)
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def save_results(results,results_dir=RESULTS_DIR):
+    os.makedirs(results_dir,exist_ok=True)
+    path = os.path.join(results_dir,"bench_{}.json".format(results["meta"]["time"].replace(":","")))
+    with open(path,"w") as f:
+        json.dump(results,f,indent=1)
+    return path
+
+
+def print_results(results,baseline=None):
+    """One line per run; with a baseline run, the balls/sec ratio of the matching run."""
+
+    previous = {}
+    for record in (baseline or {}).get("runs",[]):
+        previous[(record["fixture"],record["engine"],record["path"],record.get("batch"))] = record
+    print("cold start:",{k:round(v,3) for k,v in results["cold_start"].items()},
+          "peak RSS {:.1f} MB".format(results["peak_rss_mb"]))
+    for record in results["runs"]:
+        name = "{fixture} {engine} {path}".format(**record) + (" x{}".format(record["batch"]) if "batch" in record else "")
+        if "error" in record:
+            print(name,"skipped:",record["error"])
+            continue
+        line = "{}: {:.0f} balls/s, {:.2f} matches/s".format(name,record["balls_per_s"],record["matches_per_s"])
+        if "ball_p50_ms" in record:
+            line += ", ball p50 {:.3f} ms p99 {:.3f} ms, phases {}".format(
+                record["ball_p50_ms"],record["ball_p99_ms"],
+                {phase:round(share,3) for phase,share in record["phase_share"].items()})
+        old = previous.get((record["fixture"],record["engine"],record["path"],record.get("batch")))
+        if old is not None and "balls_per_s" in old:
+            line += ", x{:.2f} vs baseline".format(record["balls_per_s"]/old["balls_per_s"])
+        print(line)
+
+
+if __name__ == "__main__":
+
+    ####### python benchmark_simulator.py [--matches=N] [--paths=rf,rf2] [--fixtures=file.json] [--baseline=file.json] #######
+    options = dict(a[2:].split("=") for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    fixtures = FIXTURES
+    if "fixtures" in options:
+        with open(options["fixtures"]) as f:
+            fixtures = json.load(f)
+    baseline = None
+    if "baseline" in options:
+        with open(options["baseline"]) as f:
+            baseline = json.load(f)
+    results = run(fixtures,options["paths"].split(",") if "paths" in options else PATHS,int(options.get("matches",3)))
+    print_results(results,baseline)
+    print("Results written to",save_results(results))
@@ -0,0 +1,303 @@
+import os
+import numpy as np
+import pandas as pd
+
+##### Default locations of the training frame and the compact index built from it #####
+ENCODINGS_CSV = "/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/categories_with_encoding.csv"
+ENCODING_INDEX_PATH = "/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/categories_index.npz"
+##### per player ratings written by modeling/player_ratings.py #####
+RATINGS_PATH = "/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/player_ratings.npz"
+##### versioned binary encoder vocabularies written by modeling/create_train_data.py #####
+VOCAB_DIR = "/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/vocabularies/"
+VOCAB_FILE = "vocab_v{:03d}.npz"
+
+##### code of names the encoders never saw: all bits 0, what BinaryEncoder gives unknown values #####
+UNSEEN_CODE = 0
+##### experience bucket of players missing from the index (fewer than 10 matches) #####
+NEW_PLAYER_EXPERIENCE = "Low"
+
+OUTCOME_LABELS = [0,1,2,3,4,6,8]
+
+def _bits(prefix,n_bits):
+    return ["{}_{}".format(prefix,i) for i in range(n_bits)]
+
+####################### Lookup tables held in the index ###############################
+## table name -->> (key column, value columns, dtype)
+## one row per distinct key, first occurrence in the training frame wins (same as .iloc[0])
+INDEX_TABLES = {
+    "venue":("venue",_bits("venue",8),np.uint8),
+    "innings_type":("innings_type",_bits("innings_type",2),np.uint8),
+    "current_innings":("current_innings",_bits("current_innings",7),np.uint8),
+    "bowling_team_name":("bowling_team_name",_bits("bowling_team_name",7),np.uint8),
+    "batsman":("batsman",_bits("batsman",12),np.uint8),
+    "bowler":("bowler",_bits("bowler",11),np.uint8),
+    "non_striker":("non_striker",_bits("non_striker",12),np.uint8),
+    "super_over":("super_over",_bits("super_over",2),np.uint8),
+    "batting_experience":("batsman",_bits("batting_experience",2),np.uint8),
+    "bowler_experience":("bowler",_bits("bowler_experience",2),np.uint8),
+    "out_batsman":("out_batsman",_bits("out_batsman",12),np.uint8),
+    "batsman_stats":("batsman",["explosivity","running_rating",
+                                "power_play_rating","end_over_explosivity"],np.float64),
+    "bowler_stats":("bowler",["wicket_taking_rating","bowling_consistency_rating"],np.float64),
+}
+#########################################################################################
+
+
+def _index_columns():
+
+    columns = ["outcome"]
+    for key_col,value_cols,_ in INDEX_TABLES.values():
+        for col in [key_col] + value_cols:
+            if col not in columns:
+                columns.append(col)
+    return columns
+
+
+def build_encoding_index(csv_path=ENCODINGS_CSV,out_path=ENCODING_INDEX_PATH,chunksize=500000):
+    """Distil the training frame into one row per entity and save it as a .npz."""
+
+    first_rows = {name:[] for name in INDEX_TABLES}
+    squads = []
+    outcome_counts = np.zeros(len(OUTCOME_LABELS),dtype=np.int64)
+    n_rows = 0
+
+    ###### typed parquet copy (modeling/columnar_store.py) is preferred over the CSV ######
+    parquet_path = os.path.splitext(str(csv_path))[0] + ".parquet"
+    if os.path.exists(parquet_path):
+        chunks = [pd.read_parquet(parquet_path,columns=_index_columns())]
+    else:
+        chunks = pd.read_csv(csv_path,usecols=_index_columns(),chunksize=chunksize)
+
+    ######## stream the frame, keeping only the first row seen for every key ########
+    for chunk in chunks:
+        for name,(key_col,value_cols,_) in INDEX_TABLES.items():
+            first_rows[name].append(chunk[[key_col] + value_cols].drop_duplicates(subset=key_col))
+
+        squads.append(pd.DataFrame({"team":chunk["current_innings"],"player":chunk["batsman"]}).drop_duplicates())
+        squads.append(pd.DataFrame({"team":chunk["bowling_team_name"],"player":chunk["bowler"]}).drop_duplicates())
+
+        outcomes = chunk["outcome"].values
+        for i,label in enumerate(OUTCOME_LABELS):
+            outcome_counts[i] += np.count_nonzero(outcomes == label)
+        n_rows += len(chunk)
+
+    arrays = {}
+    for name,(key_col,value_cols,dtype) in INDEX_TABLES.items():
+        table = pd.concat(first_rows[name]).drop_duplicates(subset=key_col)
+        table = table[table[key_col].notna()]
+        arrays[name + "__keys"] = table[key_col].to_numpy(dtype=str)
+        arrays[name + "__values"] = table[value_cols].values.astype(dtype)
+
+    squads = pd.concat(squads).dropna().drop_duplicates()
+    arrays["squads__team"] = squads["team"].to_numpy(dtype=str)
+    arrays["squads__player"] = squads["player"].to_numpy(dtype=str)
+    arrays["outcome_counts"] = outcome_counts
+    arrays["n_rows"] = np.array(n_rows)
+
+    np.savez(out_path,**arrays)
+    return out_path
+
+
+class EncodingIndex:
+    """Constant time name -->> encoding lookups over the distilled training frame."""
+
+    def __init__(self,arrays):
+
+        self.keys = {}
+        self.ids = {}
+        self.values = {}
+        for name in INDEX_TABLES:
+            keys = np.asarray(arrays[name + "__keys"]).astype(str)
+            values = np.asarray(arrays[name + "__values"])
+            values.setflags(write=False)
+            self.keys[name] = keys
+            self.ids[name] = {key:i for i,key in enumerate(keys)}
+            self.values[name] = values
+
+        self.squads = {}
+        for team,player in zip(np.asarray(arrays["squads__team"]).astype(str),
+                               np.asarray(arrays["squads__player"]).astype(str)):
+            self.squads.setdefault(team,[]).append(player)
+
+        self.outcome_counts = np.asarray(arrays["outcome_counts"])
+        self.n_rows = int(arrays["n_rows"])
+
+    @classmethod
+    def load(cls,path=ENCODING_INDEX_PATH):
+        with np.load(path,allow_pickle=False) as arrays:
+            return cls({name:arrays[name] for name in arrays.files})
+
+    @classmethod
+    def load_or_build(cls,path=ENCODING_INDEX_PATH,csv_path=ENCODINGS_CSV):
+        if not os.path.exists(path):
+            build_encoding_index(csv_path,path)
+        return cls.load(path)
+
+    def get_id(self,table,key):
+        return self.ids[table][key]
+
+    def lookup(self,table,key):
+        return self.values[table][self.ids[table][key]]
+
+    def lookup_ids(self,table,ids):
+        return self.values[table][ids]
+
+    def names(self,table):
+        return list(self.keys[table])
+
+    def teams(self):
+        return list(set(self.names("current_innings")) | set(self.names("bowling_team_name")))
+
+    def players(self,team):
+        return list(set(self.squads.get(team,[])))
+
+    def outcome_probabilities(self):
+        return list(self.outcome_counts/self.n_rows)
+
+
+class PlayerRatings:
+    """Batsman / bowler rating rows of the standalone ratings table, same lookups as EncodingIndex."""
+
+    def __init__(self,arrays):
+
+        self.ids = {}
+        self.values = {}
+        self.columns = {}
+        for side in ["batsman","bowler"]:
+            keys = np.asarray(arrays[side + "__keys"]).astype(str)
+            self.ids[side] = {key:i for i,key in enumerate(keys)}
+            self.values[side] = np.asarray(arrays[side + "__values"])
+            self.columns[side] = list(np.asarray(arrays[side + "__columns"]).astype(str))
+
+    @classmethod
+    def load(cls,path=RATINGS_PATH):
+        with np.load(path,allow_pickle=False) as arrays:
+            return cls({name:arrays[name] for name in arrays.files})
+
+    def has(self,side,player):
+        return player in self.ids[side]
+
+    def lookup(self,side,player):
+        return self.values[side][self.ids[side][player]]
+
+
+def load_player_ratings(path=RATINGS_PATH):
+    """PlayerRatings of the ratings table, None when it has not been written."""
+    return PlayerRatings.load(path) if os.path.exists(path) else None
+
+
+def vocabulary_versions(vocab_dir=VOCAB_DIR):
+    if not os.path.isdir(vocab_dir):
+        return []
+    versions = []
+    for name in os.listdir(vocab_dir):
+        if name.startswith("vocab_v") and name.endswith(".npz"):
+            versions.append(int(name[len("vocab_v"):-len(".npz")]))
+    return sorted(versions)
+
+
+def vocabulary_path(version,vocab_dir=VOCAB_DIR):
+    return os.path.join(vocab_dir,VOCAB_FILE.format(version))
+
+
+class Vocabularies:
+    """Fitted binary encoders of the training frame: column -->> names in code order and bit width.
+
+    A name's code is its BinaryEncoder ordinal (1, 2, ... in order of appearance) written as n_bits
+    binary digits, most significant first. Names outside the vocabulary get UNSEEN_CODE.
+    """
+
+    def __init__(self,arrays):
+
+        self.version = int(arrays["version"])
+        self.keys = {}
+        self.positions = {}
+        self.n_bits = {}
+        for name in arrays:
+            if name.endswith("__keys"):
+                column = name[:-len("__keys")]
+                self.n_bits[column] = int(arrays[column + "__n_bits"])
+                self._set_keys(column,np.asarray(arrays[name]).astype(str))
+
+    def _set_keys(self,column,keys):
+        self.keys[column] = keys
+        self.positions[column] = pd.Index(keys)
+
+    @classmethod
+    def load(cls,path):
+        with np.load(path,allow_pickle=False) as arrays:
+            return cls({name:arrays[name] for name in arrays.files})
+
+    @classmethod
+    def from_columns(cls,keys,n_bits):
+        """Unsaved vocabularies of fitted encoders: column -->> names in code order, column -->> bit width."""
+
+        vocab = cls({"version":np.array(0)})
+        for column in keys:
+            vocab.n_bits[column] = int(n_bits[column])
+            vocab._set_keys(column,np.array(keys[column],dtype=str))
+        return vocab
+
+    @property
+    def columns(self):
+        return list(self.keys)
+
+    def capacity(self,column):
+        ### codes that fit in the column's bits, 0 excluded ###
+        return 2**self.n_bits[column] - 1
+
+    def codes(self,column,names):
+        ids = self.positions[column].get_indexer(np.asarray(names,dtype=object).astype(str))
+        return np.where(ids < 0,UNSEEN_CODE,ids + 1)
+
+    def encode_batch(self,column,names):
+        """(len(names), n_bits) uint8 bit matrix of many names at once."""
+
+        shifts = np.arange(self.n_bits[column] - 1,-1,-1)
+        return ((self.codes(column,names)[:,None] >> shifts) & 1).astype(np.uint8)
+
+    def encode(self,column,name):
+        return self.encode_batch(column,[name])[0]
+
+    def unseen(self,column,names):
+        names = np.asarray(names,dtype=object).astype(str)
+        return names[self.positions[column].get_indexer(names) < 0].tolist()
+
+    def extend(self,column,names):
+        """Give new names the next free codes, as far as the column's bits allow.
+
+        Codes already handed out never move, so the trained models keep working. Returns the names
+        added; the ones beyond capacity stay unseen until the encoders are refitted.
+        """
+
+        new = list(dict.fromkeys(self.unseen(column,names)))
+        added = new[:max(self.capacity(column) - len(self.keys[column]),0)]
+        if added:
+            self._set_keys(column,np.concatenate([self.keys[column],np.array(added,dtype=str)]))
+        return added
+
+    def save(self,vocab_dir=VOCAB_DIR):
+        """Write the vocabularies as the next version, returns its path."""
+
+        os.makedirs(vocab_dir,exist_ok=True)
+        self.version = max(vocabulary_versions(vocab_dir),default=0) + 1
+        arrays = {"version":np.array(self.version)}
+        for column in self.keys:
+            arrays[column + "__keys"] = self.keys[column]
+            arrays[column + "__n_bits"] = np.array(self.n_bits[column])
+        path = vocabulary_path(self.version,vocab_dir)
+        np.savez(path,**arrays)
+        return path
+
+
+def load_vocabularies(vocab_dir=VOCAB_DIR,version=None):
+    """Vocabularies of a version (default: the latest), None when none has been written."""
+
+    versions = vocabulary_versions(vocab_dir)
+    if not versions:
+        return None
+    return Vocabularies.load(vocabulary_path(version or versions[-1],vocab_dir))
+
+
+if __name__ == "__main__":
+    print("Encoding index written to",build_encoding_index())
@@ -0,0 +1,175 @@
+import os
+import sys
+import shutil
+import numpy as np
+
+#### rows x trees handled per chunk when gathering leaf distributions ####
+GATHER_BLOCK = 1 << 20
+#### one raw .npy file per array inside the export directory ####
+ARRAY_NAMES = ("roots","feature","threshold","children","is_leaf","value","classes","n_features")
+
+
+class FlatForest:
+    """A fitted RandomForestClassifier flattened into contiguous node arrays.
+
+    All trees live in one set of arrays, children index into the same arrays and
+    leaves point to themselves. predict/predict_proba/classes_ mirror sklearn.
+    """
+
+    def __init__(self,roots,feature,threshold,children,is_leaf,value,classes,n_features):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.is_leaf = is_leaf
+        self.value = value
+        self.classes_ = classes
+        self.n_classes_ = len(classes)
+        self.n_features_in_ = n_features
+
+    @classmethod
+    def from_sklearn(cls,rf_model):
+
+        roots,features,thresholds,children,leaves,values = [],[],[],[],[],[]
+        offset = 0
+        for estimator in rf_model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            leaf = tree.children_left == -1
+            own = np.arange(offset,offset + n_nodes)
+
+            ###### leaves loop back on themselves, so extra traversal steps are no-ops ######
+            left = np.where(leaf,own,tree.children_left + offset)
+            right = np.where(leaf,own,tree.children_right + offset)
+
+            ###### per tree class distribution at each node, as tree.predict_proba ######
+            value = tree.value[:,0,:]
+            value = value/np.maximum(value.sum(axis=1,keepdims=True),np.finfo(np.float64).tiny)
+
+            roots.append(offset)
+            features.append(np.where(leaf,0,tree.feature))
+            thresholds.append(tree.threshold)
+            children.append(np.column_stack([left,right]))
+            leaves.append(leaf)
+            values.append(value)
+            offset += n_nodes
+
+        return cls(np.array(roots,dtype=np.intp),
+                   np.ascontiguousarray(np.concatenate(features),dtype=np.intp),
+                   np.ascontiguousarray(np.concatenate(thresholds),dtype=np.float64),
+                   np.ascontiguousarray(np.concatenate(children),dtype=np.intp),
+                   np.concatenate(leaves),
+                   np.ascontiguousarray(np.concatenate(values),dtype=np.float64),
+                   np.asarray(rf_model.classes_),rf_model.n_features_in_)
+
+    @classmethod
+    def load(cls,path):
+        """Node arrays memory mapped read only, every process loading path shares their pages."""
+
+        arrays = {name:np.load(os.path.join(path,name + ".npy"),mmap_mode="r",allow_pickle=False)
+                  for name in ARRAY_NAMES}
+        return cls(arrays["roots"],arrays["feature"],arrays["threshold"],arrays["children"],arrays["is_leaf"],
+                   arrays["value"],np.array(arrays["classes"]),int(arrays["n_features"]))
+
+    def save(self,path):
+        ### plain arrays, the files do not depend on the module the class was pickled from ###
+        arrays = {"roots":self.roots,"feature":self.feature,"threshold":self.threshold,"children":self.children,
+                  "is_leaf":self.is_leaf,"value":self.value,"classes":self.classes_,
+                  "n_features":np.array(self.n_features_in_)}
+        staging = path + ".tmp"
+        shutil.rmtree(staging,ignore_errors=True)
+        os.makedirs(staging)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(staging,name + ".npy"),arrays[name])
+
+        ###### swapped in whole, processes still mapping the old files keep reading them ######
+        if os.path.exists(path):
+            replaced = path + ".old"
+            shutil.rmtree(replaced,ignore_errors=True)
+            os.rename(path,replaced)
+            os.rename(staging,path)
+            shutil.rmtree(replaced)
+        else:
+            os.rename(staging,path)
+
+    def apply(self,X):
+        """Leaf reached in every tree, shape (n_rows, n_trees)."""
+
+        ###### sklearn compares float32 inputs against the float64 thresholds ######
+        X = np.asarray(X,dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1,-1)
+        if len(X) == 1:
+            return self._apply_row(X[0]).reshape(1,-1)
+
+        n_rows,n_trees = len(X),len(self.roots)
+        flat_X = X.ravel()
+        flat_children = self.children.ravel()
+
+        ###### tree-major (tree, row) pairs, only pairs still inside a tree are advanced ######
+        node = np.repeat(self.roots,n_rows)
+        pos = np.flatnonzero(~self.is_leaf[node])
+        current = node[pos]
+        row_start = np.tile(np.arange(n_rows)*X.shape[1],n_trees)[pos]
+
+        while pos.size:
+            go_right = flat_X[row_start + self.feature[current]] > self.threshold[current]
+            current = flat_children[2*current + go_right]
+            leaf = self.is_leaf[current]
+            if leaf.any():
+                node[pos[leaf]] = current[leaf]
+                keep = ~leaf
+                pos,current,row_start = pos[keep],current[keep],row_start[keep]
+
+        return node.reshape(n_trees,n_rows).T
+
+    def _apply_row(self,x):
+
+        ###### single row (one ball of a simulation): one vector of nodes across all trees ######
+        node = self.roots.copy()
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            current = node[active]
+            go_right = x[self.feature[current]] > self.threshold[current]
+            current = self.children[current,go_right.view(np.int8)]
+            node[active] = current
+            active = active[~self.is_leaf[current]]
+        return node
+
+    def predict_proba(self,X):
+
+        leaves = self.apply(X)
+        n_rows,n_trees = leaves.shape
+        proba = np.empty((n_rows,self.n_classes_),dtype=np.float64)
+        step = max(1,GATHER_BLOCK//max(n_trees*self.n_classes_,1))
+        for start in range(0,n_rows,step):
+            proba[start:start + step] = self.value[leaves[start:start + step]].mean(axis=1)
+        return proba
+
+    def predict(self,X):
+        return self.classes_[np.argmax(self.predict_proba(X),axis=1)]
+
+
+def export_forest(rf_model,out_path):
+    """Flatten a fitted forest and save its arrays to the out_path directory (FlatForest.load maps them)."""
+
+    flat = FlatForest.from_sklearn(rf_model)
+    flat.save(out_path)
+    return flat
+
+
+def max_proba_difference(rf_model,flat,X):
+    return np.abs(rf_model.predict_proba(X) - flat.predict_proba(X)).max()
+
+
+if __name__ == "__main__":
+    from model_registry import registry
+
+    ####### python forest_export.py [version] -->> flat_rf_model_v{version}/ #######
+    version = registry.resolve_version("random_forest",sys.argv[1] if len(sys.argv) > 1 else None)
+    rf_model = registry.get("random_forest",version)
+    out_path = registry.path("random_forest_flat",version)
+    flat = export_forest(rf_model,out_path)
+
+    X_check = np.random.default_rng(0).random((256,rf_model.n_features_in_))
+    print("Exported",out_path,"max |proba diff| vs sklearn:",max_proba_difference(rf_model,flat,X_check))
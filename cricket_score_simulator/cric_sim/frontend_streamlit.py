@@ -2,8 +2,17 @@ import streamlit as st
 import random
 from get_categorical_encodings import *
 from model_inference import *
+from model_registry import registry
 st.title("T20 Internationals Simulator App")
 
+###### Model version served by the registry, switching it needs no restart ######
+rf_versions = registry.versions("random_forest")
+if len(rf_versions) > 0:
+    default_version = registry.resolve_version("random_forest")
+    rf_version = st.sidebar.selectbox("Random Forest model version",rf_versions,
+        index=rf_versions.index(default_version) if default_version in rf_versions else len(rf_versions)-1)
+    registry.activate("random_forest",rf_version)
+
 #countries_selected = ["None","None"]
 ###### Ask User to Select Country #####
 
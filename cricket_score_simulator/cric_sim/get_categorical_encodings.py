@@ -1,37 +1,48 @@
 import pandas as pd
 import numpy as np
 import random
-
-df = pd.read_csv("/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/categories_with_encoding.csv")
+from encoding_index import EncodingIndex, load_player_ratings, load_vocabularies, NEW_PLAYER_EXPERIENCE
+
+#### compact one-row-per-entity index, built from categories_with_encoding.csv on first use ####
+index = EncodingIndex.load_or_build()
+#### ratings table of modeling/player_ratings.py, the index's rating columns when it (or a player in it) is missing ####
+ratings = load_player_ratings()
+#### latest saved encoder vocabularies: unseen names get the fallback code instead of a KeyError ####
+vocab = load_vocabularies()
+
+def _encode(table,key):
+    if vocab is not None and table in vocab.columns:
+        return vocab.encode(table,key)
+    return index.lookup(table,key)
+
+def _experience(table,player):
+    ### experience bits of the player in the index, a new player's bucket when they are not in it ###
+    if vocab is not None and player not in index.ids[table]:
+        return vocab.encode(table,NEW_PLAYER_EXPERIENCE)
+    return index.lookup(table,player)
 
 def give_countries_as_options():
 
-    teams = set(list(df["current_innings"].unique()) + list(df["bowling_team_name"].unique()))
-    countries_list = list(teams)
+    countries_list = index.teams()
     return countries_list
 
 def get_venue_options():
 
-    venues = set(list(df["venue"].unique()))
-    venues_list = list(venues)
+    venues_list = index.names("venue")
     return venues_list
-    
+
 
 
 def select_players(country_name):
 
-    batsman = list(df[df["current_innings"] == country_name]["batsman"])
-    bowler = list(df[df["bowling_team_name"] == country_name]["bowler"])
-    all_players = batsman + bowler
-    players_to_select = list(set(all_players))
+    players_to_select = index.players(country_name)
 
     return players_to_select
 
 def get_venue_encodings(venue_city):
 
     ## encoding is numpy array ##
-    encodings = df[df["venue"]==venue_city][["venue_0","venue_1","venue_2","venue_3",\
-        "venue_4","venue_5","venue_6","venue_7"]].iloc[0].values
+    encodings = _encode("venue",venue_city)
     return encodings
 
 def get_innings_type_encoding(innings_number):
@@ -40,90 +51,71 @@ def get_innings_type_encoding(innings_number):
     elif innings_number == 2:
         inn_type = 'chasing'
 
-    encodings = df[df["innings_type"]==inn_type][["innings_type_0",\
-        "innings_type_1"]].iloc[0].values
+    encodings = _encode("innings_type",inn_type)
     return encodings
 
 def get_current_innings_encodings(team_name):
 
-    encodings = df[df["current_innings"]==team_name][['current_innings_0', 'current_innings_1', \
-            'current_innings_2', 'current_innings_3',\
-         'current_innings_4', 'current_innings_5', 'current_innings_6']].iloc[0].values
+    encodings = _encode("current_innings",team_name)
     return encodings
 
 def get_bowling_innings_encodings(team_name):
 
-    encodings = df[df["bowling_team_name"]==team_name][['bowling_team_name_0', \
-    'bowling_team_name_1', 'bowling_team_name_2', \
-        'bowling_team_name_3', 'bowling_team_name_4', \
-            'bowling_team_name_5', 'bowling_team_name_6']].iloc[0].values
+    encodings = _encode("bowling_team_name",team_name)
     return encodings
 
 def get_batsman_encodings(batsman_name):
 
     #print(batsman_name)
-    encodings = df[df["batsman"]==batsman_name][['batsman_0', 'batsman_1', 
-    'batsman_2', 'batsman_3', 'batsman_4', 'batsman_5', 'batsman_6', 
-    'batsman_7', 'batsman_8', 'batsman_9', 'batsman_10', 'batsman_11']].iloc[0].values
+    encodings = _encode("batsman",batsman_name)
     return encodings
 
 def get_bowler_encodings(bowler_name):
 
-    encodings = df[df["bowler"]==bowler_name][['bowler_0', 'bowler_1', 'bowler_2', \
-    'bowler_3', 'bowler_4', 'bowler_5', 'bowler_6', 'bowler_7', 'bowler_8', \
-    'bowler_9', 'bowler_10']].iloc[0].values
+    encodings = _encode("bowler",bowler_name)
     return encodings
 
 def get_non_striker_encodings(non_striker):
 
-    encodings = df[df["non_striker"]==non_striker][['non_striker_0', 'non_striker_1', \
-    'non_striker_2', 'non_striker_3', 'non_striker_4', 'non_striker_5', 'non_striker_6', \
-    'non_striker_7', 'non_striker_8', 'non_striker_9', 'non_striker_10', 'non_striker_11']].iloc[0].values
+    encodings = _encode("non_striker",non_striker)
     return encodings
 
 def get_super_over_encodings(isSuperOver):
-    encodings = df[df["super_over"]==isSuperOver][['super_over_0', 'super_over_1']].iloc[0].values
+    encodings = _encode("super_over",isSuperOver)
     return encodings
 
 def get_batting_experience(batsman):
-    encodings = df[df["batsman"]==batsman][['batting_experience_0',\
-         'batting_experience_1']].iloc[0].values
+    encodings = _experience("batting_experience",batsman)
     return encodings
 
 def get_out_batsman_encoding(batsman):
 
-    df[df["out_batsman"]==batsman][['out_batsman_0', 'out_batsman_1', 
-    'out_batsman_2', 'out_batsman_3', 
-    'out_batsman_4', 'out_batsman_5', 'out_batsman_6', 'out_batsman_7', 
-    'out_batsman_8', 'out_batsman_9', 'out_batsman_10', 'out_batsman_11']].iloc[0].values
+    encodings = _encode("out_batsman",batsman)
+    return encodings
 
 def get_bowler_experience(bowler):
-    encodings = df[df["bowler"]==bowler][['bowler_experience_0', \
-        'bowler_experience_1']].iloc[0].values
+    encodings = _experience("bowler_experience",bowler)
     return encodings
 
 def get_batsman_stats(batsman):
-    explosivity_rating =  df[df["batsman"]==batsman]["explosivity"].iloc[0]
-    running_rating = df[df["batsman"]==batsman]["running_rating"].iloc[0]
-    powerplay_rating = df[df["batsman"]==batsman]["power_play_rating"].iloc[0]
-    end_over_explosivity = df[df["batsman"]==batsman]["end_over_explosivity"].iloc[0]
+    if ratings is not None and ratings.has("batsman",batsman):
+        explosivity_rating,running_rating,powerplay_rating,\
+            end_over_explosivity = ratings.lookup("batsman",batsman)
+    else:
+        explosivity_rating,running_rating,powerplay_rating,\
+            end_over_explosivity = index.lookup("batsman_stats",batsman)
 
     return explosivity_rating,running_rating,powerplay_rating,end_over_explosivity
 
 def get_bowler_stats(bowler):
 
-    wicket_taking_rating =  df[df["bowler"]==bowler]["wicket_taking_rating"].iloc[0]
-    bowling_consistency_rating = df[df["bowler"]==bowler]["bowling_consistency_rating"].iloc[0]
+    if ratings is not None and ratings.has("bowler",bowler):
+        wicket_taking_rating,bowling_consistency_rating = ratings.lookup("bowler",bowler)
+    else:
+        wicket_taking_rating,bowling_consistency_rating = index.lookup("bowler_stats",bowler)
     return wicket_taking_rating,bowling_consistency_rating
 
 def get_probabilities():
 
-    prob0s = len(df[df["outcome"] == 0])/len(df)
-    prob1s = len(df[df["outcome"] == 1])/len(df)
-    prob2s = len(df[df["outcome"] == 2])/len(df)
-    prob3s = len(df[df["outcome"] == 3])/len(df)
-    prob4s = len(df[df["outcome"] == 4])/len(df)
-    prob6s = len(df[df["outcome"] == 6])/len(df)
-    probWs = len(df[df["outcome"] == 8])/len(df)
-
-    return [prob0s,prob1s,prob2s,prob3s,prob4s,prob6s,probWs]
\ No newline at end of file
+    ### [prob0s,prob1s,prob2s,prob3s,prob4s,prob6s,probWs] ###
+    return index.outcome_probabilities()
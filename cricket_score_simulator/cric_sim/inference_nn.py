@@ -1,26 +1,31 @@
-from tensorflow.keras.models import load_model
-import tensorflow_addons as tfa 
+import os
 import numpy as np
-from random import choices
+from model_registry import get_model,registry
+from outcome_sampler import sample_outcomes,NN_OUTCOMES
 
-f1 = tfa.metrics.F1Score(7,'weighted')
-model = load_model("/home/shivargha/cricket_analytics/cricket_score_simulator/model_13_02_23_3.h5", 
-                    custom_objects={"f1":f1})
+_rng = np.random.default_rng()
+
+##### model is only loaded on the first prediction #####
+def get_network(version=None):
+
+    #### the numpy export (numpy_mlp.py) of the same version skips tensorflow entirely ####
+    version = registry.resolve_version("nn",version)
+    if os.path.exists(registry.path("nn_numpy",version)):
+        return get_model("nn_numpy",version)
+    return get_model("nn",version)
 
 
 def model_inference(numpy_array):
 
+    model = get_network()
     prediction = model.predict(numpy_array,verbose=0)
     pred_outcome = np.argmax(prediction)
     return pred_outcome
 
 
 
-def model_inference2(numpy_array):
-
+def model_inference2(numpy_array,rng=None,temperature=1.0,top_k=None):
+    ### one sampled outcome per input row, labels 0..6 with 5 = wicket ###
+    model = get_network()
     prediction = model.predict(numpy_array,verbose=0)
-    for weights in prediction:
-        outcomes = [0,1,2,3,4,5,6]
-        pred = choices(outcomes, weights=weights)[0]
-
-    return pred
+    return sample_outcomes(prediction,_rng if rng is None else rng,temperature,top_k,labels=NN_OUTCOMES)
@@ -1,22 +1,30 @@
+import os
 import numpy as np
-import joblib
-from random import choices
+from model_registry import get_model,registry
+from outcome_sampler import sample_outcomes
+
+_rng = np.random.default_rng()
+
+##### forest is loaded on first prediction, see model_registry.MODEL_SPECS #####
+def get_forest(version=None):
+
+    #### the flattened export (forest_export.py) of the same version is used when it exists ####
+    version = registry.resolve_version("random_forest",version)
+    if os.path.exists(registry.path("random_forest_flat",version)):
+        return get_model("random_forest_flat",version)
+    return get_model("random_forest",version)
 
-loaded_rf_model = joblib.load("/home/shivargha/cricket_analytics/cricket_score_simulator/finalized_rf_model_v6.sav")
 
 def inference_random_forest(numpy_array):
 
+    loaded_rf_model = get_forest()
     prediction = loaded_rf_model.predict(numpy_array)
     return prediction
 
 
-def inference_rf2(numpy_array):
-    
+def inference_rf2(numpy_array,rng=None,temperature=1.0,top_k=None):
+    ### one sampled outcome per input row, labels are the forest classes ([0,1,2,3,4,6,8]) ###
+    loaded_rf_model = get_forest()
     prediction2 = loaded_rf_model.predict_proba(numpy_array)
-    for weights in prediction2:
-        outcomes = [0,1,2,3,4,6,8]
-        pred = choices(outcomes, weights=weights)[0]
-    return pred
-
-
-    
\ No newline at end of file
+    return sample_outcomes(prediction2,_rng if rng is None else rng,temperature,top_k,
+                           labels=loaded_rf_model.classes_)
@@ -0,0 +1,123 @@
+import os
+import re
+import threading
+import joblib
+
+MODEL_DIR = os.environ.get("CRIC_SIM_MODEL_DIR","/home/shivargha/cricket_analytics/cricket_score_simulator")
+
+####################### Known models ###############################
+## name -->> file pattern (version filled in), loader, version used when none is asked for
+## a default of "latest" picks the highest version found on disk at lookup time
+MODEL_SPECS = {
+    "random_forest":{"pattern":"finalized_rf_model_v{version}.sav","loader":"joblib","default":"6"},
+    "random_forest_flat":{"pattern":"flat_rf_model_v{version}","loader":"flat_forest","default":"6"},
+    "nn":{"pattern":"model_13_02_23_{version}.h5","loader":"keras","default":"3"},
+    "nn_numpy":{"pattern":"nn_model_v{version}.npz","loader":"numpy_mlp","default":"3"},
+}
+####################################################################
+
+
+def _load_joblib(path):
+    ### only bare arrays of the dump are memory mapped, the trees of a sklearn forest are still ###
+    ### rebuilt in each process's own memory, the flat export (forest_export.py) is what processes share ###
+    return joblib.load(path,mmap_mode="r")
+
+
+def _load_keras(path):
+    ### tensorflow is only imported when a keras model is actually requested ###
+    from tensorflow.keras.models import load_model
+    import tensorflow_addons as tfa
+    f1 = tfa.metrics.F1Score(7,'weighted')
+    return load_model(path,custom_objects={"f1":f1})
+
+
+def _load_numpy_mlp(path):
+    from numpy_mlp import NumpyMLP
+    return NumpyMLP.load(path)
+
+
+def _load_flat_forest(path):
+    from forest_export import FlatForest
+    return FlatForest.load(path)
+
+
+LOADERS = {"joblib":_load_joblib,"keras":_load_keras,"numpy_mlp":_load_numpy_mlp,"flat_forest":_load_flat_forest}
+
+
+class ModelRegistry:
+    """Lazily loads models by name/version and caches them until the file on disk changes."""
+
+    def __init__(self,model_dir=MODEL_DIR,specs=None):
+        self.model_dir = model_dir
+        self.specs = {name:dict(spec) for name,spec in (specs or MODEL_SPECS).items()}
+        self._active = {}
+        ##### name -->> (path, mtime, model) of the one version loaded #####
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def register(self,name,pattern,loader,default="latest"):
+        self.specs[name] = {"pattern":pattern,"loader":loader,"default":default}
+
+    def versions(self,name):
+        """Versions of a model present in the model directory, oldest first."""
+        pattern = self.specs[name]["pattern"]
+        prefix,suffix = pattern.split("{version}")
+        matcher = re.compile(re.escape(prefix) + r"(\w+?)" + re.escape(suffix) + "$")
+        found = [m.group(1) for m in map(matcher.match,os.listdir(self.model_dir)) if m]
+        return sorted(found,key=lambda v:(not v.isdigit(),int(v) if v.isdigit() else 0,v))
+
+    def activate(self,name,version):
+        """Switch the version served for name, picked up on the next get() without a restart.
+
+        The previously served version is evicted right away, not kept for the life of the process.
+        """
+        with self._lock:
+            self._active[name] = str(version)
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] != self.path(name,version):
+                del self._cache[name]
+
+    def resolve_version(self,name,version=None):
+        if version is None:
+            version = self._active.get(name,self.specs[name]["default"])
+        if version == "latest":
+            available = self.versions(name)
+            if not available:
+                raise FileNotFoundError("no versions of {} in {}".format(name,self.model_dir))
+            version = available[-1]
+        return str(version)
+
+    def path(self,name,version=None):
+        pattern = self.specs[name]["pattern"]
+        return os.path.join(self.model_dir,pattern.format(version=self.resolve_version(name,version)))
+
+    def get(self,name,version=None):
+        """The loaded model, reloaded if its file was replaced since it was cached.
+
+        Only one version per name is kept: the cached model is dropped before another version
+        (or a replaced file) is loaded, so two copies are never held at once.
+        """
+
+        path = self.path(name,version)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and cached[:2] == (path,mtime):
+                return cached[2]
+            cached = None
+            self._cache.pop(name,None)
+            model = LOADERS[self.specs[name]["loader"]](path)
+            self._cache[name] = (path,mtime,model)
+            return model
+
+    def evict(self,name=None):
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(name,None)
+
+registry = ModelRegistry()
+
+def get_model(name,version=None):
+    return registry.get(name,version)
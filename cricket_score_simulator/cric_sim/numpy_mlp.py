@@ -0,0 +1,115 @@
+import sys
+import numpy as np
+
+#### layers that are the identity at inference time ####
+PASS_THROUGH_LAYERS = ["InputLayer","Dropout"]
+
+
+def _relu(x):
+    return np.maximum(x,0,out=x)
+
+def _softmax(x):
+    x = x - x.max(axis=1,keepdims=True)
+    np.exp(x,out=x)
+    x /= x.sum(axis=1,keepdims=True)
+    return x
+
+def _linear(x):
+    return x
+
+ACTIVATIONS = {"relu":_relu,"softmax":_softmax,"linear":_linear}
+
+
+class NumpyMLP:
+    """Dense stack exported from the keras outcome model, evaluated with float32 numpy."""
+
+    def __init__(self,weights,biases,activations):
+        self.weights = [np.ascontiguousarray(w,dtype=np.float32) for w in weights]
+        self.biases = [np.ascontiguousarray(b,dtype=np.float32) for b in biases]
+        self.activations = list(activations)
+
+    @classmethod
+    def load(cls,path):
+        with np.load(path,allow_pickle=False) as arrays:
+            n_layers = int(arrays["n_layers"])
+            return cls([arrays["W{}".format(i)] for i in range(n_layers)],
+                       [arrays["b{}".format(i)] for i in range(n_layers)],
+                       [str(a) for a in arrays["activations"]])
+
+    def save(self,path):
+        arrays = {"n_layers":np.array(len(self.weights)),"activations":np.array(self.activations)}
+        for i,(w,b) in enumerate(zip(self.weights,self.biases)):
+            arrays["W{}".format(i)] = w
+            arrays["b{}".format(i)] = b
+        np.savez(path,**arrays)
+
+    def predict(self,numpy_array,verbose=0):
+        ### same call as keras model.predict, verbose is accepted and ignored ###
+        x = np.asarray(numpy_array,dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1,-1)
+        for w,b,activation in zip(self.weights,self.biases,self.activations):
+            x = x @ w
+            x += b
+            x = ACTIVATIONS[activation](x)
+        return x
+
+
+def _batch_norm_affine(layer):
+    ### inference time batch norm as y = x*scale + shift ###
+    mean = layer.moving_mean.numpy()
+    variance = layer.moving_variance.numpy()
+    gamma = layer.gamma.numpy() if layer.gamma is not None else np.ones_like(mean)
+    beta = layer.beta.numpy() if layer.beta is not None else np.zeros_like(mean)
+    scale = gamma/np.sqrt(variance + layer.epsilon)
+    return scale,beta - mean*scale
+
+
+def fold_keras_model(model):
+    """NumpyMLP equivalent of a Dense/BatchNormalization/Dropout keras model.
+
+    A BatchNormalization following an activation is folded into the next Dense layer:
+    W' = diag(scale) W, b' = b + shift W.
+    """
+
+    weights,biases,activations = [],[],[]
+    pending = None
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in PASS_THROUGH_LAYERS:
+            continue
+        elif kind == "BatchNormalization":
+            scale,shift = _batch_norm_affine(layer)
+            if pending is not None:
+                scale,shift = pending[0]*scale,pending[1]*scale + shift
+            pending = (scale,shift)
+        elif kind == "Dense":
+            w,b = layer.kernel.numpy().astype(np.float64),layer.bias.numpy().astype(np.float64)
+            if pending is not None:
+                b = b + pending[1] @ w
+                w = pending[0][:,None]*w
+                pending = None
+            weights.append(w)
+            biases.append(b)
+            activations.append(layer.get_config()["activation"])
+        else:
+            raise ValueError("cannot export layer {} of type {}".format(layer.name,kind))
+
+    if pending is not None:
+        raise ValueError("model ends with a BatchNormalization that has no Dense layer to fold into")
+    return NumpyMLP(weights,biases,activations)
+
+
+if __name__ == "__main__":
+    from model_registry import registry
+
+    ####### python numpy_mlp.py [version] -->> nn_model_v{version}.npz (needs tensorflow once) #######
+    version = registry.resolve_version("nn",sys.argv[1] if len(sys.argv) > 1 else None)
+    keras_model = registry.get("nn",version)
+    mlp = fold_keras_model(keras_model)
+    out_path = registry.path("nn_numpy",version)
+    mlp.save(out_path)
+
+    X_check = np.random.default_rng(0).random((256,mlp.weights[0].shape[0])).astype(np.float32)
+    diff = np.abs(keras_model.predict(X_check,verbose=0) - mlp.predict(X_check)).max()
+    print("Exported",out_path,"max |proba diff| vs keras:",diff)
@@ -0,0 +1,50 @@
+import numpy as np
+
+####################### Outcome label schemes ###############################
+## random forest classes: runs off the ball, 8 = wicket
+RF_OUTCOMES = np.array([0,1,2,3,4,6,8])
+## neural network classes: 0-4 runs, 5 = wicket, 6 = six
+NN_OUTCOMES = np.array([0,1,2,3,4,5,6])
+#############################################################################
+
+
+def adjust_probabilities(probabilities,temperature=1.0,top_k=None):
+    """Sharpen/flatten (temperature) and truncate (top_k) each row, rows renormalised to 1."""
+
+    probabilities = np.asarray(probabilities,dtype=np.float64)
+    if probabilities.ndim == 1:
+        probabilities = probabilities.reshape(1,-1)
+
+    if temperature != 1.0:
+        if temperature <= 0:
+            raise ValueError("temperature must be positive, got {}".format(temperature))
+        ##### p**(1/T) is softmax(log p / T), zeros stay zero #####
+        probabilities = np.power(probabilities,1.0/temperature)
+
+    if top_k is not None and top_k < 1:
+        raise ValueError("top_k must be at least 1, got {}".format(top_k))
+    if top_k is not None and top_k < probabilities.shape[1]:
+        ##### ties at the k-th largest value are all kept #####
+        kth = -np.sort(-probabilities,axis=1)[:,top_k - 1:top_k]
+        probabilities = np.where(probabilities >= kth,probabilities,0)
+
+    total = probabilities.sum(axis=1,keepdims=True)
+    return probabilities/np.where(total > 0,total,1)
+
+
+def sample_outcomes(probabilities,rng,temperature=1.0,top_k=None,labels=None):
+    """One categorical draw per row of an (N, k) probability matrix.
+
+    Returns column indices, or labels[index] when an outcome label scheme is given.
+    """
+
+    probabilities = adjust_probabilities(probabilities,temperature,top_k)
+
+    ###### uniform draw against the row cdf ######
+    cdf = np.cumsum(probabilities,axis=1)
+    u = rng.random(len(cdf))*cdf[:,-1]
+    picked = np.minimum((cdf <= u[:,None]).sum(axis=1),cdf.shape[1] - 1)
+
+    if labels is None:
+        return picked
+    return np.asarray(labels)[picked]
@@ -0,0 +1,93 @@
+import os
+import copy
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from encoding_index import EncodingIndex,ENCODING_INDEX_PATH
+from batch_simulator import SimulationResult,simulator_for_random_forest
+from model_registry import registry
+from model_inference import get_forest
+from forest_export import export_forest
+
+##### matches are simulated in fixed size blocks, each block owns one RNG stream #####
+##### so the output only depends on the seed, never on how many workers ran it #####
+BLOCK_SIZE = 512
+
+_worker_simulator = None
+
+
+def toss_batting_first(rng,n_matches):
+    ### vectorised get_toss_res: random toss winner, random bat/field call ###
+    toss_won_by = rng.integers(0,2,n_matches)
+    chose_to_bat = rng.integers(0,2,n_matches) == 1
+    return np.where(chose_to_bat,toss_won_by,1 - toss_won_by)
+
+
+def _load_simulator(fixture,model_version,index_path):
+
+    #### the flat export is memory mapped, workers share its pages; a sklearn forest is a copy per worker ####
+    rf_model = get_forest(model_version)
+    if hasattr(rf_model,"n_jobs"):
+        ### single threaded predict on a shallow copy, the registry's cached model is left as it is ###
+        rf_model = copy.copy(rf_model)
+        rf_model.n_jobs = 1
+    index = EncodingIndex.load(index_path)
+    return simulator_for_random_forest(rf_model,fixture["team1"],fixture["team2"],
+                                       fixture["playing11_1"],fixture["playing11_2"],fixture["venue"],
+                                       bowling_orders=fixture.get("bowling_orders"),index=index)
+
+
+def _init_worker(fixture,model_version,index_path):
+    global _worker_simulator
+    _worker_simulator = _load_simulator(fixture,model_version,index_path)
+
+
+def _simulate_block(task):
+
+    n_matches,seed_seq = task
+    rng = np.random.default_rng(seed_seq)
+    batting_first = toss_batting_first(rng,n_matches)
+    result = _worker_simulator.simulate(n_matches,rng,batting_first=batting_first)
+    return (result.batting_first,result.first_score,result.first_wickets,
+            result.second_score,result.second_wickets)
+
+
+def _blocks(n_matches,seed,block_size):
+    n_blocks = -(-n_matches // block_size)
+    seed_seqs = np.random.SeedSequence(seed).spawn(n_blocks)
+    sizes = [min(block_size,n_matches - i*block_size) for i in range(n_blocks)]
+    return list(zip(sizes,seed_seqs))
+
+
+def run_simulations(fixture,n_matches,seed,n_workers=None,model_version=None,
+                    index_path=ENCODING_INDEX_PATH,block_size=BLOCK_SIZE):
+    """Simulate n_matches of a fixture across a process pool.
+
+    fixture is a dict with team1, team2, playing11_1, playing11_2, venue and optionally
+    bowling_orders. model_version is a random_forest version known to model_registry
+    (the registry default when None). Given the same seed the result is identical for any n_workers.
+    """
+    if n_matches < 1:
+        raise ValueError("n_matches must be at least 1, got {}".format(n_matches))
+    model_version = registry.resolve_version("random_forest",model_version)
+
+    tasks = _blocks(n_matches,seed,block_size)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1,min(n_workers,len(tasks)))
+
+    if n_workers == 1:
+        _init_worker(fixture,model_version,index_path)
+        block_results = [_simulate_block(task) for task in tasks]
+    else:
+        ###### flattened once here so every worker maps the same files instead of unpickling the forest ######
+        flat_path = registry.path("random_forest_flat",model_version)
+        if not os.path.exists(flat_path):
+            export_forest(registry.get("random_forest",model_version),flat_path)
+            registry.evict("random_forest")
+        with ProcessPoolExecutor(max_workers=n_workers,initializer=_init_worker,
+                                 initargs=(fixture,model_version,index_path)) as executor:
+            ###### map keeps block order, so merging is deterministic ######
+            block_results = list(executor.map(_simulate_block,tasks))
+
+    merged = [np.concatenate(field) for field in zip(*block_results)]
+    return SimulationResult([fixture["team1"],fixture["team2"]],*merged)
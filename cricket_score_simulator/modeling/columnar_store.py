@@ -0,0 +1,186 @@
+import os
+import re
+import sys
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+##### CSVs of the project, converted copies are written next to them (same name, new suffix) #####
+DATASETS = {
+    "t20is":"/home/shivargha/cricket_analytics/T20_cricket/t20is3.csv",
+    "trainable":"/home/shivargha/cricket_analytics/cricket_score_simulator/Final_T20_trainable.csv",
+    "categories":"/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/categories_with_encoding.csv",
+}
+
+FORMATS = {"parquet":".parquet","feather":".feather"}
+
+####################### Column dtypes ###############################
+## names/labels -->> category, counts -->> small ints, rates/ratings -->> float32,
+## binary encoded bits (<column>_<i>) -->> uint8, anything not listed keeps the inferred dtype
+NAME_COLUMNS = ["venue","country","match_between","toss_winner","toss_decision",
+    "current_innings","innings_type","batsman","non_striker","bowler","extras_type",
+    "out","out_batsman","dismissal_type","dismissed_by_fielder","winner","winner_method",
+    "method_if_any","super_over","super_over_winner","potm","bowling_team_name",
+    "batting_experience","bowler_experience"]
+
+COUNT_COLUMNS = {
+    "extras":"int8","total_runs":"int8","batsman_runs":"int8","outcome":"int8",
+    "curr_wickers":"int8","wickets_by_bower":"int8",
+    "curr_score":"int16","batsman_score":"int16","balls_faced_batsman":"int16",
+    "runs_conceded_by_bowler":"int16","balls_bowled_bowler":"int16",
+}
+
+RATE_COLUMNS = ["over","current_run_rate","req_run_rate","batsman_strike_rate","bowler_economy",
+    "explosivity","running_rating","power_play_rating","end_over_explosivity",
+    "wicket_taking_rating","bowling_consistency_rating"] + \
+    ["batsman_prop{}".format(i) for i in range(8)] + ["bowler_prop{}".format(i) for i in range(9)]
+
+ENCODED_PREFIXES = ["venue","current_innings","bowling_team_name","innings_type","batsman","bowler",
+    "non_striker","super_over","batting_experience","bowler_experience","out_batsman"]
+BIT_COLUMN = re.compile("^({})_\\d+$".format("|".join(ENCODED_PREFIXES)))
+#####################################################################
+
+
+def column_dtype(column):
+    if column in NAME_COLUMNS:
+        return "category"
+    if column in COUNT_COLUMNS:
+        return COUNT_COLUMNS[column]
+    if column in RATE_COLUMNS:
+        return "float32"
+    if BIT_COLUMN.match(column):
+        return "uint8"
+    return None
+
+
+def _csv_dtypes(columns):
+    ### names are parsed as str here, they become categoricals after the chunks are joined ###
+    dtypes = {}
+    for column in columns:
+        dtype = column_dtype(column)
+        if dtype is not None:
+            dtypes[column] = str if dtype == "category" else dtype
+    return dtypes
+
+
+def _apply_dtypes(df):
+    for column in df.columns:
+        if column_dtype(column) == "category" and df[column].dtype != "category":
+            df[column] = df[column].astype("category")
+    return df
+
+
+def resolve(dataset):
+    """Path of a dataset name from DATASETS, or the path itself."""
+    return DATASETS.get(dataset,dataset)
+
+
+def converted_path(csv_path,fmt="parquet"):
+    return os.path.splitext(csv_path)[0] + FORMATS[fmt]
+
+
+def read_csv_typed(csv_path,columns=None,chunksize=None):
+    """read_csv with the dtypes above, only the requested columns are parsed."""
+
+    header = pd.read_csv(csv_path,nrows=0).columns
+    usecols = list(header) if columns is None else list(columns)
+    dtypes = _csv_dtypes(usecols)
+    if chunksize is not None:
+        return pd.read_csv(csv_path,usecols=usecols,dtype=dtypes,chunksize=chunksize)
+    return _apply_dtypes(pd.read_csv(csv_path,usecols=usecols,dtype=dtypes)[usecols])
+
+
+def convert(dataset,fmt="parquet",out_path=None,chunksize=500000):
+    """Write a typed parquet/feather copy of a CSV, streaming it in chunks."""
+
+    csv_path = resolve(dataset)
+    out_path = out_path or converted_path(csv_path,fmt)
+    writer = None
+    try:
+        for chunk in read_csv_typed(csv_path,chunksize=chunksize):
+            ##### names stay plain strings on disk: parquet dictionary encodes them itself #####
+            table = pa.Table.from_pandas(chunk,preserve_index=False)
+            if writer is None:
+                schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                    for f in table.schema],metadata=table.schema.metadata)
+                if fmt == "parquet":
+                    writer = pq.ParquetWriter(out_path,schema,compression="zstd")
+                else:
+                    writer = pa.ipc.new_file(out_path,schema,
+                                             options=pa.ipc.IpcWriteOptions(compression="zstd"))
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    return out_path
+
+
+def load(dataset,columns=None):
+    """Typed frame of a dataset, only the requested columns are read.
+
+    Uses the parquet copy, then the feather copy, and parses the CSV only when neither exists.
+    """
+
+    csv_path = resolve(dataset)
+    columns = None if columns is None else list(columns)
+
+    parquet_path = converted_path(csv_path,"parquet")
+    if os.path.exists(parquet_path):
+        names = [c for c in (columns or pq.read_schema(parquet_path).names) if column_dtype(c) == "category"]
+        return pd.read_parquet(parquet_path,columns=columns,read_dictionary=names)
+
+    feather_path = converted_path(csv_path,"feather")
+    if os.path.exists(feather_path):
+        return _apply_dtypes(pd.read_feather(feather_path,columns=columns))
+
+    return read_csv_typed(csv_path,columns)
+
+
+def load_chunks(dataset,columns=None,chunksize=500000):
+    """Typed frames of about chunksize rows each, for datasets larger than memory.
+
+    Same source order as load(): parquet row batches, feather record batches, then CSV chunks.
+    """
+
+    csv_path = resolve(dataset)
+    columns = None if columns is None else list(columns)
+
+    parquet_path = converted_path(csv_path,"parquet")
+    if os.path.exists(parquet_path):
+        for batch in pq.ParquetFile(parquet_path).iter_batches(batch_size=chunksize,columns=columns):
+            yield _apply_dtypes(batch.to_pandas())
+        return
+
+    feather_path = converted_path(csv_path,"feather")
+    if os.path.exists(feather_path):
+        reader = pa.ipc.open_file(feather_path)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            yield _apply_dtypes(batch.select(columns).to_pandas() if columns else batch.to_pandas())
+        return
+
+    for chunk in read_csv_typed(csv_path,columns,chunksize):
+        yield _apply_dtypes(chunk[columns] if columns else chunk)
+
+
+def columns_of(dataset):
+    """Column names of a dataset without loading it."""
+
+    csv_path = resolve(dataset)
+    for fmt in FORMATS:
+        path = converted_path(csv_path,fmt)
+        if os.path.exists(path):
+            if fmt == "parquet":
+                return pq.read_schema(path).names
+            return pa.ipc.open_file(path).schema.names
+    return list(pd.read_csv(csv_path,nrows=0).columns)
+
+
+if __name__ == "__main__":
+
+    ####### python columnar_store.py [dataset or csv ...] [--feather] #######
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    fmt = "feather" if "--feather" in sys.argv else "parquet"
+    for dataset in args or list(DATASETS):
+        if os.path.exists(resolve(dataset)):
+            print("Converted",resolve(dataset),"-->>",convert(dataset,fmt))
@@ -1,9 +1,15 @@
+import sys
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from columnar_store import load, load_chunks, columns_of
+from feature_engineering import WICKET_OUTCOME, bowler_wicket, bowling_team
 import category_encoders as ce
-from tqdm import tqdm
+##### fitted encoders, written and read by the simulator's cric_sim/encoding_index.Vocabularies #####
+from simulator_files import VOCAB_DIR, Vocabularies
 
-df2 = pd.read_csv("/home/shivargha/cricket_analytics/T20_cricket/t20is3.csv")
+TRAINABLE_PATH = "/home/shivargha/cricket_analytics/cricket_score_simulator/Final_T20_trainable.csv"
 
 
 ####################### Features Selected for ML Models ###############################
@@ -27,36 +33,12 @@ df2 = pd.read_csv("/home/shivargha/cricket_analytics/T20_cricket/t20is3.csv")
 """
 #########################################################################################
 
-#### creating a binary feature encoder #####
-def binary_feature_encoder(column_name:str):
-    
-    df_col = pd.DataFrame(df2[column_name])
-    encoder = ce.BinaryEncoder(cols=[column_name],return_df=True)
-    data_encoded = encoder.fit_transform(df_col) 
-    return data_encoded
-
-
-################  Converting Categorical Columns ##############
-## -->> venue,current_innings,innings_type,bowling_team_name
-## -->> batsman,non_striker,bowler,super_over
-## -->> batting_experience,bowler_experience
-
-venue_df_encoded = binary_feature_encoder("venue")
-curr_innings_df_encoded = binary_feature_encoder("current_innings")
-bowling_team_df_encoded = binary_feature_encoder("bowling_team_name")
-innings_type_df_encoded = binary_feature_encoder("innings_type")
-batsman_df_encoded = binary_feature_encoder("batsman")
-bowler_df_encoded = binary_feature_encoder("bowler")
-non_striker_df_encoded = binary_feature_encoder("non_striker")
-super_over_df_encoded = binary_feature_encoder("super_over")
-batting_exp_df_encoded = binary_feature_encoder("batting_experience")
-bowling_exp_df_encoded = binary_feature_encoder("bowler_experience")
-out_batsman_df_encoded = binary_feature_encoder("out_batsman")
-#################################################################
-
-
-################ Getting all the numerical Features ####################
-df_num_data = df2[["over","curr_score","curr_wickers",'current_run_rate', 'req_run_rate',\
+################  Categorical Columns, binary encoded in this order ##############
+CATEGORICAL_COLUMNS = ["venue","current_innings","bowling_team_name","innings_type","batsman","bowler",
+    "non_striker","super_over","batting_experience","bowler_experience","out_batsman"]
+
+################ Numerical Features ####################
+NUMERIC_COLUMNS = ["over","curr_score","curr_wickers",'current_run_rate', 'req_run_rate',\
     'batsman_score', 'balls_faced_batsman',\
     'batsman_strike_rate',"runs_conceded_by_bowler",
     'balls_bowled_bowler', 'wickets_by_bower',\
@@ -66,51 +48,131 @@ df_num_data = df2[["over","curr_score","curr_wickers",'current_run_rate', 'req_r
     'bowler_prop3', 'bowler_prop4', 'bowler_prop5', 'bowler_prop6',\
     'bowler_prop7', 'bowler_prop8', 'explosivity', 'running_rating',\
     'power_play_rating', 'end_over_explosivity',\
-    'wicket_taking_rating', 'bowling_consistency_rating']].copy()
+    'wicket_taking_rating', 'bowling_consistency_rating']
+
+LABEL_INPUTS = ["out","dismissal_type","batsman_runs"]
+BOWLING_TEAM_INPUTS = ["match_between","current_innings"]
 ########################################################################
 
-##Run Out/Obstructing the field  Considered here as bowler's wicker for simplicity###
-non_bowler_type = ["None","retired hurt","retired out","retired not out"]
-bowler_out_type = []
-for out in df2["dismissal_type"].unique():
-    if out not in non_bowler_type:
-        bowler_out_type.append(out)
-
-#bowler out types -->> ['lbw','run out','caught','bowled','caught and bowled','stumped','hit wicket',\
-# 'obstructing the field']
-
-############# Creating the Labels #################
-'''
-As Maximum Run by a batsman is 7, hence considering Wicket as 8
-'''
-outcome_labels = []
-for row in tqdm(range(len(df2))):
-    
-    out,out_type = df2.iloc[row]["out"],df2.iloc[row]["dismissal_type"]
-    batsman_runs = df2.iloc[row]["batsman_runs"]
-    #print(out)
-    if out == "Yes":
-        if out_type in bowler_out_type:
-            outcome_labels.append(8)
-        else:
-            outcome_labels.append(0)
-    else:
-        outcome_labels.append(batsman_runs)
+
+def _names(values):
+    ### plain strings, so categoricals are encoded in order of appearance like the CSV ###
+    return pd.Series(np.asarray(values,dtype=object)).astype(str)
+
+
+def outcome_labels(df):
+    """batsman runs, WICKET_OUTCOME for the bowler's wickets, 0 for the other dismissals (retirements).
+
+    As Maximum Run by a batsman is 7, hence considering Wicket as 8
+    """
+
+    out = df["out"].to_numpy() == "Yes"
+    runs = df["batsman_runs"].to_numpy(np.int64)
+    return np.where(bowler_wicket(df),WICKET_OUTCOME,np.where(out,0,runs))
+
+
+def with_bowling_team(df):
+    if "bowling_team_name" not in df.columns:
+        df["bowling_team_name"] = bowling_team(df)
+    return df
 
 
-final_trainable_df = pd.concat([venue_df_encoded, curr_innings_df_encoded,\
-                             bowling_team_df_encoded,innings_type_df_encoded,\
-                              batsman_df_encoded,bowler_df_encoded,non_striker_df_encoded,\
-                              super_over_df_encoded, batting_exp_df_encoded,\
-                              bowling_exp_df_encoded,\
-                            out_batsman_df_encoded,df_num_data], axis=1)
+#### creating a binary feature encoder per categorical column #####
+def fit_encoders(df):
+    """{column: BinaryEncoder} fitted on the distinct values of every categorical column."""
 
-final_trainable_df["outcome"] = outcome_labels
+    encoders = {}
+    for column in CATEGORICAL_COLUMNS:
+        distinct = pd.DataFrame({column:_names(df[column]).unique()})
+        encoders[column] = ce.BinaryEncoder(cols=[column],return_df=True).fit(distinct)
+    return encoders
 
-final_trainable_df.to_csv("/home/shivargha/cricket_analytics/cricket_score_simulator/Final_T20_trainable.csv",\
-                    index=False)
 
+def save_vocabularies(encoders,vocab_dir=VOCAB_DIR):
+    """Names in code order and bit width of every fitted encoder, saved by the simulator's
+    Vocabularies as the next vocab_v<N>.npz. Returns its path.
+    """
 
+    keys,n_bits = {},{}
+    for column,encoder in encoders.items():
+        ordinals = encoder.ordinal_encoder.mapping[0]["mapping"]
+        ordinals = ordinals[ordinals > 0].sort_values()
+        keys[column] = ordinals.index.tolist()
+        n_bits[column] = len(encoder.get_feature_names_out())
+    return Vocabularies.from_columns(keys,n_bits).save(vocab_dir)
 
 
+def trainable_frame(df,encoders):
+    """Encoded categoricals, numerical features and the outcome label of a ball by ball frame."""
 
+    encoded = [encoders[column].transform(pd.DataFrame({column:_names(df[column])})) for column in CATEGORICAL_COLUMNS]
+    final_trainable_df = pd.concat(encoded + [df[NUMERIC_COLUMNS].reset_index(drop=True)],axis=1)
+    final_trainable_df["outcome"] = outcome_labels(df)
+    return final_trainable_df
+
+
+def _category_frame(dataset):
+    ### only the categorical columns are read whole: they are what the encoders are fitted on ###
+    if "bowling_team_name" in columns_of(dataset):
+        return load(dataset,CATEGORICAL_COLUMNS)
+    names = [c for c in CATEGORICAL_COLUMNS if c != "bowling_team_name"] + ["match_between"]
+    return with_bowling_team(load(dataset,names))
+
+
+def _save(encoders,vocab_dir):
+    if vocab_dir is not None:
+        print("Encoders saved to",save_vocabularies(encoders,vocab_dir))
+
+
+def build(dataset="t20is",out_path=TRAINABLE_PATH,chunksize=None,vocab_dir=VOCAB_DIR):
+    """Write the trainable frame of a dataset as CSV, or as parquet when out_path ends with .parquet.
+
+    The fitted encoders are saved as a new vocabulary version in vocab_dir (None: not saved).
+    chunksize=None encodes the whole frame at once; with a chunksize the balls are streamed through
+    columnar_store.load_chunks and appended to out_path, so the input never has to fit in memory.
+    """
+
+    if chunksize is None:
+        df = with_bowling_team(load(dataset))
+        encoders = fit_encoders(df)
+        _save(encoders,vocab_dir)
+        trainable = trainable_frame(df,encoders)
+        if out_path.endswith(".parquet"):
+            trainable.to_parquet(out_path,index=False,compression="zstd")
+        else:
+            trainable.to_csv(out_path,index=False)
+        return len(trainable)
+
+    encoders = fit_encoders(_category_frame(dataset))
+    _save(encoders,vocab_dir)
+    available = columns_of(dataset)
+    columns = [c for c in available if c in CATEGORICAL_COLUMNS + NUMERIC_COLUMNS + LABEL_INPUTS]
+    if "bowling_team_name" not in available:
+        columns += [c for c in BOWLING_TEAM_INPUTS if c not in columns]
+    rows = 0
+    writer = None
+    try:
+        for chunk in load_chunks(dataset,columns,chunksize):
+            trainable = trainable_frame(with_bowling_team(chunk),encoders)
+            if out_path.endswith(".parquet"):
+                table = pa.Table.from_pandas(trainable,preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(out_path,table.schema,compression="zstd")
+                writer.write_table(table.cast(writer.schema))
+            else:
+                trainable.to_csv(out_path,index=False,mode="w" if rows == 0 else "a",header=rows == 0)
+            rows += len(trainable)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+if __name__ == "__main__":
+
+    ####### python create_train_data.py [dataset or csv] [out.csv or out.parquet] [--chunksize=N] #######
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    options = dict(a[2:].split("=") for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    chunksize = int(options["chunksize"]) if "chunksize" in options else None
+    out_path = args[1] if len(args) > 1 else TRAINABLE_PATH
+    print("Written",build(args[0] if args else "t20is",out_path,chunksize),"rows to",out_path)
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import hashlib
+import pandas as pd
+from tqdm import tqdm
+from cricsheet_parser import BALL_COLUMNS, match_id_of, parse_files
+from venue_countries import VenueCountries
+
+############ Cricsheet YAML folder and the ball by ball store built from it ############
+SOURCE_DIR = "/home/shivargha/cricket_analytics/T20_cricket/t20s_part2/"
+STORE_DIR = "/home/shivargha/cricket_analytics/T20_cricket/t20_balls/"
+MANIFEST = "manifest.json"
+#########################################################################################
+
+####################### Manifest of processed files ###############################
+## files  -->> {file name: {size, mtime, sha1, match_id}} of every file in the store
+## stages -->> {stage: {match_id: sha1}} source version each downstream stage was built from
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path,"rb") as f:
+        for block in iter(lambda: f.read(1 << 20),b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir,MANIFEST)
+
+
+def read_manifest(store_dir=STORE_DIR):
+    path = manifest_path(store_dir)
+    if not os.path.exists(path):
+        return {"files":{},"stages":{}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(manifest,store_dir=STORE_DIR):
+    ### written to a temporary file first so an interrupted run keeps the previous manifest ###
+    path = manifest_path(store_dir)
+    with open(path + ".tmp","w") as f:
+        json.dump(manifest,f,indent=1,sort_keys=True)
+    os.replace(path + ".tmp",path)
+
+
+def partition_path(match_id,store_dir=STORE_DIR):
+    return os.path.join(store_dir,"balls","{}.parquet".format(match_id))
+
+
+def scan_changes(manifest,source_dir=SOURCE_DIR):
+    """(new or changed files with their manifest entries, names of files no longer in source_dir)
+
+    A file is unchanged when size and mtime match the manifest, or when only the mtime moved
+    and the content hash is the same.
+    """
+
+    files = manifest["files"]
+    changed = {}
+    present = set()
+    for name in sorted(os.listdir(source_dir)):
+        if not name.endswith((".yaml",".yml")):
+            continue
+        path = os.path.join(source_dir,name)
+        stat = os.stat(path)
+        present.add(name)
+        entry = {"size":stat.st_size,"mtime":stat.st_mtime,"match_id":match_id_of(name)}
+        known = files.get(name)
+        if known is not None and known["size"] == entry["size"] and known["mtime"] == entry["mtime"]:
+            continue
+        entry["sha1"] = file_sha1(path)
+        if known is not None and known["sha1"] == entry["sha1"]:
+            known["mtime"] = entry["mtime"]
+            continue
+        changed[name] = entry
+    removed = sorted(set(files) - present)
+    return changed,removed
+
+
+def ingest(source_dir=SOURCE_DIR,store_dir=STORE_DIR,countries=None,workers=None):
+    """Parse only new or changed match files into per match parquet partitions.
+
+    Returns (match ids written, match ids removed). Files that fail to parse are reported and
+    left out of the manifest, so the next run retries them. Countries come from the venue cache
+    (venue_countries.py, offline unless it was given a resolver).
+    """
+
+    countries = countries or VenueCountries()
+    os.makedirs(os.path.join(store_dir,"balls"),exist_ok=True)
+    manifest = read_manifest(store_dir)
+    changed,removed = scan_changes(manifest,source_dir)
+    by_match_id = {entry["match_id"]:name for name,entry in changed.items()}
+
+    written = []
+    failed = set()
+    empty = None
+    paths = [os.path.join(source_dir,name) for name in changed]
+    with tqdm(total=len(paths)) as progress:
+        for frame,errors in parse_files(paths,workers=workers,country_of=countries):
+            countries.learn(frame)
+            empty = frame.iloc[:0]
+            for match_id,balls in frame.groupby("matchid",sort=False):
+                balls.to_parquet(partition_path(match_id,store_dir),index=False,compression="zstd")
+                manifest["files"][by_match_id[match_id]] = changed[by_match_id[match_id]]
+                written.append(match_id)
+            for path,error in errors:
+                failed.add(os.path.basename(path))
+                print("Skipped",os.path.basename(path),error)
+            progress.update(frame["matchid"].nunique() + len(errors))
+
+        ##### parsed files without deliveries (abandoned, no result) get an empty partition, #####
+        ##### so they are in the manifest and not parsed again on the next run #####
+        with_rows = set(written)
+        for name,entry in changed.items():
+            if name in failed or entry["match_id"] in with_rows:
+                continue
+            empty.to_parquet(partition_path(entry["match_id"],store_dir),index=False,compression="zstd")
+            manifest["files"][name] = entry
+            written.append(entry["match_id"])
+            progress.update(1)
+
+    dropped = []
+    for name in removed:
+        match_id = manifest["files"].pop(name)["match_id"]
+        if os.path.exists(partition_path(match_id,store_dir)):
+            os.remove(partition_path(match_id,store_dir))
+        dropped.append(match_id)
+
+    write_manifest(manifest,store_dir)
+    countries.save()
+    return written,dropped
+
+
+def load_balls(store_dir=STORE_DIR,match_ids=None,columns=None):
+    """Ball by ball frame of the store (or of some matches), in match_id order."""
+
+    manifest = read_manifest(store_dir)
+    ids = sorted(e["match_id"] for e in manifest["files"].values())
+    if match_ids is not None:
+        wanted = set(match_ids)
+        ids = [m for m in ids if m in wanted]
+    if not ids:
+        return pd.DataFrame(columns=columns or BALL_COLUMNS)
+    return pd.concat([pd.read_parquet(partition_path(m,store_dir),columns=columns) for m in ids],
+                     ignore_index=True)
+
+
+######################## Downstream invalidation ###############################
+## A stage (per match features, player ratings, training rows ...) records the sha1 of the source
+## each match was built from. Anything new, changed or removed since then is stale for it.
+
+def _versions(manifest):
+    return {e["match_id"]:e["sha1"] for e in manifest["files"].values()}
+
+
+def stale_matches(stage,store_dir=STORE_DIR):
+    """(match ids to (re)build for the stage, match ids the stage built that no longer exist)"""
+
+    manifest = read_manifest(store_dir)
+    built = manifest["stages"].get(stage,{})
+    versions = _versions(manifest)
+    rebuild = sorted(m for m,sha1 in versions.items() if built.get(m) != sha1)
+    gone = sorted(set(built) - set(versions))
+    return rebuild,gone
+
+
+def stale_players(stage,store_dir=STORE_DIR,columns=("batsman","non_striker","bowler")):
+    """Players appearing in any stale match of the stage: whole career stats to recompute."""
+
+    rebuild,_ = stale_matches(stage,store_dir)
+    players = set()
+    if rebuild:
+        df = load_balls(store_dir,rebuild,list(columns))
+        for column in columns:
+            players.update(df[column].unique())
+    return sorted(players)
+
+
+def mark_built(stage,match_ids,store_dir=STORE_DIR):
+    """Record that the stage is up to date for these matches (removed matches are forgotten)."""
+
+    manifest = read_manifest(store_dir)
+    versions = _versions(manifest)
+    built = {m:sha1 for m,sha1 in manifest["stages"].get(stage,{}).items() if m in versions}
+    for m in match_ids:
+        built[m] = versions[m]
+    manifest["stages"][stage] = built
+    write_manifest(manifest,store_dir)
+
+
+if __name__ == "__main__":
+
+    ####### python cricsheet_ingest.py [source_dir] [store_dir] #######
+    written,dropped = ingest(*sys.argv[1:3])
+    print("Ingested",len(written),"matches, removed",len(dropped))
@@ -0,0 +1,251 @@
+import os
+import sys
+import yaml
+import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from venue_countries import VenueCountries
+from feature_engineering import INNINGS_STATE_COLUMNS, innings_state
+
+##### libyaml's C loader when PyYAML was built with it, several times faster than the pure Python one #####
+Loader = getattr(yaml,"CSafeLoader",yaml.SafeLoader)
+
+####### df_data columns of create_csv (T20_Data_Analysis_Feature_Engineering.ipynb) #######
+BALL_COLUMNS = ["matchid","venue","country","date","month","year","match_between",
+    "toss_winner","toss_decision",
+    "current_innings","innings_type","over","batsman","non_striker","bowler","extras",
+    "total_runs","batsman_runs",
+    "extras_type","curr_score","curr_wickers","current_run_rate","req_run_rate","out","out_batsman",
+    "dismissal_type","dismissed_by_fielder",
+    "winner","winner_method","win_by","method_if_any","super_over","super_over_winner","potm"]
+
+####### df_data columns of create_csv (ODI_analysis.ipynb) #######
+ODI_COLUMNS = ["matchid","venue","country","date","month","year","match_between",
+    "toss_winner","toss_decision",
+    "current_innings","bowling_innings","over","batsman","non_striker","bowler","extras",
+    "total_runs","batsman_runs",
+    "extras_type","out","out_batsman","dismissal_type","dismissed_by_fielder",
+    "winner","winner_method","win_by","method_if_any","super_over","super_over_winner","potm"]
+
+##### T20 columns the parser reads from the YAML, the rest is running innings state #####
+PARSED_COLUMNS = [c for c in BALL_COLUMNS if c not in INNINGS_STATE_COLUMNS]
+
+INT_COLUMNS = ["date","month","year","extras","total_runs","batsman_runs","curr_score","curr_wickers",
+    "current_run_rate","req_run_rate"]
+FLOAT_COLUMNS = ["over"]
+#########################################################################################
+
+
+def match_id_of(path):
+    return os.path.basename(path).split(".")[0]
+
+
+def _outcome(outcome):
+    """winner, winner_method, win_by, super_over_winner of a match"""
+
+    if "eliminator" in outcome:
+        return "Tie","Tie","Tie",outcome["eliminator"]
+    if "result" in outcome:
+        return "No Result","No Result","No Result","None"
+    if "by" in outcome:
+        return outcome["winner"],list(outcome["by"].keys())[0],list(outcome["by"].values())[0],"None"
+    ###Awarded Methods###
+    return outcome["winner"],outcome["method"],"None","None"
+
+
+def _match_info(data,country_of):
+    """venue .. toss_decision and winner .. potm values shared by every ball of a match"""
+
+    info = data["info"]
+    venue_city = info["city"] if "city" in info else info["venue"]
+    try:
+        ##### venue_countries cache, or any venue -->> country callable #####
+        country = country_of(venue_city)
+    except Exception:
+        country = "None"
+    winner_team,winner_method,winner_num,super_over_winner_team = _outcome(info["outcome"])
+
+    match_between = info["teams"][0] + " vs " + info["teams"][1]
+    potm = "/".join(info["player_of_match"]) if "player_of_match" in info else "No Data"
+    method_if_any = info["outcome"].get("method","None")
+    return [venue_city,country],[match_between,info["toss"]["winner"],info["toss"]["decision"]], \
+        [winner_team,winner_method,winner_num,method_if_any],super_over_winner_team,potm
+
+
+def _wicket(ball):
+    if "wicket" not in ball:
+        return ["No","None","None","None"]
+    wicket = ball["wicket"]
+    dismissed_by_fielder = "/".join(wicket["fielders"]) if "fielders" in wicket else "None"
+    return ["Yes",wicket["player_out"],wicket["kind"],dismissed_by_fielder]
+
+
+def match_rows(match_id,data,country_of):
+    """Ball by ball rows (PARSED_COLUMNS) of one parsed Cricsheet T20 match, as create_csv builds them.
+
+    The running innings state (score, wickets, run rates) is added to the frame afterwards, see
+    feature_engineering.innings_state.
+    """
+
+    place,toss,result,super_over_winner_team,potm = _match_info(data,country_of)
+    ### the T20 notebook unpacks yyyy-mm-dd as day, month, year ###
+    day,month,year = str(data["info"]["dates"][0]).split("-")
+
+    rows = []
+    for innings_number,inn in enumerate(data["innings"],1):
+        innings_name,innings = list(inn.items())[0]
+        innings_type = "chasing" if innings_number%2 == 0 else "score_setter"
+        current_innings_team = innings["team"]
+        super_over = "Yes" if "super over" in innings_name.lower() else "No"
+
+        for delivery in innings["deliveries"]:
+            over_number,ball = list(delivery.items())[0]
+            runs = ball["runs"]
+            extras_type = list(ball["extras"].keys())[0] if runs["extras"] > 0 else "None"
+            rows.append([match_id] + place + [day,month,year] + toss +
+                [current_innings_team,innings_type,over_number,ball["batsman"],ball["non_striker"],ball["bowler"],
+                 runs["extras"],runs["total"],runs["batsman"],extras_type] +
+                _wicket(ball) + result + [super_over,super_over_winner_team,potm])
+    return rows
+
+
+def odi_match_rows(match_id,data,country_of):
+    """Ball by ball rows (ODI_COLUMNS) of one parsed Cricsheet ODI match, as the ODI create_csv builds them."""
+
+    place,toss,result,super_over_winner_team,potm = _match_info(data,country_of)
+    year,month,day = str(data["info"]["dates"][0]).split("-")
+    teams = data["info"]["teams"]
+
+    rows = []
+    for inn in data["innings"]:
+        innings_name,innings = list(inn.items())[0]
+        current_innings_team = innings["team"]
+        bowling_team = teams[1] if current_innings_team == teams[0] else teams[0]
+        super_over = "Yes" if "super over" in innings_name.lower() else "No"
+
+        for delivery in innings["deliveries"]:
+            over_number,ball = list(delivery.items())[0]
+            runs = ball["runs"]
+            extras_type = list(ball["extras"].keys())[0] if runs["extras"] > 0 else "None"
+            rows.append([match_id] + place + [day,month,year] + toss +
+                [current_innings_team,bowling_team,over_number,ball["batsman"],ball["non_striker"],ball["bowler"],
+                 runs["extras"],runs["total"],runs["batsman"],extras_type] +
+                _wicket(ball) + result + [super_over,super_over_winner_team,potm])
+    return rows
+
+
+def _with_innings_state(df):
+    state = innings_state(df)
+    for column in INNINGS_STATE_COLUMNS:
+        df[column] = state[column].to_numpy()
+    return df[BALL_COLUMNS]
+
+
+##### schema -->> (columns of the rows, row builder, frame post processing) #####
+SCHEMAS = {"t20":(PARSED_COLUMNS,match_rows,_with_innings_state),"odi":(ODI_COLUMNS,odi_match_rows,None)}
+
+
+def balls_frame(data,columns=BALL_COLUMNS):
+    """DataFrame of ball rows or columns with one dtype per column (mixed values such as win_by become strings)."""
+
+    df = pd.DataFrame(data,columns=columns)
+    for column in columns:
+        if column in INT_COLUMNS:
+            df[column] = df[column].astype("int64")
+        elif column in FLOAT_COLUMNS:
+            df[column] = df[column].astype("float64")
+        else:
+            df[column] = df[column].astype(str)
+    return df
+
+
+def load_match(path):
+
+    with open(path) as stream:
+        return yaml.load(stream,Loader=Loader)
+
+
+def parse_match(path,schema="t20",country_of=None):
+
+    build_rows = SCHEMAS[schema][1]
+    return build_rows(match_id_of(path),load_match(path),country_of or VenueCountries())
+
+
+def parse_chunk(paths,schema="t20",country_of=None):
+    """(typed frame of the balls of every file that parsed, [(path, error)] for the ones that did not)
+
+    Rows are appended column by column, a malformed file only adds an entry to the error list.
+    """
+
+    columns,build_rows,finish = SCHEMAS[schema]
+    country_of = country_of or VenueCountries()
+    batch = [[] for _ in columns]
+    errors = []
+    for path in paths:
+        try:
+            rows = build_rows(match_id_of(path),load_match(path),country_of)
+        except Exception as e:
+            errors.append((path,repr(e)))
+            continue
+        for values,column in zip(zip(*rows),batch):
+            column.extend(values)
+    df = balls_frame(dict(zip(columns,batch)),columns)
+    return (finish(df) if finish else df),errors
+
+
+def parse_files(paths,schema="t20",workers=None,files_per_chunk=32,country_of=None):
+    """Yields (ball frame, errors) per chunk of files, chunks parsed across a process pool.
+
+    Batches come back in chunk order (the order of paths) whatever the number of workers, at most two
+    chunks per worker are in flight.
+    country_of (default: the offline venue_countries cache) has to be picklable when workers > 1.
+    """
+
+    paths = list(paths)
+    country_of = country_of or VenueCountries()
+    chunks = [paths[i:i+files_per_chunk] for i in range(0,len(paths),files_per_chunk)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield parse_chunk(chunk,schema,country_of)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        ###### futures in submission order, the oldest is yielded before another chunk is queued ######
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(parse_chunk,chunk,schema,country_of))
+            if len(in_flight) >= 2*workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def parse_folder(folder_path,schema="t20",workers=None,countries=None):
+    """df_data of create_csv as a DataFrame: every .yaml match of the folder, errors reported.
+
+    Countries come from the venue cache; venues its resolver found in the workers are saved to it.
+    """
+
+    countries = countries or VenueCountries()
+    paths = sorted(os.path.join(folder_path,f) for f in os.listdir(folder_path) if f.endswith((".yaml",".yml")))
+    frames = []
+    for frame,errors in parse_files(paths,schema,workers,country_of=countries):
+        frames.append(frame)
+        countries.learn(frame)
+        for path,error in errors:
+            print("Skipped",path,error)
+    countries.save()
+    if not frames:
+        return parse_chunk([],schema,countries)[0]
+    return pd.concat(frames,ignore_index=True)
+
+
+if __name__ == "__main__":
+
+    ####### python cricsheet_parser.py <yaml folder> <out.csv> [--odi] [--workers=N] #######
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    options = dict(a[2:].split("=") if "=" in a else (a[2:],True) for a in sys.argv[1:] if a.startswith("--"))
+    df = parse_folder(args[0],"odi" if "odi" in options else "t20",int(options.get("workers",0)) or None)
+    df.to_csv(args[1],index=False)
+    print("Written",len(df),"balls to",args[1])
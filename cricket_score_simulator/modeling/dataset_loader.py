@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import resource
+import numpy as np
+from sklearn.model_selection import train_test_split
+from columnar_store import FORMATS, BIT_COLUMN, load, load_chunks, columns_of, converted_path, resolve
+
+LABEL = "outcome"
+
+####################### Feature sets of the modeling scripts ###############################
+## name -->> columns left out of the trainable frame (besides the label)
+## out_batsman bits do not add value to the dataset for prediction
+OUT_BATSMAN = ["out_batsman_{}".format(i) for i in range(12)]
+
+FEATURE_SETS = {
+    "all":[],
+    "rf":OUT_BATSMAN,
+    "nn":["batsman_prop5","batsman_prop7","bowler_prop5","bowler_prop7"] + OUT_BATSMAN,
+}
+#############################################################################################
+
+
+def feature_columns(dataset="trainable",feature_set="rf"):
+    """Columns of the feature set, in the order of the dataset."""
+
+    dropped = set(FEATURE_SETS[feature_set]) | {LABEL}
+    return [c for c in columns_of(dataset) if c not in dropped]
+
+
+def matrix_dtype(columns):
+    ### uint8 when every feature is a binary encoded bit, float32 otherwise ###
+    return np.uint8 if all(BIT_COLUMN.match(c) for c in columns) else np.float32
+
+
+def peak_memory_mb():
+    """Peak resident memory of the process so far (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+
+def split_order(n,test_sizes=(),random_state=42):
+    """Row order putting every split in one contiguous block, and the block bounds.
+
+    Each test size splits the last block again with train_test_split, so the blocks hold the same
+    rows, in the same order, as the scripts' chained train_test_split calls.
+    """
+
+    parts = [np.arange(n)]
+    for test_size in test_sizes:
+        train,test = train_test_split(parts[-1],test_size=test_size,random_state=random_state)
+        parts[-1:] = [train,test]
+    bounds = np.cumsum([0] + [len(p) for p in parts])
+    return np.concatenate(parts),bounds
+
+
+class TrainingMatrix:
+    """One contiguous feature matrix and its labels, rows grouped by split (train, test, ...)."""
+
+    def __init__(self,X,y,columns,bounds):
+
+        self.X = X
+        self.y = y
+        self.columns = list(columns)
+        self.bounds = [int(b) for b in bounds]
+
+    def part(self,i):
+        ### views, no copy of the rows ###
+        start,stop = self.bounds[i],self.bounds[i+1]
+        return self.X[start:stop],self.y[start:stop]
+
+    def parts(self):
+        return [self.part(i) for i in range(len(self.bounds) - 1)]
+
+    def report(self):
+        print("Matrix {} {}, {:.1f} MB{}, peak memory {:.1f} MB".format(
+            self.X.shape,self.X.dtype,self.X.nbytes/2**20,
+            " (memory mapped)" if isinstance(self.X,np.memmap) else "",peak_memory_mb()))
+
+
+def _source_signature(dataset):
+    csv_path = resolve(dataset)
+    paths = [csv_path] + [converted_path(csv_path,fmt) for fmt in FORMATS]
+    return [[p,os.path.getsize(p),os.path.getmtime(p)] for p in paths if os.path.exists(p)]
+
+
+def _cache_paths(mmap_dir,dataset,feature_set):
+    stem = "{}__{}".format(os.path.splitext(os.path.basename(resolve(dataset)))[0],feature_set)
+    return [os.path.join(mmap_dir,stem + suffix) for suffix in (".X.npy",".y.npy",".json")]
+
+
+def load_matrix(dataset="trainable",feature_set="rf",test_sizes=(),random_state=42,outcomes=None,
+                relabel=None,dtype=None,mmap_dir=None,chunksize=500000):
+    """TrainingMatrix of the trainable frame, filled chunk by chunk into a preallocated array.
+
+    Only the labels are read whole (to know the rows and the split order up front); the features
+    are streamed through columnar_store.load_chunks and written straight to their split position,
+    so the matrix is the only full copy. outcomes keeps rows with these labels only, relabel maps
+    labels after that. With mmap_dir the matrix is a .npy memory map there, reused while the
+    dataset and the arguments are unchanged.
+    """
+
+    columns = feature_columns(dataset,feature_set)
+    dtype = np.dtype(dtype or matrix_dtype(columns))
+    key = {"source":_source_signature(dataset),"columns":columns,"dtype":dtype.str,
+           "test_sizes":list(test_sizes),"random_state":random_state,
+           "outcomes":None if outcomes is None else [int(o) for o in outcomes],
+           "relabel":None if relabel is None else {str(k):int(v) for k,v in relabel.items()}}
+
+    if mmap_dir is not None:
+        x_path,y_path,key_path = _cache_paths(mmap_dir,dataset,feature_set)
+        if os.path.exists(key_path):
+            with open(key_path) as f:
+                cached = json.load(f)
+            if cached["key"] == key:
+                return TrainingMatrix(np.load(x_path,mmap_mode="r"),np.load(y_path),columns,cached["bounds"])
+
+    labels = load(dataset,[LABEL])[LABEL].to_numpy(np.int64)
+    keep = np.ones(len(labels),dtype=bool) if outcomes is None else np.isin(labels,list(outcomes))
+    labels = labels[keep]
+    if relabel:
+        labels = np.select([labels == k for k in relabel],list(relabel.values()),labels)
+
+    ###### destination row of every kept source row ######
+    order,bounds = split_order(len(labels),test_sizes,random_state)
+    destination = np.empty(len(order),dtype=np.int64)
+    destination[order] = np.arange(len(order))
+
+    if mmap_dir is not None:
+        os.makedirs(mmap_dir,exist_ok=True)
+        X = np.lib.format.open_memmap(x_path + ".tmp",mode="w+",dtype=dtype,shape=(len(labels),len(columns)))
+    else:
+        X = np.empty((len(labels),len(columns)),dtype=dtype)
+
+    source_row = 0
+    kept_row = 0
+    for chunk in load_chunks(dataset,columns,chunksize):
+        chunk_keep = keep[source_row:source_row + len(chunk)]
+        values = chunk[columns].to_numpy(dtype=dtype)[chunk_keep]
+        X[destination[kept_row:kept_row + len(values)]] = values
+        source_row += len(chunk)
+        kept_row += len(values)
+
+    y = labels[order]
+    if mmap_dir is not None:
+        X.flush()
+        del X
+        os.replace(x_path + ".tmp",x_path)
+        np.save(y_path,y)
+        with open(key_path,"w") as f:
+            json.dump({"key":key,"bounds":[int(b) for b in bounds]},f)
+        X = np.load(x_path,mmap_mode="r")
+    return TrainingMatrix(X,y,columns,bounds)
+
+
+if __name__ == "__main__":
+
+    ####### python dataset_loader.py [dataset or csv] [feature set] [--mmap=dir] #######
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    options = dict(a[2:].split("=") for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    matrix = load_matrix(args[0] if args else "trainable",args[1] if len(args) > 1 else "rf",
+                         mmap_dir=options.get("mmap"))
+    matrix.report()
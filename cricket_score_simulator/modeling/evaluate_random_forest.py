@@ -1,119 +1,148 @@
-import pandas as pd
+import os
+import sys
 import numpy as np
-from sklearn.model_selection import train_test_split
-# importing random forest classifier from assemble module
-from sklearn.ensemble import RandomForestClassifier
+import pandas as pd
+from dataset_loader import load_matrix
 import joblib
-from tqdm import tqdm
-
-
-###Read trainable data###
-df = pd.read_csv("Final_T20_trainable.csv")
-######### omitting out batsman data (does not add value to the dataset for prediction)
-data = df.drop(['out_batsman_0' ,'out_batsman_1', 'out_batsman_2', 'out_batsman_3',
- 'out_batsman_4' ,'out_batsman_5', 'out_batsman_6' ,'out_batsman_7',
- 'out_batsman_8' ,'out_batsman_9' ,'out_batsman_10', 'out_batsman_11',"outcome"],axis=1)
-#############################################################
-#data = df.drop(["outcome"],axis=1)
-labels = df["outcome"].values
-
-del df
-#############creating numpy array from df data###########
-data_arr = np.array(data)
-print("DATA CREATED",data_arr.shape)
-#### Splitting the data to create train and val data####
-X_train,X_test,y_train,y_test = train_test_split(data_arr,labels,test_size=0.30,random_state=42)
-################### ###################
-
-print(X_test.shape)
-########## load model ########
-model_path = "/home/shivargha/cricket_analytics/cricket_score_simulator/finalized_rf_model_v3.sav"
-clf_rf = joblib.load(model_path)
+
+########## saved models compared on the same test split ########
+MODEL_PATHS = ["/home/shivargha/cricket_analytics/cricket_score_simulator/finalized_rf_model_v3.sav",
+               "/home/shivargha/cricket_analytics/cricket_score_simulator/finalized_rf_model_v6.sav"]
+
+##### memory mapped matrix of the trainable frame, built on the first run #####
+CACHE_DIR = "/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/matrix_cache/"
+PREDICTIONS_DIR = "/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/predictions/"
+
+BATCH_SIZE = 50000
+CALIBRATION_BINS = 10
+##### 8 is the wicket #####
+LABELS = [0,1,2,3,4,5,6,7,8]
 ###########################
 
 
-########## getting the label counts #######
-count_zeros = y_test.size - np.count_nonzero(y_test)
-count_1s = np.count_nonzero(y_test == 1)
-count_2s = np.count_nonzero(y_test == 2)
-count_3s = np.count_nonzero(y_test == 3)
-count_4s = np.count_nonzero(y_test == 4)
-count_5s = np.count_nonzero(y_test == 5)
-count_6s = np.count_nonzero(y_test == 6)
-count_7s = np.count_nonzero(y_test == 7)
-count_wickets = np.count_nonzero(y_test == 8)
-######################## #######################
-
-correct_num = 0
-correct_pred_dict = {0:0,1:0,2:0,3:0,4:0,5:0,6:0,7:0,8:0}
-
-for i in tqdm(range(X_test.shape[0])):
-        pred,actual = clf_rf.predict(X_test[i].reshape(1,-1)),y_test[i]
-        with open("pred.txt","a") as f:
-                f.write(str(pred)+" "+str(actual))
-                f.write("\n")
-        #print(pred,actual)
-        if pred == actual:
-                correct_num = correct_num + 1
-                if actual == 0:
-                        correct_pred_dict[0] =correct_pred_dict[0] + 1
-
-                elif actual == 1:
-                        correct_pred_dict[1] =correct_pred_dict[1] + 1
-
-                elif actual == 2:
-                        correct_pred_dict[2] =correct_pred_dict[2] + 1
-
-                elif actual == 3:
-                        correct_pred_dict[3] =correct_pred_dict[3] + 1
-
-                elif actual == 4:
-                        correct_pred_dict[4] =correct_pred_dict[4] + 1
-
-                elif actual == 5:
-                        correct_pred_dict[5] =correct_pred_dict[5] + 1
-
-                elif actual == 6:
-                        correct_pred_dict[6] =correct_pred_dict[6] + 1
-
-                elif actual == 7:
-                        correct_pred_dict[7] =correct_pred_dict[7] + 1
-
-                elif actual == 8:
-                        correct_pred_dict[8] =correct_pred_dict[8] + 1
-        
-
-######################################################################## 
-print("Accuracy Metrics")     
-print("Accuracy:",correct_num/X_test.shape[0])
-print("Accuracy of 0s:",correct_pred_dict[0]/count_zeros)
-print("Accuracy of 1s:",correct_pred_dict[1]/count_1s)
-print("Accuracy of 2s:",correct_pred_dict[2]/count_2s)
-print("Accuracy of 3s:",correct_pred_dict[3]/count_3s)
-print("Accuracy of 4s:",correct_pred_dict[4]/count_4s)
-print("Accuracy of 5s:",correct_pred_dict[5]/count_5s)
-print("Accuracy of 6s:",correct_pred_dict[6]/count_6s)
-print("Accuracy of 7s:",correct_pred_dict[7]/count_7s)
-print("Accuracy of Wickets:",correct_pred_dict[8]/count_wickets)
-#########################################################################
-
-
-################################################################
-print("Predicted Counts")
-print("Predicted number of 0s:{} out of {}".format(correct_pred_dict[0],count_zeros))
-print("Predicted number of 1s:{} out of {}".format(correct_pred_dict[1],count_1s))
-print("Predicted number of 2s:{} out of {}".format(correct_pred_dict[2],count_2s))
-print("Predicted number of 3s:{} out of {}".format(correct_pred_dict[3],count_3s))
-print("Predicted number of 4s:{} out of {}".format(correct_pred_dict[4],count_4s))
-print("Predicted number of 5s:{} out of {}".format(correct_pred_dict[5],count_5s))
-print("Predicted number of 6s:{} out of {}".format(correct_pred_dict[6],count_6s))
-print("Predicted number of 7s:{} out of {}".format(correct_pred_dict[7],count_7s))
-print("Predicted number of wickets:{} out of {}".format(correct_pred_dict[8],count_wickets))
-################################################################
-
-
-
-# Accuracy Metrics                                                                                                      
+def test_split(feature_set="rf",dataset="trainable",cache_dir=CACHE_DIR):
+    """(X_test, y_test) of the 70/30 split of the training scripts, read from the matrix cache."""
+
+    ######### omitting out batsman data (does not add value to the dataset for prediction)
+    matrix = load_matrix(dataset,feature_set,test_sizes=[0.30],random_state=42,mmap_dir=cache_dir)
+    matrix.report()
+    return matrix.part(1)
+
+
+def predict_batches(model,X,batch_size=BATCH_SIZE,n_jobs=-1):
+    """Class probabilities of every row (columns: model.classes_), predict_proba on batch_size rows at a time."""
+
+    if hasattr(model,"n_jobs"):
+        model.n_jobs = n_jobs
+    ##### trees run on float32, converting once avoids a copy per batch #####
+    return np.concatenate([model.predict_proba(np.asarray(X[start:start+batch_size],dtype=np.float32))
+                           for start in range(0,len(X),batch_size)])
+
+
+def confusion_matrix(actual,predicted,labels=LABELS):
+    """counts[i,j]: rows labelled labels[i] predicted as labels[j]"""
+
+    labels = np.asarray(labels)
+    k = len(labels)
+    actual_ids,predicted_ids = np.searchsorted(labels,actual),np.searchsorted(labels,predicted)
+    return np.bincount(actual_ids*k + predicted_ids,minlength=k*k).reshape(k,k)
+
+
+def class_metrics(confusion,labels=LABELS):
+    """Per label support, predicted count, correct count, precision and recall (NaN without rows)."""
+
+    correct = np.diag(confusion)
+    support,predicted = confusion.sum(axis=1),confusion.sum(axis=0)
+    with np.errstate(divide="ignore",invalid="ignore"):
+        return pd.DataFrame({"support":support,"predicted":predicted,"correct":correct,
+                             "precision":correct/predicted,"recall":correct/support},index=labels)
+
+
+def log_loss(actual,proba,classes):
+    ### probabilities clipped to machine epsilon like sklearn's log_loss, labels the model never saw get eps ###
+    eps = np.finfo(proba.dtype).eps
+    columns = np.searchsorted(classes,actual)
+    known = (columns < len(classes)) & (classes[np.minimum(columns,len(classes) - 1)] == actual)
+    p = np.where(known,proba[np.arange(len(actual)),np.minimum(columns,len(classes) - 1)],0.0)
+    return float(-np.mean(np.log(np.clip(p,eps,1.0))))
+
+
+def calibration(actual,proba,classes,bins=CALIBRATION_BINS):
+    """Reliability table of the top class probability: rows, mean confidence and accuracy per bin, and the ECE."""
+
+    confidence = proba.max(axis=1)
+    hit = classes[proba.argmax(axis=1)] == actual
+    bin_ids = np.minimum((confidence*bins).astype(np.int64),bins - 1)
+    rows = np.bincount(bin_ids,minlength=bins)
+    with np.errstate(divide="ignore",invalid="ignore"):
+        table = pd.DataFrame({"rows":rows,
+                              "confidence":np.bincount(bin_ids,confidence,bins)/rows,
+                              "accuracy":np.bincount(bin_ids,hit,bins)/rows},
+                             index=["{:.1f}-{:.1f}".format(i/bins,(i + 1)/bins) for i in range(bins)])
+    ece = float(np.nansum(rows*np.abs(table["accuracy"] - table["confidence"]))/len(actual))
+    return table,ece
+
+
+def write_predictions(path,actual,proba,classes):
+    ### one columnar file per model instead of a line per prediction ###
+    frame = pd.DataFrame({"actual":actual.astype(np.int8),"predicted":classes[proba.argmax(axis=1)].astype(np.int8)})
+    for j,label in enumerate(classes):
+        frame["prob_{}".format(label)] = proba[:,j].astype(np.float32)
+    frame.to_parquet(path,index=False,compression="zstd")
+    return path
+
+
+def evaluate(model_path,X_test,y_test,n_jobs=-1,batch_size=BATCH_SIZE,predictions_dir=PREDICTIONS_DIR):
+    """Metrics of one saved model on the test split, predictions written to predictions_dir."""
+
+    model = joblib.load(model_path)
+    classes = np.asarray(model.classes_)
+    proba = predict_batches(model,X_test,batch_size,n_jobs)
+    predicted = classes[proba.argmax(axis=1)]
+
+    confusion = confusion_matrix(y_test,predicted)
+    table,ece = calibration(y_test,proba,classes)
+    result = {"model":os.path.basename(model_path),"accuracy":float(np.mean(predicted == y_test)),
+              "log_loss":log_loss(y_test,proba,classes),"ece":ece,
+              "confusion":confusion,"classes":class_metrics(confusion),"calibration":table}
+    if predictions_dir is not None:
+        os.makedirs(predictions_dir,exist_ok=True)
+        name = os.path.splitext(result["model"])[0] + "_predictions.parquet"
+        result["predictions"] = write_predictions(os.path.join(predictions_dir,name),y_test,proba,classes)
+    return result
+
+
+def print_report(result):
+
+    print("########", result["model"], "########")
+    print("Accuracy:",result["accuracy"])
+    print("Log loss:",result["log_loss"])
+    print("Expected calibration error:",result["ece"])
+    print("Per outcome metrics (8 = wicket)")
+    print(result["classes"].to_string())
+    print("Confusion matrix (rows actual, columns predicted)")
+    print(pd.DataFrame(result["confusion"],index=LABELS,columns=LABELS).to_string())
+    print("Calibration of the top class probability")
+    print(result["calibration"].to_string())
+    if "predictions" in result:
+        print("Predictions written to",result["predictions"])
+
+
+if __name__ == "__main__":
+
+    ####### python evaluate_random_forest.py [model.sav ...] [--n_jobs=N] [--batch=N] #######
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    options = dict(a[2:].split("=") for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    X_test,y_test = test_split()
+    print("Test rows:",X_test.shape)
+    results = [evaluate(path,X_test,y_test,int(options.get("n_jobs",-1)),int(options.get("batch",BATCH_SIZE)))
+               for path in args or MODEL_PATHS]
+    for result in results:
+        print_report(result)
+    print(pd.DataFrame([{k:r[k] for k in ("model","accuracy","log_loss","ece")} for r in results]).to_string(index=False))
+
+
+# Accuracy Metrics
 # Accuracy: 0.6004198329065032
 # Accuracy of 0s: 0.6933867735470942
 # Accuracy of 1s: 0.7671437881677086
@@ -133,4 +162,4 @@ print("Predicted number of wickets:{} out of {}".format(correct_pred_dict[8],cou
 # Predicted number of 5s:2 out of 21
 # Predicted number of 6s:1354 out of 4929
 # Predicted number of 7s:0 out of 1
-# Predicted number of wickets:1141 out of 6480
\ No newline at end of file
+# Predicted number of wickets:1141 out of 6480
@@ -0,0 +1,224 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+####################### Running match state of the T20 ball by ball frame ###############################
+## Computed per innings / per (match, player) with grouped cumulative sums instead of the row loops of
+## create_csv and T20_Data_Analysis_Feature_Engineering.ipynb. Rows have to be in ball order, matches
+## contiguous (as the Cricsheet parser writes them).
+
+INNINGS_STATE_COLUMNS = ["curr_score","curr_wickers","current_run_rate","req_run_rate"]
+BATSMAN_STATE_COLUMNS = ["batsman_score","balls_faced_batsman","batsman_strike_rate"]
+BOWLER_STATE_COLUMNS = ["runs_conceded_by_bowler","balls_bowled_bowler","wickets_by_bower","bowler_economy"]
+
+T20_BALLS = 120
+
+BATSMAN_PROP_COLUMNS = ["batsman_prop{}".format(i) for i in range(8)]
+BOWLER_PROP_COLUMNS = ["bowler_prop{}".format(i) for i in range(9)]
+############# highest batsman runs is 7, hence taking 8 as wicket #####
+WICKET_OUTCOME = 8
+
+##Run Out/Obstructing the field  Considered here as bowler's wicket for simplicity###
+NON_BOWLER_OUT_TYPES = ["None","retired hurt","retired out","retired not out"]
+
+##### stage name of the ingest manifest (cricsheet_ingest.py) the feature build is recorded under #####
+FEATURES_STAGE = "features"
+#########################################################################################################
+
+
+def _round(values):
+    ### round() of the notebook: half to even, as np.rint ###
+    return np.rint(values).astype(np.int64)
+
+
+def _running(values,groups):
+    return pd.Series(values).groupby(groups,sort=False).cumsum().to_numpy()
+
+
+def innings_ids(df):
+    """Number of the innings every row belongs to, counting up through the frame."""
+
+    keys = df[["matchid","current_innings","innings_type","super_over"]]
+    starts = (keys != keys.shift()).any(axis=1).to_numpy()
+    return np.cumsum(starts)
+
+
+def innings_state(df):
+    """curr_score, curr_wickers, current_run_rate and req_run_rate of every ball.
+
+    Only balls without extras count towards the balls bowled. A chasing innings chases the total of the
+    innings right before it, with T20_BALLS less the balls bowled so far remaining.
+    """
+
+    innings = innings_ids(df)
+    score = _running(df["total_runs"].to_numpy(np.int64),innings)
+    balls = _running((df["extras"].to_numpy() == 0).astype(np.int64),innings)
+    wickets = _running((df["out"].to_numpy() == "Yes").astype(np.int64),innings)
+
+    current_run_rate = _round(score/(np.maximum(balls,1)/6))
+
+    innings_total = pd.Series(score).groupby(innings,sort=False).last()
+    runs_set = innings_total.reindex(innings - 1).fillna(0).to_numpy(np.int64)
+    balls_rem = T20_BALLS - balls
+    runs_remaining = np.maximum(runs_set - score,0)
+    req_run_rate = _round(runs_remaining/(np.where(balls_rem == 0,1,balls_rem)/6))
+    req_run_rate = np.where(df["innings_type"].to_numpy() == "chasing",req_run_rate,0)
+
+    return pd.DataFrame({"curr_score":score,"curr_wickers":wickets,"current_run_rate":current_run_rate,
+                         "req_run_rate":req_run_rate},index=df.index)
+
+
+def batsman_state(df):
+    """batsman_score, balls_faced_batsman (every ball faced, wides included) and batsman_strike_rate.
+
+    The running totals are per (match, batsman): a batsman who retires and comes back carries on where
+    they left off, a new match starts again from 0.
+    """
+
+    groups = [df["matchid"].to_numpy(),df["batsman"].to_numpy()]
+    score = _running(df["batsman_runs"].to_numpy(np.int64),groups)
+    balls = pd.Series(np.ones(len(df),dtype=np.int64)).groupby(groups,sort=False).cumsum().to_numpy()
+    return pd.DataFrame({"batsman_score":score,"balls_faced_batsman":balls,
+                         "batsman_strike_rate":score/balls*100},index=df.index)
+
+
+def bowler_wicket(df):
+    """Balls on which the bowler is credited with the wicket (everything but retirements)."""
+
+    return (df["out"].to_numpy() == "Yes") & ~df["dismissal_type"].isin(NON_BOWLER_OUT_TYPES).to_numpy()
+
+
+def bowler_state(df):
+    """runs_conceded_by_bowler (runs off the bat), balls_bowled_bowler, wickets_by_bower, bowler_economy per (match, bowler)."""
+
+    groups = [df["matchid"].to_numpy(),df["bowler"].to_numpy()]
+    runs = _running(df["batsman_runs"].to_numpy(np.int64),groups)
+    balls = pd.Series(np.ones(len(df),dtype=np.int64)).groupby(groups,sort=False).cumsum().to_numpy()
+    wickets = _running(bowler_wicket(df).astype(np.int64),groups)
+    return pd.DataFrame({"runs_conceded_by_bowler":runs,"balls_bowled_bowler":balls,"wickets_by_bower":wickets,
+                         "bowler_economy":_round(runs/(balls/6))},index=df.index)
+
+
+def bowler_outcome(df):
+    """Outcome of every ball for the bowler: runs off the bat, WICKET_OUTCOME for the bowler's wickets."""
+
+    return np.where(bowler_wicket(df),WICKET_OUTCOME,df["batsman_runs"].to_numpy(np.int64))
+
+
+def outcome_proportions(df,outcome,player,columns):
+    """Share of each outcome in the player's balls of the match so far, as float32 columns.
+
+    One hot outcomes are counted with a grouped cumsum per (match, player) and divided by the balls so
+    far (the row sum of the counts), rounded to 4 decimals like the notebook's dicts.
+    """
+
+    groups = [df["matchid"].to_numpy(),df[player].to_numpy()]
+    one_hot = (np.asarray(outcome)[:,None] == np.arange(len(columns))).astype(np.int32)
+    counts = pd.DataFrame(one_hot).groupby(groups,sort=False).cumsum().to_numpy()
+    balls = counts.sum(axis=1)
+    props = pd.DataFrame(index=df.index)
+    for i,column in enumerate(columns):
+        props[column] = np.round(counts[:,i]/balls,4).astype(np.float32)
+    return props
+
+
+def add_outcome_proportions(df):
+    """batsman_prop0..7 (runs off the bat) and bowler_prop0..8 (runs, 8 = wicket) columns."""
+
+    for props in (outcome_proportions(df,df["batsman_runs"].to_numpy(),"batsman",BATSMAN_PROP_COLUMNS),
+                  outcome_proportions(df,bowler_outcome(df),"bowler",BOWLER_PROP_COLUMNS)):
+        for column in props.columns:
+            df[column] = props[column].to_numpy()
+    return df
+
+
+def bowling_team(df):
+    """bowling_team_name of every ball: the team of match_between ("A vs B") not batting in current_innings."""
+
+    teams = df["match_between"].astype(str).str.split(" vs ",n=1,expand=True)
+    first,second = teams[0].str.strip().to_numpy(),teams[1].str.strip().to_numpy()
+    return np.where(first == df["current_innings"].astype(str).to_numpy(),second,first)
+
+
+def add_running_features(df):
+    """Batsman and bowler running state columns (the create_csv innings state is added by the parser)."""
+
+    for state in (batsman_state(df),bowler_state(df)):
+        for column in state.columns:
+            df[column] = state[column].to_numpy()
+    return df
+
+
+def match_features(df):
+    """Running state, outcome proportions and bowling_team_name of the balls of whole matches."""
+
+    df = add_outcome_proportions(add_running_features(df))
+    df["bowling_team_name"] = bowling_team(df)
+    return df
+
+
+def _rated(df,columns,player):
+    ### ratings table of the players already attached to df (a player's columns are the same on every row) ###
+    return df.groupby(player,sort=False,observed=True)[list(columns)].first()
+
+
+def _rerated(ratings,fresh,players):
+    return pd.concat([ratings[~ratings.index.isin(players)],fresh])
+
+
+def build_features(store_dir,out_path,ratings_path=None):
+    """Feature rows of the ingest store written to out_path, rebuilt only where the store changed.
+
+    Per match features are computed for the matches stale_matches reports for FEATURES_STAGE, the rows of
+    the other matches are kept from the previous out_path. Career ratings are recomputed only for the
+    players of rebuilt or removed matches (stale_players), every other rating is read back from the
+    previous rows. Returns (rows written, matches rebuilt, players rerated).
+    """
+
+    from cricsheet_ingest import load_balls, mark_built, read_manifest, stale_matches, stale_players
+    from player_ratings import RATINGS_PATH, add_ratings, batsman_ratings, bowler_ratings, save_ratings
+
+    rebuild,gone = stale_matches(FEATURES_STAGE,store_dir)
+    previous = pd.read_parquet(out_path) if os.path.exists(out_path) else None
+    if previous is None:
+        ###### nothing to merge into, every match of the store is built ######
+        rebuild = sorted(e["match_id"] for e in read_manifest(store_dir)["files"].values())
+    elif not rebuild and not gone:
+        return len(previous),[],[]
+
+    new = match_features(load_balls(store_dir,rebuild))
+    if previous is None:
+        df = new
+        batting,bowling = batsman_ratings(df),bowler_ratings(df)
+        players = sorted(set(batting.index) | set(bowling.index))
+    else:
+        ###### players of the old version of a rebuilt match or of a removed one change as well ######
+        replaced = previous["matchid"].isin(set(rebuild) | set(gone)).to_numpy()
+        players = set(stale_players(FEATURES_STAGE,store_dir))
+        for column in ("batsman","non_striker","bowler"):
+            players.update(previous.loc[replaced,column].unique())
+        players = sorted(players)
+
+        kept = previous[~replaced]
+        df = pd.concat([kept,new],ignore_index=True)
+        ###### match_id order, as load_balls returns the store ######
+        df = df.iloc[np.argsort(df["matchid"].to_numpy(dtype=str),kind="stable")].reset_index(drop=True)
+        batting = batsman_ratings(df[df["batsman"].isin(players)])
+        bowling = bowler_ratings(df[df["bowler"].isin(players)])
+        batting = _rerated(_rated(kept,batting.columns,"batsman"),batting,players)
+        bowling = _rerated(_rated(kept,bowling.columns,"bowler"),bowling,players)
+
+    df = add_ratings(df,batting,bowling)
+    df.to_parquet(out_path,index=False,compression="zstd")
+    save_ratings(batting,bowling,ratings_path or RATINGS_PATH)
+    mark_built(FEATURES_STAGE,rebuild,store_dir)
+    return len(df),rebuild,players
+
+
+if __name__ == "__main__":
+
+    ####### python feature_engineering.py <ingest store dir> <out.parquet> [ratings.npz] #######
+    ####### only matches changed since the last build (and their players' ratings) are recomputed #######
+    n_rows,rebuilt,players = build_features(*sys.argv[1:4])
+    print("Rebuilt",len(rebuilt),"matches,",len(players),"players rerated,",n_rows,"rows in",sys.argv[2])
@@ -0,0 +1,106 @@
+import sys
+import numpy as np
+import pandas as pd
+from columnar_store import load
+
+##### per player ratings table read by the simulator (cric_sim/encoding_index.PlayerRatings) #####
+from simulator_files import RATINGS_PATH
+
+BATSMAN_RATINGS = ["explosivity","running_rating","power_play_rating","end_over_explosivity"]
+BOWLER_RATINGS = ["wicket_taking_rating","bowling_consistency_rating"]
+
+RATING_INPUTS = ["matchid","over","batsman","bowler","batsman_runs","out"]
+#################################################################################
+
+
+def experience(matches):
+    """matches played -->> Low (< 10), Medium (10 to 50), High (> 50)"""
+
+    matches = np.asarray(matches)
+    return np.select([matches > 50,matches >= 10],["High","Medium"],"Low")
+
+
+def batsman_ratings(df):
+    """One row per batsman (order of first appearance): BATSMAN_RATINGS and batting_experience.
+
+    explosivity/running_rating are the shares of balls faced hit for 4 or 6 / run for 1, 2 or 3; the
+    power play (over <= 6) and end over (over >= 15) ratings are the boundary shares of those overs,
+    0 without a ball faced there.
+    """
+
+    runs = df["batsman_runs"].to_numpy()
+    over = df["over"].to_numpy()
+    boundary = np.isin(runs,[4,6])
+    power_play,end_overs = over <= 6.0,over >= 15.0
+    balls = pd.DataFrame({"batsman":df["batsman"].to_numpy(),"matchid":df["matchid"].to_numpy(),
+        "boundary":boundary,"running":np.isin(runs,[1,2,3]),
+        "power_play":power_play,"power_play_boundary":power_play & boundary,
+        "end_overs":end_overs,"end_overs_boundary":end_overs & boundary})
+
+    totals = balls.groupby("batsman",sort=False,observed=True).agg(
+        balls=("boundary","size"),boundary=("boundary","sum"),running=("running","sum"),
+        power_play=("power_play","sum"),power_play_boundary=("power_play_boundary","sum"),
+        end_overs=("end_overs","sum"),end_overs_boundary=("end_overs_boundary","sum"),
+        matches=("matchid","nunique"))
+
+    ratings = pd.DataFrame(index=totals.index)
+    ratings["explosivity"] = totals["boundary"]/totals["balls"]
+    ratings["running_rating"] = totals["running"]/totals["balls"]
+    ratings["power_play_rating"] = (totals["power_play_boundary"]/totals["power_play"]).fillna(0)
+    ratings["end_over_explosivity"] = (totals["end_overs_boundary"]/totals["end_overs"]).fillna(0)
+    ratings["batting_experience"] = experience(totals["matches"])
+    return ratings
+
+
+def bowler_ratings(df):
+    """One row per bowler (order of first appearance): BOWLER_RATINGS and bowler_experience.
+
+    wicket_taking_rating is the share of balls with a dismissal (any kind); bowling_consistency_rating
+    the runs off the bat per dismissal, or the runs when there was none.
+    """
+
+    balls = pd.DataFrame({"bowler":df["bowler"].to_numpy(),"matchid":df["matchid"].to_numpy(),
+        "out":df["out"].to_numpy() == "Yes","batsman_runs":df["batsman_runs"].to_numpy(np.int64)})
+
+    totals = balls.groupby("bowler",sort=False,observed=True).agg(
+        balls=("out","size"),outs=("out","sum"),runs=("batsman_runs","sum"),matches=("matchid","nunique"))
+
+    ratings = pd.DataFrame(index=totals.index)
+    ratings["wicket_taking_rating"] = totals["outs"]/totals["balls"]
+    ratings["bowling_consistency_rating"] = totals["runs"]/totals["outs"].clip(lower=1)
+    ratings["bowler_experience"] = experience(totals["matches"])
+    return ratings
+
+
+def _attach(df,ratings,player):
+    rows = ratings.index.get_indexer(df[player])
+    for column in ratings.columns:
+        df[column] = ratings[column].to_numpy()[rows]
+    return df
+
+
+def add_ratings(df,batting=None,bowling=None):
+    """Rating columns of every row's batsman and bowler (computed from df unless given)."""
+
+    batting = batsman_ratings(df) if batting is None else batting
+    bowling = bowler_ratings(df) if bowling is None else bowling
+    return _attach(_attach(df,batting,"batsman"),bowling,"bowler")
+
+
+def save_ratings(batting,bowling,path=RATINGS_PATH):
+    """<side>__keys / <side>__values / <side>__columns arrays, the layout of the encoding index."""
+
+    arrays = {}
+    for side,ratings,columns in (("batsman",batting,BATSMAN_RATINGS),("bowler",bowling,BOWLER_RATINGS)):
+        arrays[side + "__keys"] = ratings.index.to_numpy(dtype=str)
+        arrays[side + "__values"] = ratings[columns].to_numpy(dtype=np.float64)
+        arrays[side + "__columns"] = np.array(columns)
+    np.savez(path,**arrays)
+    return path
+
+
+if __name__ == "__main__":
+
+    ####### python player_ratings.py [dataset or csv] [ratings.npz] #######
+    df = load(sys.argv[1] if len(sys.argv) > 1 else "t20is",RATING_INPUTS)
+    print("Ratings written to",save_ratings(batsman_ratings(df),bowler_ratings(df),*sys.argv[2:3]))
@@ -1,35 +1,28 @@
-import pandas as pd
+import os
+import sys
+import json
+import time
+import hashlib
 import numpy as np
-from sklearn.model_selection import train_test_split
+import pandas as pd
+from joblib import Parallel, delayed
+from dataset_loader import load_matrix
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import RandomizedSearchCV
-
-
-
-
+from sklearn.model_selection import ParameterSampler
 
-
-###Read trainable data###
-df = pd.read_csv("Final_T20_trainable.csv")
-data = df.drop(["outcome"],axis=1)
-labels = df["outcome"].values
-
-#############creating numpy array from df data###########
-data_arr = np.array(data)
-#### Splitting the data to create train and val data####
-X_train,X_test,y_train,y_test = train_test_split(data_arr,labels,\
-                                test_size=0.35,random_state=42)
-################### ###################
-print('DATA SHAPES:',X_train.shape,y_train.shape)
-print("DATA CREATED")
+##### every finished trial is appended here, a restarted search skips the ones already in it #####
+TRIALS_PATH = "/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/rf_tuning_trials.jsonl"
+LEADERBOARD_PATH = "/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/rf_tuning_leaderboard.csv"
+##### memory mapped training matrix shared by the worker processes #####
+CACHE_DIR = "/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/matrix_cache/"
 
 
 ####creating the Search Grid for Random Search###########
 
 # Number of trees in random forest
 n_estimators = [int(x) for x in np.linspace(start = 100, stop = 1000, num = 10)]
-# Number of features to consider at every split
-max_features = ['auto', 'sqrt']
+# Number of features to consider at every split ('auto' was sqrt for classifiers, removed from sklearn)
+max_features = ['sqrt', 'log2']
 # Maximum number of levels in tree
 max_depth = [int(x) for x in np.linspace(10, 200, num = 11)]
 max_depth.append(None)
@@ -44,13 +37,182 @@ random_grid = {'n_estimators': n_estimators,
                'min_samples_split': min_samples_split}
 #################################
 
-print("RANDOM SEARCH GRID:",random_grid)
-
-
-#### initiating the random search ####
-clf_rf = RandomForestClassifier()
-rf_random_search = RandomizedSearchCV(estimator = clf_rf, param_distributions = random_grid,\
-            n_iter = 100, cv = 3, verbose=3, random_state=42)
-
-rf_random_search.fit(X_train, y_train)
-print("Best Features:",rf_random_search.best_params_)
\ No newline at end of file
+####################### Successive halving ###############################
+## rung 0 fits every candidate with the smallest resource, each rung keeps the best 1/ETA of them and
+## multiplies the resource by ETA. resource "trees": n_estimators grows up to MAX_TREES (the grid's
+## n_estimators is not sampled), "samples": training rows grow up to the whole train split.
+ETA = 3
+MIN_TREES = 30
+MAX_TREES = 1000
+MIN_SAMPLES = 20000
+
+LATENCY_REPEATS = 20
+LATENCY_BATCH = 1000
+##########################################################################
+
+
+def candidates(n_candidates=100,resource="trees",random_state=42):
+    grid = {k:v for k,v in random_grid.items() if not (resource == "trees" and k == "n_estimators")}
+    return list(ParameterSampler(grid,n_iter=n_candidates,random_state=random_state))
+
+
+def rung_resources(resource="trees",n_train=None):
+    """Resource of every rung: tree counts, or train rows ending at the whole split."""
+
+    low,high = (MIN_TREES,MAX_TREES) if resource == "trees" else (MIN_SAMPLES,n_train)
+    low = min(low,high)
+    resources = [low]
+    while resources[-1]*ETA < high:
+        resources.append(resources[-1]*ETA)
+    if resources[-1] < high:
+        resources.append(high)
+    return [int(r) for r in resources]
+
+
+def search_key(config):
+    ### trials of one search configuration, so several searches can share the trials file ###
+    return hashlib.sha1(json.dumps(config,sort_keys=True).encode()).hexdigest()[:12]
+
+
+def read_trials(key,path=TRIALS_PATH):
+    """{(candidate, rung): trial} of the finished trials of a search."""
+
+    trials = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    trial = json.loads(line)
+                except ValueError:
+                    ##### line cut short by a crash #####
+                    continue
+                if trial["search"] == key:
+                    trials[(trial["candidate"],trial["rung"])] = trial
+    return trials
+
+
+def _open_log(path):
+    ### a crash can leave a half written last line: new trials start on a line of their own ###
+    log = open(path,"a+b")
+    if log.tell() > 0:
+        log.seek(-1,os.SEEK_END)
+        if log.read(1) != b"\n":
+            log.write(b"\n")
+    log.close()
+    return open(path,"a")
+
+
+def predict_latency(clf,X):
+    """(median ms of a one row predict_proba, us per row of a LATENCY_BATCH rows call)"""
+
+    clf.set_params(n_jobs=1)
+    row = np.ascontiguousarray(X[:1])
+    single = []
+    for _ in range(LATENCY_REPEATS):
+        start = time.perf_counter()
+        clf.predict_proba(row)
+        single.append(time.perf_counter() - start)
+    batch = np.ascontiguousarray(X[:LATENCY_BATCH])
+    start = time.perf_counter()
+    clf.predict_proba(batch)
+    per_row = (time.perf_counter() - start)/len(batch)
+    return float(np.median(single)*1e3),per_row*1e6
+
+
+def run_trial(matrix_args,params,resource,amount,random_state=42):
+    """Fit one candidate with its rung's resource, validation accuracy and timings."""
+
+    ##### workers open the cached matrix as a memory map, the rows are not copied per process #####
+    (X_train,y_train),(X_val,y_val) = load_matrix(**matrix_args).parts()
+    params = dict(params)
+    if resource == "trees":
+        params["n_estimators"] = amount
+    else:
+        X_train,y_train = X_train[:amount],y_train[:amount]
+
+    clf = RandomForestClassifier(**params,n_jobs=1,random_state=random_state)
+    start = time.perf_counter()
+    clf.fit(X_train,y_train)
+    fit_time = time.perf_counter() - start
+    score = float(clf.score(X_val,y_val))
+    latency_ms,batch_us_per_row = predict_latency(clf,X_val)
+    return {"score":score,"fit_time":fit_time,"latency_ms":latency_ms,"batch_us_per_row":batch_us_per_row}
+
+
+def _candidate_trial(candidate,*args):
+    ### results come back in completion order, tagged with their candidate ###
+    return candidate,run_trial(*args)
+
+
+def successive_halving(dataset="trainable",feature_set="all",n_candidates=100,resource="trees",
+                       n_jobs=-1,trials_path=TRIALS_PATH,cache_dir=CACHE_DIR,random_state=42):
+    """Run (or resume) the search, returns the list of finished trials."""
+
+    matrix_args = {"dataset":dataset,"feature_set":feature_set,"test_sizes":[0.35],
+                   "random_state":42,"mmap_dir":cache_dir}
+    ##### build the memory map once up front, the workers then only open it #####
+    matrix = load_matrix(**matrix_args)
+    matrix.report()
+    n_train = matrix.bounds[1]
+    print('DATA SHAPES:',matrix.part(0)[0].shape,matrix.part(1)[0].shape)
+
+    ##### everything that shapes the trials: a changed grid or rung bound starts a new search #####
+    config = {"dataset":dataset,"feature_set":feature_set,"n_candidates":n_candidates,"resource":resource,
+              "eta":ETA,"n_train":n_train,"random_state":random_state,"grid":random_grid,
+              "min_trees":MIN_TREES,"max_trees":MAX_TREES,"min_samples":MIN_SAMPLES}
+    key = search_key(config)
+    params = candidates(n_candidates,resource,random_state)
+    resources = rung_resources(resource,n_train)
+    done = read_trials(key,trials_path)
+    print("RANDOM SEARCH GRID:",random_grid)
+    print("Search",key,"rungs",resources,"resumed with",len(done),"finished trials")
+
+    alive = list(range(len(params)))
+    with Parallel(n_jobs=n_jobs,return_as="generator_unordered") as parallel, _open_log(trials_path) as log:
+        for rung,amount in enumerate(resources):
+            todo = [c for c in alive if (c,rung) not in done]
+            print("Rung {}: {} candidates with {} {}, {} to run".format(rung,len(alive),amount,resource,len(todo)))
+            jobs = (delayed(_candidate_trial)(c,matrix_args,params[c],resource,amount,random_state) for c in todo)
+            for c,result in parallel(jobs):
+                record = {"search":key,"candidate":c,"rung":rung,"resource":amount,"params":params[c],**result}
+                log.write(json.dumps(record) + "\n")
+                log.flush()
+                done[(c,rung)] = record
+                print("candidate {} rung {}: acc {:.4f}, fit {:.1f}s, predict {:.2f}ms".format(
+                    c,rung,result["score"],result["fit_time"],result["latency_ms"]))
+
+            ##### best 1/ETA go on, ties broken by the faster predictor #####
+            ranked = sorted(alive,key=lambda c:(-done[(c,rung)]["score"],done[(c,rung)]["latency_ms"]))
+            alive = ranked[:max(1,int(np.ceil(len(alive)/ETA)))] if rung < len(resources) - 1 else ranked
+
+    return [done[k] for k in sorted(done)]
+
+
+def leaderboard(trials):
+    """Last rung reached by every candidate, best first: score next to fit time and predict latency."""
+
+    df = pd.DataFrame(trials)
+    df = df.sort_values("rung").drop_duplicates("candidate",keep="last")
+    params = pd.DataFrame(list(df["params"]),index=df.index)
+    board = pd.concat([df[["candidate","rung","resource","score","fit_time","latency_ms","batch_us_per_row"]],
+                       params],axis=1)
+    return board.sort_values(["rung","score","latency_ms"],ascending=[False,False,True]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+
+    ####### python rf_hyperparam_tuning.py [--candidates=N] [--resource=trees|samples] [--n_jobs=N] #######
+    options = dict(a[2:].split("=") for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    trials = successive_halving(n_candidates=int(options.get("candidates",100)),
+                                resource=options.get("resource","trees"),
+                                n_jobs=int(options.get("n_jobs",-1)))
+    board = leaderboard(trials)
+    board.to_csv(LEADERBOARD_PATH,index=False)
+    print(board.head(20).to_string())
+    best = board.iloc[0]
+    ##### params of the stored trial, the board's columns turn ints into floats and None into NaN #####
+    best_trial = next(t for t in trials if t["candidate"] == best["candidate"] and t["rung"] == best["rung"])
+    best_params = dict(best_trial["params"])
+    if "n_estimators" not in best_params:
+        best_params["n_estimators"] = int(best_trial["resource"])
+    print("Best Features:",best_params)
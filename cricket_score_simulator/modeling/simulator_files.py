@@ -0,0 +1,8 @@
+import os
+import sys
+
+##### The simulator (cric_sim/encoding_index.py) owns the locations and formats of the files #####
+##### the modeling scripts write for it: ratings table and encoder vocabularies. #####
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","cric_sim"))
+
+from encoding_index import RATINGS_PATH, VOCAB_DIR, Vocabularies
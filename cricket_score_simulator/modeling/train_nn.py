@@ -1,101 +1,169 @@
-import pandas as pd
-import numpy as np
+import os
 import json
+import numpy as np
+import tensorflow as tf
+from dataset_loader import load_matrix
 from sklearn.utils import class_weight
 from tensorflow import keras
-from sklearn.model_selection import train_test_split
 from keras.models import Model
 from keras.layers import Input,Dropout
 from keras.layers import Dense,BatchNormalization
-from keras.utils import to_categorical
-import tensorflow_addons as tfa 
-
-df = pd.read_csv("Final_T20_trainable.csv")
-
-#### dropping outcomes 5,7 because they hardly occur in cricket ###
-df.drop(df[df["outcome"]==5].index,inplace=True)
-df.drop(df[df["outcome"]==7].index,inplace=True)
-
-###Converting outcome 8 to 5###
-df.loc[df["outcome"]==8,"outcome"] = 5
-############
-######### omitting out batsman data (does not add value to the dataset for prediction)
-data = df.drop(['batsman_prop5','batsman_prop7','bowler_prop5', 'bowler_prop7',
-    'out_batsman_0' ,'out_batsman_1', 'out_batsman_2', 'out_batsman_3',
-    'out_batsman_4', 'out_batsman_5', 'out_batsman_6' ,'out_batsman_7',
-    'out_batsman_8' ,'out_batsman_9' ,'out_batsman_10' ,'out_batsman_11',"outcome"],axis=1)
-
-labels = df["outcome"].values
-labels_encoded = to_categorical(labels)
-
-
-
-
-data_arr = np.array(data)
-X_train,X_test,y_train,y_test = train_test_split(data_arr,labels_encoded,test_size=0.35,random_state=42)
-X_test,X_val,y_test,y_val = train_test_split(X_test,y_test,test_size=0.40,random_state=42)
-
-#########getting class weights#############
-class_weights = class_weight.compute_class_weight(class_weight = 'balanced',\
-                                                 classes = np.unique(labels),\
-                                                 y = labels)
-####################################
-class_weights = dict(zip(np.unique(labels), class_weights))
-print(class_weights)
-
-### Normalisation of columns###
-min_max_dict = {}
-#############################
-for col_name in list(data.columns):
-    if max(data[col_name]) > 1:
-        min_max_dict[col_name] = {"min_val":min(data[col_name]), "max_val":max(data[col_name])}
-        data[col_name] = (data[col_name] - min(data[col_name])) / (max(data[col_name] - min(data[col_name])))
-    #print(i,x,y)
-
-# Serializing json
-json_object = json.dumps(min_max_dict, indent=4)
- 
-# Writing to sample.json
-with open("min_max.json", "w") as outfile:
-    outfile.write(json_object)
-
-####################################
-
-
-print(X_train.shape)
-print(X_test.shape)
-print(X_val.shape)
-print(data_arr[0].shape)
-print(labels.shape)
-
-
-############## Create the Keras Model ###################
-input_layer = Input(shape=(96,))
-x = Dense(256,activation="relu")(input_layer)
-x = BatchNormalization()(x)
-x = Dropout(0.3)(x)
-x = Dense(512,activation="relu")(x)
-x = BatchNormalization()(x)
-x = Dropout(0.3)(x)
-x = Dense(1024,activation="relu")(x)
-x = BatchNormalization()(x)
-x = Dropout(0.3)(x)
-output_layer = Dense(7,activation="softmax")(x)
-
-model = Model(inputs=input_layer, outputs=output_layer)
-model.compile(optimizer="adam", loss=keras.losses.CategoricalCrossentropy(), metrics="acc")
-
-f1 = tfa.metrics.F1Score(7,'weighted')
-
-model = Model(inputs=input_layer, outputs=output_layer)
-model.compile(optimizer="adam", loss=keras.losses.CategoricalCrossentropy(), metrics=[f1])
-
-########### callbacks #######
-my_callbacks = [
-    keras.callbacks.ModelCheckpoint(filepath='model_13_02_23_4.h5',monitor="val_f1_score",\
-    save_best_only=True,mode="max",verbose=True)
-]
-########################
-#weight_classes = {0:1,1:1,2:}
-model.fit(X_train,y_train,batch_size=32,epochs=100,callbacks=my_callbacks,\
-        validation_data=(X_test,y_test))
\ No newline at end of file
+import tensorflow_addons as tfa
+
+MODEL_PATH = "model_13_02_23_4.h5"
+##### read by the simulator notebook, a copy is saved next to the model #####
+MIN_MAX_PATH = "min_max.json"
+##### memory mapped training matrix, batches are read from it instead of a matrix in memory #####
+CACHE_DIR = "/home/shivargha/cricket_analytics/cricket_score_simulator/modeling/matrix_cache/"
+
+N_CLASSES = 7
+BATCH_SIZE = 32
+EPOCHS = 100
+PATIENCE = 10
+##### rows read from the memory map per step of the input pipeline, and the row shuffle buffer #####
+BLOCK_ROWS = 8192
+SHUFFLE_BUFFER = 65536
+STATS_CHUNK_ROWS = 500000
+
+
+def load_training_matrix(cache_dir=CACHE_DIR):
+    #### dropping outcomes 5,7 because they hardly occur in cricket ###
+    ###Converting outcome 8 to 5###
+    ######### omitting out batsman data (does not add value to the dataset for prediction)
+    #### rows come out as train, test, val blocks of one float32 matrix ####
+    return load_matrix("trainable","nn",test_sizes=[0.35,0.40],random_state=42,
+                       outcomes=[0,1,2,3,4,6,8],relabel={8:5},mmap_dir=cache_dir)
+
+
+def min_max_stats(X,chunk_rows=STATS_CHUNK_ROWS):
+    """Column minimum and maximum in one pass over the rows, chunk by chunk."""
+
+    col_min = np.full(X.shape[1],np.inf,dtype=np.float64)
+    col_max = np.full(X.shape[1],-np.inf,dtype=np.float64)
+    for start in range(0,len(X),chunk_rows):
+        chunk = np.asarray(X[start:start+chunk_rows])
+        col_min = np.minimum(col_min,chunk.min(axis=0))
+        col_max = np.maximum(col_max,chunk.max(axis=0))
+    return col_min,col_max
+
+
+def normalisation(columns,col_min,col_max):
+    """(min_max dict of the scaled columns, offset and scale vectors applied to every batch).
+
+    Columns going above 1 are min max scaled, the rest (bits, proportions, ratings) are left as they are.
+    """
+
+    scaled = col_max > 1
+    min_max_dict = {name:{"min_val":float(lo),"max_val":float(hi)}
+                    for name,lo,hi,s in zip(columns,col_min,col_max,scaled) if s}
+    offset = np.where(scaled,col_min,0).astype(np.float32)
+    span = col_max - col_min
+    scale = np.where(scaled & (span > 0),span,1).astype(np.float32)
+    return min_max_dict,offset,scale
+
+
+def save_min_max(min_max_dict,model_path=MODEL_PATH,path=MIN_MAX_PATH):
+
+    json_object = json.dumps(min_max_dict, indent=4)
+    for out_path in (path,os.path.splitext(model_path)[0] + "_min_max.json"):
+        with open(out_path, "w") as outfile:
+            outfile.write(json_object)
+
+
+def make_dataset(X,y,offset,scale,weights=None,batch_size=BATCH_SIZE,shuffle=False,seed=42):
+    """tf.data pipeline over a (memory mapped) matrix block: blocks of rows are read in parallel,
+    shuffled through a row buffer, batched, normalised and one hot encoded, then prefetched.
+    """
+
+    n_rows = len(y)
+    starts = np.arange(0,n_rows,BLOCK_ROWS,dtype=np.int64)
+    n_features = X.shape[1]
+
+    def read_block(start):
+        return np.asarray(X[start:start+BLOCK_ROWS],dtype=np.float32),np.asarray(y[start:start+BLOCK_ROWS],dtype=np.int64)
+
+    def block(start):
+        x_block,y_block = tf.numpy_function(read_block,[start],[tf.float32,tf.int64])
+        return tf.ensure_shape(x_block,[None,n_features]),tf.ensure_shape(y_block,[None])
+
+    offset,scale = tf.constant(offset),tf.constant(scale)
+    class_weights = None if weights is None else tf.constant(weights,dtype=tf.float32)
+
+    def prepare(x_batch,y_batch):
+        x_batch = (x_batch - offset)/scale
+        y_hot = tf.one_hot(y_batch,N_CLASSES)
+        if class_weights is None:
+            return x_batch,y_hot
+        return x_batch,y_hot,tf.gather(class_weights,y_batch)
+
+    ds = tf.data.Dataset.from_tensor_slices(starts)
+    if shuffle:
+        ds = ds.shuffle(len(starts),seed=seed,reshuffle_each_iteration=True)
+    ds = ds.map(block,num_parallel_calls=tf.data.AUTOTUNE).unbatch()
+    if shuffle:
+        ds = ds.shuffle(SHUFFLE_BUFFER,seed=seed,reshuffle_each_iteration=True)
+    return ds.batch(batch_size).map(prepare,num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+def build_model(n_features):
+
+    ############## Create the Keras Model ###################
+    input_layer = Input(shape=(n_features,))
+    x = Dense(256,activation="relu")(input_layer)
+    x = BatchNormalization()(x)
+    x = Dropout(0.3)(x)
+    x = Dense(512,activation="relu")(x)
+    x = BatchNormalization()(x)
+    x = Dropout(0.3)(x)
+    x = Dense(1024,activation="relu")(x)
+    x = BatchNormalization()(x)
+    x = Dropout(0.3)(x)
+    output_layer = Dense(N_CLASSES,activation="softmax")(x)
+
+    f1 = tfa.metrics.F1Score(N_CLASSES,'weighted')
+
+    model = Model(inputs=input_layer, outputs=output_layer)
+    model.compile(optimizer="adam", loss=keras.losses.CategoricalCrossentropy(), metrics=[f1])
+    return model
+
+
+if __name__ == "__main__":
+
+    matrix = load_training_matrix()
+    matrix.report()
+    (X_train,y_train),(X_test,y_test),(X_val,y_val) = matrix.parts()
+    print(X_train.shape)
+    print(X_test.shape)
+    print(X_val.shape)
+
+    #########getting class weights (train rows only, held out labels are not counted)#############
+    classes = np.unique(y_train)
+    class_weights = class_weight.compute_class_weight(class_weight = 'balanced',\
+                                                     classes = classes,\
+                                                     y = y_train)
+    print(dict(zip(classes, class_weights)))
+    #### weight per label, looked up for every row of a batch ####
+    weights = np.ones(N_CLASSES)
+    weights[classes] = class_weights
+    ####################################
+
+    ### Normalisation of columns, statistics of the training rows ###
+    min_max_dict,offset,scale = normalisation(matrix.columns,*min_max_stats(X_train))
+    save_min_max(min_max_dict)
+
+    train_ds = make_dataset(X_train,y_train,offset,scale,weights=weights,shuffle=True)
+    test_ds = make_dataset(X_test,y_test,offset,scale)
+    val_ds = make_dataset(X_val,y_val,offset,scale)
+
+    model = build_model(X_train.shape[1])
+
+    ########### callbacks #######
+    my_callbacks = [
+        keras.callbacks.ModelCheckpoint(filepath=MODEL_PATH,monitor="val_f1_score",\
+        save_best_only=True,mode="max",verbose=True),
+        keras.callbacks.EarlyStopping(monitor="val_f1_score",mode="max",patience=PATIENCE,\
+        restore_best_weights=True,verbose=True)
+    ]
+    ########################
+    model.fit(train_ds,epochs=EPOCHS,callbacks=my_callbacks,validation_data=test_ds)
+    print("Validation:",model.evaluate(val_ds,return_dict=True))
@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+from columnar_store import load
+
+############ venue -->> country cache used by the Cricsheet ingestion ############
+CACHE_PATH = "/home/shivargha/cricket_analytics/T20_cricket/venue_countries.json"
+
+##### ball by ball CSVs that already carry a country per venue (dataset names or paths) #####
+SEED_DATASETS = ["t20is","/home/shivargha/performance_prediction/odi_cricket/odi.csv"]
+#################################################################################
+
+
+def nominatim_country(venue):
+    """Online resolver, the geopy lookup the notebooks ran for every match."""
+
+    from geopy.geocoders import Nominatim
+    geolocator = Nominatim(user_agent="geoapiExercises")
+    location = geolocator.geocode(venue,language="en")
+    return location.address.split(",")[-1].strip()
+
+
+class VenueCountries:
+    """Persistent venue -->> country lookup, usable as the country_of callable of cricsheet_parser.
+
+    Venues missing from the cache go to `resolver` (any venue -->> country callable) and are
+    cached; without a resolver a missing venue raises KeyError, which the parser records as
+    country "None". The object is picklable, so process pool workers get a read only copy and
+    the parent picks their answers up with learn().
+    """
+
+    def __init__(self,path=CACHE_PATH,resolver=None):
+
+        self.path = path
+        self.resolver = resolver
+        self.countries = {}
+        self.changed = False
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.countries = json.load(f)
+
+    def __call__(self,venue):
+
+        if venue in self.countries:
+            return self.countries[venue]
+        if self.resolver is None:
+            raise KeyError(venue)
+        country = self.resolver(venue)
+        self.add(venue,country)
+        return country
+
+    def add(self,venue,country):
+        if country and country != "None" and self.countries.get(venue) != country:
+            self.countries[venue] = country
+            self.changed = True
+
+    def learn(self,df):
+        """Add the most frequent known country of every venue in a frame with venue, country columns."""
+
+        known = df.loc[(df["country"] != "None") & df["country"].notna(),["venue","country"]].astype(str)
+        if known.empty:
+            return self
+        counts = known.groupby(["venue","country"]).size().sort_values(ascending=False,kind="mergesort")
+        for (venue,country),_ in counts[~counts.index.get_level_values("venue").duplicated()].items():
+            if venue not in self.countries:
+                self.add(venue,country)
+        return self
+
+    def seed(self,datasets=SEED_DATASETS):
+        """Fill the cache from CSVs (or their parquet copies) produced by earlier ingests."""
+
+        for dataset in datasets:
+            try:
+                self.learn(load(dataset,["venue","country"]))
+            except (FileNotFoundError,ValueError,KeyError) as e:
+                print("Not seeded from",dataset,repr(e))
+        return self
+
+    def save(self):
+        ### only when something was added, through a temporary file like the ingest manifest ###
+        if not self.changed or self.path is None:
+            return
+        with open(self.path + ".tmp","w") as f:
+            json.dump(self.countries,f,indent=1,sort_keys=True,ensure_ascii=False)
+        os.replace(self.path + ".tmp",self.path)
+        self.changed = False
+
+
+if __name__ == "__main__":
+
+    ####### python venue_countries.py [dataset or csv ...] [--online venue ...]  seeds / extends the cache #######
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if "--online" in sys.argv:
+        countries = VenueCountries(resolver=nominatim_country)
+        for venue in args:
+            print(venue,"-->>",countries(venue))
+    else:
+        countries = VenueCountries().seed(args or SEED_DATASETS)
+    countries.save()
+    print(len(countries.countries),"venues in",countries.path)
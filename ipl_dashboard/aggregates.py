@@ -0,0 +1,185 @@
+import numpy as np
+from matchups import MatchupTable
+from sequence_metrics import frustration_index, setup_index
+
+PHASES = ['Powerplay', 'Middle', 'Death']
+
+# Dismissals credited to the bowler (run outs, retirements etc. are not)
+BOWLER_WICKET_KINDS = ['caught', 'bowled', 'lbw', 'stumped', 'caught and bowled', 'hit wicket']
+
+# One cube row per (batter, bowler, match, innings, over): every ball a batter faced from one
+# bowler in one over. Both the batter and the bowler panels are slices of it.
+CUBE_KEYS = ['batter', 'bowler', 'match_id', 'inning', 'over']
+CUBE_ATTRIBUTES = ['phase', 'batting_team', 'bowling_team']
+
+# Summed per cube row
+MEASURES = [
+    'balls',             # deliveries, wides and no-balls included
+    'batsman_runs',      # runs off the bat
+    'total_runs',        # runs off the ball, extras included
+    'legal_balls',       # balls faced by the batter (wides excluded)
+    'legal_dots',        # balls faced with nothing off the bat
+    'legal_boundaries',  # balls faced hit for 4 or 6
+    'n0', 'n1', 'n2', 'n3', 'n4', 'n5', 'n6',  # deliveries by runs off the bat
+    'dots_total',        # deliveries with no run at all
+    'wickets',           # deliveries with a wicket (any kind, either batter)
+    'dismissed',         # the batter on strike was the one dismissed
+    'bowler_wickets',    # wickets credited to the bowler
+    'bowl_legal_balls',  # balls counted in the bowler's overs (wides and no-balls excluded)
+    'runs_conceded',     # total runs less byes, leg byes and penalties
+    'dots_conceded',     # deliveries with nothing charged to the bowler
+]
+
+
+def phase_of(over):
+    return np.select([over < 6, over < 16], [PHASES[0], PHASES[1]], PHASES[2])
+
+
+def add_delivery_measures(df):
+    """Per-delivery measure columns (MEASURES) added to the deliveries frame."""
+    extras_type = df['extras_type']
+    runs = df['batsman_runs']
+    legal_bat = (extras_type != 'wides').to_numpy()
+    boundary = runs.isin([4, 6]).to_numpy()
+    wicket = (df['is_wicket'] == 1).to_numpy()
+
+    not_charged = extras_type.isin(['legbyes', 'byes', 'penalty']).to_numpy()
+    runs_conceded = df['total_runs'].to_numpy(dtype=np.int64) - np.where(not_charged, df['extra_runs'], 0)
+
+    measures = {
+        'balls': np.ones(len(df), dtype=np.int8),
+        'legal_balls': legal_bat,
+        'legal_dots': legal_bat & (runs == 0).to_numpy(),
+        'legal_boundaries': legal_bat & boundary,
+        **{'n{}'.format(k): (runs == k).to_numpy() for k in range(7)},
+        'dots_total': (df['total_runs'] == 0).to_numpy(),
+        'wickets': wicket,
+        'dismissed': wicket & (df['player_dismissed'] == df['batter']).to_numpy(),
+        'bowler_wickets': wicket & df['dismissal_kind'].isin(BOWLER_WICKET_KINDS).to_numpy(),
+        'bowl_legal_balls': ~extras_type.isin(['wides', 'noballs']).to_numpy(),
+        'runs_conceded': runs_conceded,
+        'dots_conceded': runs_conceded == 0,
+    }
+    for name, values in measures.items():
+        df[name] = values
+    return df
+
+
+def build_cube(df):
+    # groupby sums can keep the input dtype, so measures are widened first (runs overflow int8)
+    keys = [df[k] for k in CUBE_KEYS]
+    cube = df[MEASURES].astype(np.int32).groupby(keys, sort=False).sum()
+    cube[CUBE_ATTRIBUTES] = df[CUBE_ATTRIBUTES].groupby(keys, sort=False).first()
+    return cube.reset_index()
+
+
+def _interval_table(frame, player, seq, bucket, values):
+    frame = frame.assign(_bucket=bucket(seq))
+    return frame.groupby([player, '_bucket']).agg(**values).reset_index().rename(columns={'_bucket': 'bucket'})
+
+
+class AggregateCube:
+    """Aggregates of the deliveries frame, built once, that the dashboard panels read from.
+
+    cube      -- MEASURES per (batter, bowler, match, innings, over), with phase and teams
+    *_pacing  -- per player sequence tables (n-th ball of a player's innings / spell)
+    frustration, setup -- sequence metrics per batter / bowler (sequence_metrics.py)
+    matchups  -- batter x bowler head-to-head table (matchups.py)
+    Player slices are positional lookups into cached groupby indices, never full scans.
+    """
+
+    def __init__(self, deliveries):
+        self.deliveries = add_delivery_measures(deliveries)
+        self.cube = build_cube(self.deliveries)
+
+        self._cube_rows = {side: self.cube.groupby(side, sort=False).indices for side in ['batter', 'bowler']}
+        self._delivery_rows = {side: self.deliveries.groupby(side, sort=False).indices
+                               for side in ['batter', 'bowler']}
+
+        self.batting_totals = self.cube.groupby('batter')[MEASURES].sum()
+        self.bowling_totals = self.cube.groupby('bowler')[MEASURES].sum()
+
+        self._build_sequence_tables()
+        self.matchups = MatchupTable(self.cube, self.deliveries)
+
+        # Predictive Insights, every player in one pass
+        self.frustration = frustration_index(self.deliveries)
+        self.setup = setup_index(self.deliveries)
+
+    def _build_sequence_tables(self):
+        d = self.deliveries
+
+        # n-th delivery faced in the match, in file order (Pacing Strategy: 10 ball buckets)
+        ball_num = d.groupby(['batter', 'match_id'], sort=False).cumcount().to_numpy() + 1
+        self.batter_pacing = _interval_table(
+            d[['batter', 'batsman_runs']], 'batter', ball_num, lambda n: ((n - 1) // 10) * 10,
+            {'batsman_runs': ('batsman_runs', 'sum'), 'ball_num': ('batsman_runs', 'size')})
+        self.batter_pacing = self.batter_pacing.rename(columns={'bucket': 'bucket_sort'})
+        self.batter_pacing['ball_bucket'] = (self.batter_pacing['bucket_sort'] + 1).astype(str) + '-' + \
+            (self.batter_pacing['bucket_sort'] + 10).astype(str)
+
+        # n-th legal ball faced in the match, chronological (Acceleration & Risk Profile)
+        legal = d[d['legal_balls']].sort_values(['batter', 'match_id', 'over', 'ball'], kind='mergesort')
+        seq = legal.groupby(['batter', 'match_id'], sort=False).cumcount().to_numpy() + 1
+        self.batter_intervals = _interval_table(
+            legal, 'batter', seq, lambda n: ((n - 1) // 10) * 10 + 10,
+            {'batsman_runs': ('batsman_runs', 'sum'), 'is_wicket': ('is_wicket', 'sum'),
+             'ball_cum': ('batsman_runs', 'size'), 'boundaries': ('legal_boundaries', 'sum')})
+        self.batter_intervals = self.batter_intervals.rename(columns={'bucket': 'ball_interval'})
+
+        # n-th over of the bowler's spell in the match (Spell Strategy)
+        spell = d[d['bowl_legal_balls']].sort_values(['bowler', 'match_id', 'over', 'ball'], kind='mergesort')
+        seq = spell.groupby(['bowler', 'match_id'], sort=False).cumcount().to_numpy() + 1
+        self.bowler_spells = _interval_table(
+            spell.assign(_boundary=spell['batsman_runs'].isin([4, 6])), 'bowler', seq,
+            lambda n: ((n - 1) // 6) + 1,
+            {'total_runs': ('total_runs', 'sum'), 'ball_cum': ('total_runs', 'size'),
+             'boundaries': ('_boundary', 'sum')})
+        self.bowler_spells = self.bowler_spells.rename(columns={'bucket': 'over_interval'})
+
+        self._sequence_rows = {
+            'batter_pacing': self.batter_pacing.groupby('batter').indices,
+            'batter_intervals': self.batter_intervals.groupby('batter').indices,
+            'bowler_spells': self.bowler_spells.groupby('bowler').indices,
+        }
+
+    # --- selectbox orderings ---
+    def batters_by_runs(self):
+        return self.batting_totals['batsman_runs'].sort_values(ascending=False).index
+
+    def bowlers_by_wickets(self):
+        return top(self.cube.groupby('bowler', sort=False)['wickets'].sum(), None).index
+
+    # --- player slices ---
+    def batter(self, name):
+        return self.cube.iloc[self._cube_rows['batter'].get(name, [])]
+
+    def bowler(self, name):
+        return self.cube.iloc[self._cube_rows['bowler'].get(name, [])]
+
+    def batter_deliveries(self, name):
+        return self.deliveries.iloc[self._delivery_rows['batter'].get(name, [])]
+
+    def bowler_deliveries(self, name):
+        return self.deliveries.iloc[self._delivery_rows['bowler'].get(name, [])]
+
+    def sequence_table(self, table, name):
+        frame = getattr(self, table)
+        rows = frame.iloc[self._sequence_rows[table].get(name, [])]
+        return rows.drop(columns=[frame.columns[0]]).reset_index(drop=True)
+
+
+def by(cube_slice, key, measures=None, order=None, sort=True):
+    """Summed measures of a cube slice per key (phase/over/bowler/...), keys without rows omitted.
+
+    sort=False keeps keys in order of first appearance, as value_counts does for ties.
+    """
+    grouped = cube_slice.groupby(key, sort=sort)[measures or MEASURES].sum()
+    if order is not None:
+        grouped = grouped.reindex([k for k in order if k in grouped.index])
+    return grouped
+
+
+def top(series, n):
+    """Largest n entries of a summed measure, zero entries dropped (value_counts style)."""
+    return series[series > 0].sort_values(ascending=False, kind='mergesort').head(n)
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+import tracemalloc
+import numpy as np
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ipl_viz.py')
+MODES = ['Batsman Profiling', 'Bowler Arsenal', 'Head-to-Head Clash']
+HEAD_TO_HEAD = MODES[2]
+
+# A panel rerun slower than this is reported as no longer interactive
+INTERACTIVE_S = 1.0
+# Players per mode, spread over the selectbox ranking (most runs / wickets down to the fewest)
+SAMPLE_PLAYERS = 5
+REPEATS = 3
+APP_TIMEOUT_S = 600
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def traced(function, *args):
+    """(result, peak MB allocated by python while function ran)."""
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def time_load():
+    """Seconds and peak MB of the two cached loaders of ipl_viz.py, and the cube they build.
+
+    Same steps as load_data (parquet or typed CSV, phase column) and load_cube (AggregateCube).
+    """
+    # imported here, after IPL_DATA_DIR is set
+    from deliveries_store import load_deliveries, DELIVERIES_CSV, DELIVERIES_PARQUET
+    from aggregates import AggregateCube, phase_of
+
+    def load_data():
+        df = load_deliveries()
+        df['phase'] = phase_of(df['over'])
+        return df
+
+    df, load_s = timed(load_data)
+    _, load_mb = traced(load_data)
+    cube, cube_s = timed(AggregateCube, df.copy())
+    _, cube_mb = traced(AggregateCube, df.copy())
+    source = DELIVERIES_PARQUET if os.path.exists(DELIVERIES_PARQUET) else DELIVERIES_CSV
+    data = {'source': source, 'file_mb': os.path.getsize(source) / 2**20, 'rows': len(df),
+            'matches': int(df['match_id'].nunique()), 'batters': int(df['batter'].nunique()),
+            'bowlers': int(df['bowler'].nunique()), 'frame_mb': df.memory_usage(deep=True).sum() / 2**20}
+    steps = [{'step': 'load_data', 'seconds': load_s, 'peak_mb': load_mb},
+             {'step': 'load_cube', 'seconds': cube_s, 'peak_mb': cube_mb}]
+    return data, steps, cube
+
+
+def sample_players(cube, n=SAMPLE_PLAYERS):
+    """Selections of each mode: batters by runs and bowlers by wickets at evenly spaced ranks, and
+    every sampled batter against the bowler they faced most."""
+    def spread(ranking):
+        ranking = list(ranking)
+        return [ranking[i] for i in sorted(set(np.linspace(0, len(ranking) - 1, n).round().astype(int)))]
+
+    batters = spread(cube.batters_by_runs())
+    pairs = []
+    for batter in spread(cube.matchups.batters()):
+        faced = cube.matchups.vs_all_bowlers(batter)['legal_balls']
+        if len(faced):
+            pairs.append((batter, faced.idxmax()))
+    return {MODES[0]: batters, MODES[1]: spread(cube.bowlers_by_wickets()), HEAD_TO_HEAD: pairs}
+
+
+def select(app, mode, selection):
+    """Set the sidebar mode and the panel's selectboxes (the bowler list depends on the batter)."""
+    if app.sidebar.radio[0].value != mode:
+        # the mode's selectboxes only exist once it has rendered
+        app.sidebar.radio[0].set_value(mode)
+        app.run()
+    if mode == HEAD_TO_HEAD:
+        app.selectbox[0].set_value(selection[0])
+        app.run()
+        app.selectbox[1].set_value(selection[1])
+    else:
+        app.selectbox[0].set_value(selection)
+
+
+def render_panel(app, mode, selection, repeats=REPEATS):
+    """Seconds of every rerun of one panel (headless, the whole script as streamlit runs it) and the
+    peak MB of one traced rerun."""
+    select(app, mode, selection)
+    seconds = [timed(app.run)[1] for _ in range(repeats)]
+    _, peak_mb = traced(app.run)
+    record = {'mode': mode, 'player': ' vs '.join(selection) if mode == HEAD_TO_HEAD else selection,
+              'seconds': float(np.median(seconds)), 'max_seconds': max(seconds), 'peak_mb': peak_mb}
+    if len(app.exception):
+        record['error'] = app.exception[0].value
+    return record
+
+
+def benchmark(repeats=REPEATS, n_players=SAMPLE_PLAYERS):
+    """Load steps and every sampled panel of the dataset under IPL_DATA_DIR."""
+    from streamlit.testing.v1 import AppTest
+
+    data, steps, cube = time_load()
+    selections = sample_players(cube, n_players)
+    del cube
+
+    app = AppTest.from_file(APP_PATH, default_timeout=APP_TIMEOUT_S)
+    # first run: the cached loaders fill up, then the default panel renders
+    _, first_s = timed(app.run)
+    steps.append({'step': 'first_render', 'seconds': first_s, 'peak_mb': None})
+
+    panels = [render_panel(app, mode, selection, repeats)
+              for mode in MODES for selection in selections[mode]]
+    return {'data': data, 'steps': steps, 'panels': panels, 'peak_rss_mb': peak_rss_mb()}
+
+
+def summarise(result):
+    """Per mode: median and slowest panel rerun, the most memory, and whether it stays interactive."""
+    summary = {}
+    for mode in MODES:
+        panels = [p for p in result['panels'] if p['mode'] == mode and 'error' not in p]
+        if not panels:
+            continue
+        slowest = max(p['max_seconds'] for p in panels)
+        summary[mode] = {'p50_s': float(np.median([p['seconds'] for p in panels])), 'max_s': slowest,
+                         'peak_mb': max(p['peak_mb'] for p in panels), 'interactive': slowest < INTERACTIVE_S}
+    return summary
+
+
+def print_result(result):
+    data = result['data']
+    print('{matches} matches, {rows} deliveries, {batters} batters, {bowlers} bowlers '
+          '({file_mb:.1f} MB on disk, {frame_mb:.1f} MB in memory) from {source}'.format(**data))
+    for step in result['steps']:
+        memory = '' if step['peak_mb'] is None else ', peak {:.1f} MB'.format(step['peak_mb'])
+        print('  {:<14} {:8.3f} s{}'.format(step['step'], step['seconds'], memory))
+    for panel in result['panels']:
+        line = '  {:<20} {:<30} {:8.3f} s (max {:.3f}), peak {:.1f} MB'.format(
+            panel['mode'], str(panel['player'])[:30], panel['seconds'], panel['max_seconds'], panel['peak_mb'])
+        print(line + (', error: ' + panel['error'] if 'error' in panel else ''))
+    for mode, s in summarise(result).items():
+        print('  {:<20} p50 {:.3f} s, max {:.3f} s, peak {:.1f} MB -> {}'.format(
+            mode, s['p50_s'], s['max_s'], s['peak_mb'], 'interactive' if s['interactive'] else 'NOT interactive'))
+    print('  peak RSS {:.1f} MB'.format(result['peak_rss_mb']))
+
+
+def sweep(sizes, out_dir, repeats=REPEATS, n_players=SAMPLE_PLAYERS):
+    """Benchmark of a generated dataset per number of matches, each in a fresh process (the
+    dashboard's loaders are cached per process, and the data directory is read at import)."""
+    from synthetic_deliveries import generate_deliveries, write_deliveries
+
+    results = []
+    for n_matches in sizes:
+        data_dir = os.path.join(out_dir, '{}_matches'.format(n_matches))
+        if not os.path.exists(os.path.join(data_dir, 'deliveries.parquet')):
+            # player pool grows with the league, about 600 per ten seasons
+            write_deliveries(generate_deliveries(n_matches, max(200, int(n_matches * 600 / 740))),
+                             data_dir, parquet=True)
+        json_path = os.path.join(data_dir, 'benchmark.json')
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--data=' + data_dir, '--json=' + json_path,
+                        '--repeats={}'.format(repeats), '--players={}'.format(n_players)], check=True)
+        with open(json_path) as f:
+            results.append(json.load(f))
+
+    print('matches   rows       load+cube s  ' + '  '.join('{:>20}'.format(m) for m in MODES))
+    for result in results:
+        summary = summarise(result)
+        load_s = sum(s['seconds'] for s in result['steps'] if s['step'] in ('load_data', 'load_cube'))
+        cells = ['{:>20}'.format('{:.3f} s{}'.format(summary[m]['max_s'], '' if summary[m]['interactive'] else ' !')
+                                 if m in summary else '-') for m in MODES]
+        print('{:<9} {:<10} {:<12.2f} {}'.format(result['data']['matches'], result['data']['rows'], load_s,
+                                                 '  '.join(cells)))
+    return results
+
+
+if __name__ == "__main__":
+    # python ipl_dashboard/benchmark_dashboard.py [--data=dir] [--repeats=N] [--players=N] [--json=out.json]
+    # python ipl_dashboard/benchmark_dashboard.py --sizes=740,2000,5000 [--out=dir]   (generated datasets)
+    options = dict(a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a)
+    repeats, n_players = int(options.get('repeats', REPEATS)), int(options.get('players', SAMPLE_PLAYERS))
+    if 'sizes' in options:
+        from synthetic_deliveries import SYNTHETIC_DIR
+        sweep([int(n) for n in options['sizes'].split(',')], options.get('out', SYNTHETIC_DIR), repeats, n_players)
+    else:
+        if 'data' in options:
+            os.environ['IPL_DATA_DIR'] = options['data']
+        result = benchmark(repeats, n_players)
+        result['summary'] = summarise(result)
+        print_result(result)
+        if 'json' in options:
+            with open(options['json'], 'w') as f:
+                json.dump(result, f, indent=1)
@@ -0,0 +1,52 @@
+import os
+import sys
+import pandas as pd
+
+# IPL_DATA_DIR points the dashboard at another deliveries.csv (e.g. synthetic_deliveries.py output)
+DATA_DIR = os.environ.get('IPL_DATA_DIR', './ipl_dashboard')
+DELIVERIES_CSV = os.path.join(DATA_DIR, 'deliveries.csv')
+DELIVERIES_PARQUET = os.path.join(DATA_DIR, 'deliveries.parquet')
+
+# Names are dictionary encoded on disk. They load as plain strings by default: the panels
+# groupby/value_counts filtered slices, and a categorical would list every unused player too.
+NAME_COLUMNS = ['batting_team', 'bowling_team', 'batter', 'bowler', 'non_striker',
+                'extras_type', 'player_dismissed', 'dismissal_kind', 'fielder']
+
+COUNT_DTYPES = {
+    'match_id': 'int32', 'inning': 'int8', 'over': 'int8', 'ball': 'int8',
+    'batsman_runs': 'int8', 'extra_runs': 'int8', 'total_runs': 'int8', 'is_wicket': 'int8',
+}
+
+
+def read_deliveries_csv(csv_path=DELIVERIES_CSV, columns=None):
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = list(header) if columns is None else list(columns)
+    dtypes = {c: t for c, t in COUNT_DTYPES.items() if c in usecols}
+    return pd.read_csv(csv_path, usecols=usecols, dtype=dtypes)[usecols]
+
+
+def convert_deliveries(csv_path=DELIVERIES_CSV, out_path=DELIVERIES_PARQUET):
+    """One-off typed parquet copy of deliveries.csv."""
+    df = read_deliveries_csv(csv_path)
+    df.to_parquet(out_path, index=False, compression='zstd')
+    return out_path
+
+
+def load_deliveries(columns=None, categorical=False,
+                    parquet_path=DELIVERIES_PARQUET, csv_path=DELIVERIES_CSV):
+    """Deliveries with compact dtypes, only `columns` are read. Parquet first, CSV fallback."""
+    if os.path.exists(parquet_path):
+        df = pd.read_parquet(parquet_path, columns=columns)
+    else:
+        df = read_deliveries_csv(csv_path, columns)
+
+    if categorical:
+        for col in NAME_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+    return df
+
+
+if __name__ == "__main__":
+    # python ipl_dashboard/deliveries_store.py [deliveries.csv] [deliveries.parquet]
+    print("Written", convert_deliveries(*sys.argv[1:3]))
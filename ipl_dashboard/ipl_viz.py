@@ -4,6 +4,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+from deliveries_store import load_deliveries
+from aggregates import AggregateCube, PHASES, by, phase_of, top
 
 # ---------------------------------------------------------
 # 1. PAGE CONFIGURATION & THEME
@@ -45,18 +47,21 @@ def create_card(title, value, suffix=""):
 
 @st.cache_data
 def load_data():
-    df = pd.read_csv('./ipl_dashboard/deliveries.csv')
+    # deliveries.parquet (see deliveries_store.py) when present, typed CSV parse otherwise
+    df = load_deliveries()
     
-    # Phase Classification
-    def get_phase(over):
-        if over < 6: return "Powerplay"
-        elif over < 16: return "Middle"
-        else: return "Death"
-    df['phase'] = df['over'].apply(get_phase)
+    # Phase Classification: Powerplay < 6 <= Middle < 16 <= Death
+    df['phase'] = phase_of(df['over'])
     return df
 
+@st.cache_resource
+def load_cube():
+    # Built once per process and shared by every rerun/session, panels only read from it
+    return AggregateCube(load_data())
+
 try:
-    df = load_data()
+    cube = load_cube()
+    df = cube.deliveries
 except FileNotFoundError:
     st.error("❌ Data file not found. Please upload 'deliveries.csv'.")
     st.stop()
@@ -77,57 +82,49 @@ if analysis_mode == "Batsman Profiling":
     st.title("🔥 Batsman Profiling")
     
     # 1. Player Selection
-    top_batters = df.groupby('batter')['batsman_runs'].sum().sort_values(ascending=False).index
+    top_batters = cube.batters_by_runs()
     selected_batter = st.selectbox("Search Player", top_batters)
     
-    batter_df = df[df['batter'] == selected_batter]
+    # Cube rows of this batter: one per (bowler, match, innings, over) faced
+    batter_cube = cube.batter(selected_batter)
+    totals = cube.batting_totals.loc[selected_batter]
     
     # 2. Key Metrics Row
-    total_runs = batter_df['batsman_runs'].sum()
-    balls_faced_legal = batter_df[batter_df['extras_type'] != 'wides']
-    balls_faced = len(balls_faced_legal)
-    matches = batter_df['match_id'].nunique()
+    total_runs = totals['batsman_runs']
+    balls_faced = totals['legal_balls']
+    matches = batter_cube['match_id'].nunique()
     sr = (total_runs / balls_faced * 100) if balls_faced > 0 else 0
-    avg = (total_runs / batter_df[batter_df['is_wicket']==1].shape[0]) if batter_df[batter_df['is_wicket']==1].shape[0] > 0 else total_runs
+    avg = (total_runs / totals['wickets']) if totals['wickets'] > 0 else total_runs
     
     c1, c2, c3, c4, c5 = st.columns(5)
     with c1: create_card("Matches", matches)
     with c2: create_card("Runs", total_runs)
     with c3: create_card("Strike Rate", f"{sr:.1f}")
     with c4: create_card("Average", f"{avg:.1f}")
-    with c5: create_card("Boundaries", len(batter_df[batter_df['batsman_runs'].isin([4,6])]))
-
+    with c5: create_card("Boundaries", totals['n4'] + totals['n6'])
 
-    total_runs = batter_df['batsman_runs'].sum()
-    
-    # Filter for legal balls (exclude wides) for accurate ball counts
-    legal_balls_df = batter_df[batter_df['extras_type'] != 'wides']
-    balls_faced = len(legal_balls_df)
+    # Legal balls (wides excluded) are the basis of all the rates below
     
     # 1. Overall Strike Rate
     sr = (total_runs / balls_faced * 100) if balls_faced > 0 else 0
     
     # 2. Dot Ball %
     # A dot ball is a legal delivery with 0 runs off the bat
-    dot_balls = len(legal_balls_df[legal_balls_df['batsman_runs'] == 0])
+    dot_balls = totals['legal_dots']
     dot_pct = (dot_balls / balls_faced * 100) if balls_faced > 0 else 0
     
     # 3. Boundary %
     # Percentage of balls hit for 4 or 6
-    boundaries = len(legal_balls_df[legal_balls_df['batsman_runs'].isin([4, 6])])
+    boundaries = totals['legal_boundaries']
     boundary_pct = (boundaries / balls_faced * 100) if balls_faced > 0 else 0
     
-    # 4. Powerplay Strike Rate (Overs 0-5)
-    pp_df = legal_balls_df[legal_balls_df['over'] < 6]
-    pp_runs = pp_df['batsman_runs'].sum()
-    pp_balls = len(pp_df)
-    pp_sr = (pp_runs / pp_balls * 100) if pp_balls > 0 else 0
+    # 4. Powerplay Strike Rate (Overs 0-5) / 5. Death Overs Strike Rate (Overs 16-19)
+    batter_phases = by(batter_cube, 'phase')
+    pp = batter_phases.reindex(PHASES, fill_value=0).loc['Powerplay']
+    pp_sr = (pp['batsman_runs'] / pp['legal_balls'] * 100) if pp['legal_balls'] > 0 else 0
     
-    # 5. Death Overs Strike Rate (Overs 16-19)
-    death_df = legal_balls_df[legal_balls_df['over'] >= 16]
-    death_runs = death_df['batsman_runs'].sum()
-    death_balls = len(death_df)
-    death_sr = (death_runs / death_balls * 100) if death_balls > 0 else 0
+    death = batter_phases.reindex(PHASES, fill_value=0).loc['Death']
+    death_sr = (death['batsman_runs'] / death['legal_balls'] * 100) if death['legal_balls'] > 0 else 0
     
     # --- Display Metrics ---
     # Using 5 columns for the requested metrics
@@ -150,8 +147,9 @@ if analysis_mode == "Batsman Profiling":
         with col1:
             st.subheader("Boundary Distribution by Phase")
             # 4s and 6s by Phase
-            boundaries = batter_df[batter_df['batsman_runs'].isin([4, 6])]
-            boundary_stats = boundaries.groupby(['phase', 'batsman_runs']).size().reset_index(name='Count')
+            boundary_stats = batter_phases[['n4', 'n6']].rename(columns={'n4': 4, 'n6': 6}).stack().reset_index()
+            boundary_stats.columns = ['phase', 'batsman_runs', 'Count']
+            boundary_stats = boundary_stats[boundary_stats['Count'] > 0]
             boundary_stats['Type'] = boundary_stats['batsman_runs'].map({4: 'Fours', 6: 'Sixes'})
             
             # Ensure phase order
@@ -170,9 +168,7 @@ if analysis_mode == "Batsman Profiling":
         with col2:
             st.subheader("Dot Ball % by Phase")
             # Calculate Dot % per phase
-            phase_dots = batter_df.groupby('phase').apply(lambda x: (x['total_runs'] == 0).sum()).reset_index(name='dots')
-            phase_balls = batter_df.groupby('phase').size().reset_index(name='balls')
-            dot_stats = pd.merge(phase_dots, phase_balls, on='phase')
+            dot_stats = batter_phases[['dots_total', 'balls']].rename(columns={'dots_total': 'dots'}).reset_index()
             dot_stats['Dot_Percentage'] = (dot_stats['dots'] / dot_stats['balls'] * 100)
             
             fig_dot = px.bar(
@@ -192,8 +188,7 @@ if analysis_mode == "Batsman Profiling":
         with col3:
             st.subheader("⚡ Phase Dominance")
             # Radar Chart for SR and Avg per phase
-            phase_stats = batter_df.groupby('phase').agg({'batsman_runs': 'sum', 'ball': 'count'}).reset_index()
-            phase_stats['legal_balls'] = batter_df[batter_df['extras_type'] != 'wides'].groupby('phase').size().values
+            phase_stats = batter_phases[['batsman_runs', 'legal_balls']].reset_index()
             phase_stats['SR'] = (phase_stats['batsman_runs'] / phase_stats['legal_balls'] * 100).fillna(0)
             
             # Normalize SR for Radar chart (just for visual shape)
@@ -219,7 +214,7 @@ if analysis_mode == "Batsman Profiling":
         with col4:
             st.subheader("🎯 Scoring Shots")
             # Donut Chart for Scoring
-            run_counts = batter_df['batsman_runs'].value_counts().reset_index()
+            run_counts = top(totals[['n{}'.format(k) for k in range(7)]].set_axis(range(7)), 7).reset_index()
             run_counts.columns = ['Runs', 'Count']
             run_counts['Label'] = run_counts['Runs'].map({0:'Dots', 1:'Singles', 2:'Doubles', 3:'Threes', 4:'Fours', 6:'Sixes', 5:'Fives'})
             
@@ -235,7 +230,7 @@ if analysis_mode == "Batsman Profiling":
         # --- Trend Analysis ---
         st.subheader("📈 Performance Timeline")
         # Group by Match ID to show consistency
-        match_runs = batter_df.groupby('match_id')['batsman_runs'].sum().reset_index()
+        match_runs = by(batter_cube, 'match_id', ['batsman_runs']).reset_index()
         fig_trend = px.area(
             match_runs, x=match_runs.index, y='batsman_runs',
             title="Runs Scored per Match (Chronological)",
@@ -252,7 +247,7 @@ if analysis_mode == "Batsman Profiling":
         with c1:
             st.markdown("#### 🐰 Favorite Bowlers (Most Runs)")
             # Group by bowler -> sum runs
-            fav_bowlers = batter_df.groupby('bowler')['batsman_runs'].sum().sort_values(ascending=False).head(3).reset_index()
+            fav_bowlers = by(batter_cube, 'bowler', ['batsman_runs'])['batsman_runs'].sort_values(ascending=False).head(3).reset_index()
             fig_fav = px.bar(
                 fav_bowlers, x='batsman_runs', y='bowler', orientation='h',
                 text='batsman_runs',
@@ -264,14 +259,8 @@ if analysis_mode == "Batsman Profiling":
 
         with c2:
             st.markdown("#### 💀 Kryptonite (Most Wickets)")
-            # Filter for dismissals where this batter was out
-            dismissals = df[(df['batter'] == selected_batter) & (df['is_wicket'] == 1)]
-            # Exclude run outs/retired hurt usually as they aren't strictly bowler credit, but user asked for "weakness"
-            # Let's stick to bowler credited wickets for strict cricket logic
-            valid_modes = ['caught', 'bowled', 'lbw', 'stumped', 'caught and bowled', 'hit wicket']
-            dismissals = dismissals[dismissals['dismissal_kind'].isin(valid_modes)]
-            
-            weak_bowlers = dismissals['bowler'].value_counts().head(3).reset_index()
+            # Wickets on this batter's deliveries, bowler credited only (no run outs/retired hurt)
+            weak_bowlers = top(by(batter_cube, 'bowler', ['bowler_wickets'], sort=False)['bowler_wickets'], 3).reset_index()
             weak_bowlers.columns = ['bowler', 'wickets']
             
             fig_weak = px.bar(
@@ -285,7 +274,7 @@ if analysis_mode == "Batsman Profiling":
 
         #st.subheader("📈 Performance Timeline")
         st.subheader("🏟️ Favorite Teams")
-        fav_teams = batter_df.groupby('bowling_team')['batsman_runs'].sum().sort_values(ascending=False).head(3).reset_index()
+        fav_teams = by(batter_cube, 'bowling_team', ['batsman_runs'])['batsman_runs'].sort_values(ascending=False).head(3).reset_index()
         fig_team = px.bar(
             fav_teams, x='bowling_team', y='batsman_runs',
             text='batsman_runs',
@@ -300,22 +289,10 @@ if analysis_mode == "Batsman Profiling":
         st.subheader("📈 Innings Progression Analysis")
         st.markdown("*How does the batsman change gears every 10 balls?*")
         
-        # Cumulative/Interval SR Logic
-        # 1. Rank balls faced within each match for the batter
-        # We need to filter legal balls ideally for ball count, but for simplicity let's use all balls faced by him
-        pacing_df = batter_df.copy()
-        pacing_df['ball_num'] = pacing_df.groupby('match_id').cumcount() + 1
-        
-        # 2. Bin into 10-ball intervals
-        def get_bin(n): return f"{((n-1)//10)*10+1}-{((n-1)//10)*10+10}"
-        pacing_df['ball_bucket'] = pacing_df['ball_num'].apply(get_bin)
-        pacing_df['bucket_sort'] = ((pacing_df['ball_num']-1)//10)*10 # helper for sorting
-        
-        # 3. Aggregates
-        pacing_stats = pacing_df.groupby(['bucket_sort', 'ball_bucket']).agg({
-            'batsman_runs': 'sum',
-            'ball_num': 'count'
-        }).reset_index()
+        # Cumulative/Interval SR Logic (precomputed in the cube)
+        # Balls faced within each match (all balls faced by him) binned into 10-ball intervals,
+        # runs and ball count per interval
+        pacing_stats = cube.sequence_table('batter_pacing', selected_batter)
         
         pacing_stats['Strike_Rate'] = (pacing_stats['batsman_runs'] / pacing_stats['ball_num'] * 100)
         
@@ -341,21 +318,9 @@ if analysis_mode == "Batsman Profiling":
         # st.markdown("---")
         
         # --- PRE-PROCESSING: INTERVAL DATA ---
-        # 1. Sort and rank balls faced to create 10-ball intervals
-        # We use legal balls only for accurate 'balls faced' count
-        timeline_df = batter_df[batter_df['extras_type'] != 'wides'].sort_values(['match_id', 'over', 'ball']).copy()
-        timeline_df['ball_cum'] = timeline_df.groupby('match_id').cumcount() + 1
-        
-        # 2. Binning (1-10, 11-20, etc.)
-        timeline_df['ball_interval'] = ((timeline_df['ball_cum'] - 1) // 10) * 10 + 10
-        
-        # 3. Aggregate Metrics per Interval
-        # We take the average behavior across all matches for these intervals
-        interval_stats = timeline_df.groupby('ball_interval').agg({
-            'batsman_runs': 'sum',
-            'is_wicket': 'sum',
-            'ball_cum': 'count' # This acts as denominator (balls in bucket)
-        }).reset_index()
+        # Legal balls faced, ranked within each match and binned (1-10, 11-20, etc.), summed
+        # across all matches per interval: runs, wickets, balls (ball_cum) and boundaries
+        interval_stats = cube.sequence_table('batter_intervals', selected_batter)
         
         # Calculate Custom Metrics
         # A. Interval Strike Rate (The "Speed" at that moment)
@@ -366,12 +331,6 @@ if analysis_mode == "Batsman Profiling":
         interval_stats['Momentum_Change'] = interval_stats['Interval_SR'].diff().fillna(0)
         
         # C. Aggression Index (Boundaries per ball in interval)
-        # We need to count boundaries in each interval first
-        boundaries_per_interval = timeline_df[timeline_df['batsman_runs'].isin([4, 6])].groupby('ball_interval').size()
-        interval_stats = interval_stats.set_index('ball_interval')
-        interval_stats['boundaries'] = boundaries_per_interval
-        interval_stats = interval_stats.fillna(0).reset_index()
-        
         interval_stats['Aggression_Index'] = interval_stats['boundaries'] / interval_stats['ball_cum']
 
         # --- VISUAL 1: ACCELERATION CURVE (Momentum) ---
@@ -417,9 +376,8 @@ if analysis_mode == "Batsman Profiling":
         with c1:
             st.subheader("Wicket Vulnerability")
             st.caption("In which over did the batsman get out?")
-            # Filter for actual dismissals of the batter
-            dismissals = df[(df['batter'] == selected_batter) & (df['is_wicket'] == 1)]
-            dismissal_counts = dismissals['over'].value_counts().reset_index()
+            # Wickets on the batter's deliveries per over
+            dismissal_counts = top(by(batter_cube, 'over', ['wickets'])['wickets'], 20).reset_index()
             dismissal_counts.columns = ['over', 'count']
             dismissal_counts = dismissal_counts.sort_values('over')
             
@@ -459,51 +417,29 @@ if analysis_mode == "Batsman Profiling":
     with tab4:
         st.subheader("🔮 Predictive Insights")
     
-        # 1. Filter for Legal Balls (Basis for probability)
-        legal_balls_df = batter_df[batter_df['extras_type'] != 'wides']
+        # Legal balls (wides excluded) are the basis for the probabilities
         
         # --- METRIC 1: FRUSTRATION INDEX ---
         # Logic: Average number of consecutive dot balls immediately preceding a boundary (4 or 6)
         # This indicates how much pressure a batsman absorbs before releasing it.
-        
-        frustration_counts = []
-        current_dots = 0
-        
-        # Iterate through balls sorted by time
-        # Note: Sorting is crucial for sequence logic
-        sorted_df = legal_balls_df.sort_values(['match_id', 'over', 'ball'])
-        
-        for runs in sorted_df['batsman_runs']:
-            if runs == 0:
-                current_dots += 1
-            elif runs in [4, 6]:
-                frustration_counts.append(current_dots)
-                current_dots = 0
-            else:
-                # Running 1, 2, or 3 releases pressure but isn't a "release shot"
-                current_dots = 0
-                
-        frustration_index = sum(frustration_counts) / len(frustration_counts) if frustration_counts else 0
+        # Running 1, 2, or 3 releases pressure but isn't a "release shot" (see sequence_metrics.py)
+        frustration_index = cube.frustration.get(selected_batter, 0)
 
         # --- METRIC 2 & 3: PROBABILITY METRICS ---
         # Definition: Probability of event occurring at least once in a random 10-ball chunk
         # Formula: 1 - (1 - p)^10
         
-        total_balls = len(legal_balls_df)
+        total_balls = totals['legal_balls']
         
         # Boundary Probability
-        boundary_count = len(legal_balls_df[legal_balls_df['batsman_runs'].isin([4, 6])])
+        boundary_count = totals['legal_boundaries']
         p_boundary_per_ball = boundary_count / total_balls if total_balls > 0 else 0
         prob_boundary_10 = (1 - (1 - p_boundary_per_ball)**10) * 100
         
         # Wicket Probability
         # Filter for dismissals of this specific batter
         # (Exclude run-outs at non-striker end, ensure player_dismissed is the batter)
-        valid_wickets = batter_df[
-            (batter_df['is_wicket'] == 1) & 
-            (batter_df['player_dismissed'] == selected_batter)
-        ]
-        wicket_count = len(valid_wickets)
+        wicket_count = totals['dismissed']
         p_wicket_per_ball = wicket_count / total_balls if total_balls > 0 else 0
         prob_wicket_10 = (1 - (1 - p_wicket_per_ball)**10) * 100
 
@@ -570,31 +506,29 @@ elif analysis_mode == "Bowler Arsenal":
     
     # 1. Player Selection
     # Sort by wickets for better default list
-    bowler_wickets = df[df['is_wicket'] == 1]['bowler'].value_counts()
-    selected_bowler = st.selectbox("Search Bowler", bowler_wickets.index)
+    bowler_wickets = cube.bowlers_by_wickets()
+    selected_bowler = st.selectbox("Search Bowler", bowler_wickets)
     
-    bowler_df = df[df['bowler'] == selected_bowler]
+    # Cube rows of this bowler: one per (batter, match, innings, over) bowled
+    bowler_cube = cube.bowler(selected_bowler)
+    totals = cube.bowling_totals.loc[selected_bowler]
+    bowler_df = cube.bowler_deliveries(selected_bowler)
     
     # 2. Key Metrics Row
     # --- Logic for Bowler Runs & Wickets ---
     # Runs Conceded: Total runs - (legbyes + byes + penalty)
-    mask_extras = bowler_df['extras_type'].isin(['legbyes', 'byes', 'penalty'])
-    bowler_run_data = bowler_df['total_runs'].copy()
-    bowler_run_data[mask_extras] -= bowler_df.loc[mask_extras, 'extra_runs']
-    runs_conceded = bowler_run_data.sum()
+    runs_conceded = totals['runs_conceded']
     
     # Legal Balls (for Economy & SR)
-    legal_balls_df = bowler_df[~bowler_df['extras_type'].isin(['wides', 'noballs'])]
-    legal_balls_count = len(legal_balls_df)
+    legal_balls_count = totals['bowl_legal_balls']
     overs_bowled = legal_balls_count / 6
     
     # Wickets (exclude run-outs which aren't bowler's credit)
-    valid_dismissals = ['caught', 'bowled', 'lbw', 'stumped', 'caught and bowled', 'hit wicket']
-    wicket_df = bowler_df[(bowler_df['is_wicket'] == 1) & (bowler_df['dismissal_kind'].isin(valid_dismissals))]
-    total_wickets = len(wicket_df)
+    wicket_df = bowler_df[bowler_df['bowler_wickets']]
+    total_wickets = totals['bowler_wickets']
     
     # Metrics
-    matches = bowler_df['match_id'].nunique()
+    matches = bowler_cube['match_id'].nunique()
     economy = (runs_conceded / overs_bowled) if overs_bowled > 0 else 0
     bowling_avg = (runs_conceded / total_wickets) if total_wickets > 0 else 0
     bowling_sr = (legal_balls_count / total_wickets) if total_wickets > 0 else 0
@@ -603,8 +537,8 @@ elif analysis_mode == "Bowler Arsenal":
     # Dot ball for bowler: No runs off bat and no extras (except maybe legbyes, but let's keep simple: total_runs=0)
     # Strictly speaking, a legbye is a dot for the bowler. 
     # Let's count balls where runs_conceded == 0
-    dot_balls = len(bowler_df[bowler_run_data == 0])
-    dot_pct = (dot_balls / len(bowler_df) * 100) if len(bowler_df) > 0 else 0
+    dot_balls = totals['dots_conceded']
+    dot_pct = (dot_balls / totals['balls'] * 100) if totals['balls'] > 0 else 0
 
     c1, c2, c3, c4, c5 = st.columns(5)
     with c1: create_card("Wickets", total_wickets, " 🎯")
@@ -624,28 +558,14 @@ elif analysis_mode == "Bowler Arsenal":
         
         with col1:
             st.subheader("Economy Rate by Phase")
-            # Need to recalculate runs/balls per phase
-            phase_grp = bowler_df.groupby('phase')
-            phases = []
-            
-            for phase in ['Powerplay', 'Middle', 'Death']:
-                if phase in phase_grp.groups:
-                    p_data = phase_grp.get_group(phase)
-                    
-                    # Recalc runs
-                    p_mask = p_data['extras_type'].isin(['legbyes', 'byes', 'penalty'])
-                    p_runs = p_data['total_runs'].copy()
-                    p_runs[p_mask] -= p_data.loc[p_mask, 'extra_runs']
-                    total_p_runs = p_runs.sum()
-                    
-                    # Recalc legal balls
-                    p_legal = len(p_data[~p_data['extras_type'].isin(['wides', 'noballs'])])
-                    p_overs = p_legal / 6
-                    
-                    eco = (total_p_runs / p_overs) if p_overs > 0 else 0
-                    phases.append({'Phase': phase, 'Economy': eco, 'Runs': total_p_runs})
-            
-            phase_df = pd.DataFrame(phases)
+            # Runs conceded / legal balls per phase
+            bowler_phases = by(bowler_cube, 'phase', order=PHASES)
+            p_overs = bowler_phases['bowl_legal_balls'] / 6
+            phase_df = pd.DataFrame({
+                'Phase': bowler_phases.index,
+                'Economy': np.where(p_overs > 0, bowler_phases['runs_conceded'] / p_overs.where(p_overs > 0, 1), 0),
+                'Runs': bowler_phases['runs_conceded'].to_numpy()
+            })
             if not phase_df.empty:
                 fig_eco = px.bar(
                     phase_df, x='Phase', y='Economy',
@@ -660,7 +580,7 @@ elif analysis_mode == "Bowler Arsenal":
         with col2:
             st.subheader("Wickets by Phase")
             # Count wickets per phase
-            w_phase = wicket_df['phase'].value_counts().reset_index()
+            w_phase = top(by(bowler_cube, 'phase', ['bowler_wickets'], sort=False)['bowler_wickets'], 3).reset_index()
             w_phase.columns = ['Phase', 'Wickets']
             
             fig_w_phase = px.pie(
@@ -673,14 +593,10 @@ elif analysis_mode == "Bowler Arsenal":
             st.plotly_chart(fig_w_phase, use_container_width=True)
 
         col3,col4 = st.columns(2)
-        phase_metrics = bowler_df.groupby('phase').apply(lambda x: pd.Series({
-            'balls': len(x),
-            'legal_balls': len(x[~x['extras_type'].isin(['wides', 'noballs'])]),
-            'dots': len(x[x['total_runs'] == 0]),
-            'wickets': len(x[x['is_wicket'] == 1]),
-            # Calculate runs excluding byes/legbyes for Economy
-            'runs_conceded': x['total_runs'].sum() - x[x['extras_type'].isin(['legbyes', 'byes', 'penalty'])]['extra_runs'].sum() if not x.empty else 0
-        })).reset_index()
+        # balls, legal balls, dots (no run at all), wickets (any kind) and runs conceded
+        # (byes/legbyes excluded) per phase
+        phase_metrics = bowler_phases[['balls', 'bowl_legal_balls', 'dots_total', 'wickets', 'runs_conceded']].rename(
+            columns={'bowl_legal_balls': 'legal_balls', 'dots_total': 'dots'}).reset_index()
         
         # Calculate Metrics
         phase_metrics['Economy'] = (phase_metrics['runs_conceded'] / (phase_metrics['legal_balls'] / 6)).fillna(0)
@@ -775,7 +691,7 @@ elif analysis_mode == "Bowler Arsenal":
             #st.caption("Batsmen who have scored the most runs against this bowler.")
             
             # Group by batter to find who scored most runs
-            weakness = bowler_df.groupby('batter')['batsman_runs'].sum().sort_values(ascending=False).head(5).reset_index()
+            weakness = by(bowler_cube, 'batter', ['batsman_runs'])['batsman_runs'].sort_values(ascending=False).head(5).reset_index()
             
             fig_weak = px.bar(
                 weakness, x='batsman_runs', y='batter', orientation='h',
@@ -824,20 +740,13 @@ elif analysis_mode == "Bowler Arsenal":
         
         # Group by Over Number
         # We need sum of wickets and sum of runs per over number across all matches
-        over_stats = bowler_df.groupby('over').agg({
-            'total_runs': 'sum', # Approx for visualization
-            'is_wicket': 'sum',
-            'match_id': 'nunique'
-        }).reset_index()
+        over_stats = by(bowler_cube, 'over', ['total_runs', 'bowler_wickets']).reset_index() # total runs: approx for visualization
         
         # Adjust over index to 1-20
         over_stats['display_over'] = over_stats['over'] + 1
         
-        # Calculate strict runs conceded (re-applying logic slightly simplified for speed here)
-        # For precise 'Runs per Over' visualization
-        # Let's filter just valid dismissals for the wicket count
-        real_wickets = bowler_df[bowler_df['dismissal_kind'].isin(valid_dismissals)].groupby('over').size().reindex(over_stats['over'], fill_value=0).values
-        over_stats['Wickets'] = real_wickets
+        # Only bowler credited dismissals for the wicket count
+        over_stats['Wickets'] = over_stats['bowler_wickets']
         
         fig_spell = go.Figure()
         
@@ -875,20 +784,10 @@ elif analysis_mode == "Bowler Arsenal":
         st.caption("Analyzing performance evolution from the 1st over of a spell onwards.")
 
         # --- PRE-PROCESSING: SPELL INTERVAL DATA ---
-        # 1. Sort and rank balls bowled within each match
-        # We use legal balls to approximate 'overs bowled' correctly
-        spell_df = bowler_df[~bowler_df['extras_type'].isin(['wides', 'noballs'])].sort_values(['match_id', 'over', 'ball']).copy()
-        spell_df['ball_cum'] = spell_df.groupby('match_id').cumcount() + 1
-        
-        # 2. Bin into "Overs" (Intervals of 6 balls: 1-6, 7-12, etc.)
-        spell_df['over_interval'] = ((spell_df['ball_cum'] - 1) // 6) + 1
-        
-        # 3. Calculate Runs for these specific balls
-        # Aggregate per Interval (Average across career)
-        spell_stats = spell_df.groupby('over_interval').agg({
-            'total_runs': 'sum', # Includes legbyes/byes, slightly overestimates bowler runs but consistent for trend
-            'ball_cum': 'count'
-        }).reset_index()
+        # Legal balls bowled, ranked within each match and binned into "Overs" of the spell
+        # (balls 1-6, 7-12, etc.), summed across the career per interval: total runs (includes
+        # legbyes/byes, slightly overestimates bowler runs but consistent for trend), balls, boundaries
+        spell_stats = cube.sequence_table('bowler_spells', selected_bowler)
         
         # Calculate Interval Economy
         # Runs / (Balls/6) -> Runs / 1 (since interval is 6 balls) -> Runs
@@ -900,12 +799,6 @@ elif analysis_mode == "Bowler Arsenal":
         spell_stats['Eco_Change'] = spell_stats['Interval_Economy'].diff().fillna(0)
         
         # 2. Risk Allowance (Boundaries per Over)
-        # Count boundaries in the filtered dataset
-        boundaries_per_interval = spell_df[spell_df['batsman_runs'].isin([4, 6])].groupby('over_interval').size()
-        spell_stats = spell_stats.set_index('over_interval')
-        spell_stats['boundaries'] = boundaries_per_interval
-        spell_stats = spell_stats.fillna(0).reset_index()
-        
         spell_stats['Risk_Index'] = spell_stats['boundaries'] / (spell_stats['ball_cum'] / 6) # Boundaries per Over
         
         # Limit to first 4-5 overs (typical spell length) to avoid noisy tail data
@@ -969,40 +862,18 @@ elif analysis_mode == "Bowler Arsenal":
         
         # 1. Setup Index: Dots before Wicket
         # Logic: Average number of dot balls in the 6 balls leading up to a wicket
-        setup_dots = []
-        
-        # Sort chronologically
-        sorted_bowler = bowler_df.sort_values(['match_id', 'over', 'ball'])
-        
-        # We identify wicket indices
-        wicket_indices = sorted_bowler[sorted_bowler['is_wicket'] == 1].index
-        
-        # This is computationally heavy to iterate all, so we iterate wickets
-        # We need a way to access 'prev 6 balls' efficiently. 
-        # Convert to list/array for speed
-        runs_array = bowler_run_data.loc[sorted_bowler.index].values
-        is_wicket_array = sorted_bowler['is_wicket'].values
-        
-        for i in range(len(is_wicket_array)):
-            if is_wicket_array[i] == 1:
-                # Look back up to 6 balls (ensure not crossing match boundary? Ignored for simplicity in this window)
-                start_idx = max(0, i-6)
-                window = runs_array[start_idx:i]
-                # Count zeros
-                dots = np.sum(window == 0)
-                setup_dots.append(dots)
-                
-        setup_index = np.mean(setup_dots) if setup_dots else 0
+        # (within the same innings, see sequence_metrics.py)
+        setup_index = cube.setup.get(selected_bowler, 0)
         
         # 2. Probability Metrics
-        total_balls_bowled = len(bowler_df)
+        total_balls_bowled = totals['balls']
         
         # Wicket Probability (Lethality)
         p_wicket_ball = total_wickets / total_balls_bowled if total_balls_bowled > 0 else 0
         prob_wicket_10 = (1 - (1 - p_wicket_ball)**10) * 100
         
         # Boundary Probability (Leakage)
-        boundaries_conceded = len(bowler_df[bowler_df['batsman_runs'].isin([4, 6])])
+        boundaries_conceded = totals['n4'] + totals['n6']
         p_boundary_ball = boundaries_conceded / total_balls_bowled if total_balls_bowled > 0 else 0
         prob_boundary_10 = (1 - (1 - p_boundary_ball)**10) * 100
 
@@ -1070,28 +941,29 @@ elif analysis_mode == "Head-to-Head Clash":
     c1, c2, c3 = st.columns([5, 2, 5])
     with c1:
         st.markdown("### 🏏 The Batter")
-        batter = st.selectbox("Choose Batter", sorted(df['batter'].unique()), label_visibility="collapsed")
+        batter = st.selectbox("Choose Batter", cube.matchups.batters(), label_visibility="collapsed")
     with c2:
         st.markdown("<h2 style='text-align: center; margin-top: 20px;'>VS</h2>", unsafe_allow_html=True)
     with c3:
         st.markdown("### 🎯 The Bowler")
         # Smart filter: only show bowlers who have bowled to this batter
-        opponents = df[df['batter'] == batter]['bowler'].unique()
+        opponents = cube.matchups.bowlers_faced(batter)
         bowler = st.selectbox("Choose Bowler", sorted(opponents), label_visibility="collapsed")
 
-    # Filter Data
-    h2h = df[(df['batter'] == batter) & (df['bowler'] == bowler)]
+    # Filter Data: the pair's deliveries and totals from the matchup table
+    h2h = cube.matchups.pair_deliveries(batter, bowler)
+    matchup = cube.matchups.pair(batter, bowler)
 
     # --- ANALYSIS SECTION ---
-    if not h2h.empty:
+    if matchup is not None:
         # 1. Advanced Metrics Calculation
-        total_runs = h2h['batsman_runs'].sum()
-        balls_faced = len(h2h[h2h['extras_type'] != 'wides'])
-        dismissals = len(h2h[h2h['is_wicket'] == 1])
+        total_runs = int(matchup['batsman_runs'])
+        balls_faced = int(matchup['legal_balls'])
+        dismissals = int(matchup['wickets'])
         
         # Avoid division by zero
-        strike_rate = (total_runs / balls_faced * 100) if balls_faced > 0 else 0
-        dot_balls = len(h2h[h2h['batsman_runs'] == 0])
+        strike_rate = matchup['strike_rate']
+        dot_balls = int(matchup['n0'])
         dot_percentage = (dot_balls / balls_faced * 100) if balls_faced > 0 else 0
         
         # 2. The Verdict Logic (Just for fun/context)
@@ -1245,32 +1117,16 @@ elif analysis_mode == "Head-to-Head Clash":
     st.subheader(f"{batter}'s Performance vs Different Bowlers")
     st.caption("See how this bowler compares to everyone else this batter has faced.(Min 10 balls)")
 
-    # Get stats for this batter against ALL bowlers
-    batter_all = df[df['batter'] == batter]
-    stats_list = []
-
-    for b_name in batter_all['bowler'].unique():
-        b_df = batter_all[batter_all['bowler'] == b_name]
-        runs = b_df['batsman_runs'].sum()
-        balls = len(b_df[b_df['extras_type'] != 'wides'])
-        wickets = len(b_df[b_df['is_wicket'] == 1])
-        
-        if balls > 10: # Filter for meaningful sample size
-            sr = (runs / balls) * 100
-            boundary_balls = len(b_df[b_df['batsman_runs'].isin([4, 6])])
-            boundary_pct = (boundary_balls / balls) * 100
-            wkt_pct = (wickets / balls) * 100
-            
-            stats_list.append({
-                'Bowler': b_name,
-                'Balls Faced': balls,
-                'Strike Rate': sr,
-                'Boundary %': boundary_pct,
-                'Wicket %': wkt_pct,
-                'Color': 'Selected' if b_name == bowler else 'Others'
-            })
-
-    scatter_df = pd.DataFrame(stats_list)
+    # Get stats for this batter against ALL bowlers (more than 10 balls: meaningful sample size)
+    vs_all = cube.matchups.vs_all_bowlers(batter, min_balls=10)
+    scatter_df = pd.DataFrame({
+        'Bowler': vs_all.index,
+        'Balls Faced': vs_all['legal_balls'].to_numpy(),
+        'Strike Rate': vs_all['strike_rate'].to_numpy(),
+        'Boundary %': vs_all['boundary_pct'].to_numpy(),
+        'Wicket %': vs_all['wicket_pct'].to_numpy(),
+        'Color': np.where(vs_all.index == bowler, 'Selected', 'Others')
+    })
 
     if not scatter_df.empty:
         fig_scatter = px.scatter(
@@ -1294,12 +1150,14 @@ elif analysis_mode == "Head-to-Head Clash":
     # CONSISTENCY PLOT ---
     st.subheader("Match-by-Match Consistency")
     
-    # Group by Match ID to separate meetings
-    consistency = h2h.groupby('match_id').apply(lambda x: pd.Series({
-        'SR': (x['batsman_runs'].sum() / len(x) * 100) if len(x) > 0 else 0,
-        'Runs': x['batsman_runs'].sum(),
-        'Balls': len(x)
-    })).reset_index()
+    # One row per match the two met in (every delivery counts as a ball here)
+    meetings = cube.matchups.pair_meetings(batter, bowler)
+    consistency = pd.DataFrame({
+        'match_id': meetings.index,
+        'SR': meetings['batsman_runs'].to_numpy() / meetings['balls'].to_numpy() * 100,
+        'Runs': meetings['batsman_runs'].to_numpy(),
+        'Balls': meetings['balls'].to_numpy()
+    })
 
     # Just creating a sequential match number for the X-axis
     consistency['Match_Seq'] = range(1, len(consistency) + 1)
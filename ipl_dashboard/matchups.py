@@ -0,0 +1,65 @@
+import numpy as np
+
+PAIR_KEYS = ['batter', 'bowler']
+
+# Measures of the aggregate cube (aggregates.MEASURES) a matchup needs
+MATCHUP_MEASURES = ['balls', 'batsman_runs', 'legal_balls', 'n0', 'n4', 'n6', 'wickets']
+
+
+def _rates(table):
+    """Per-100-legal-balls rates of a matchup table; 0 where no legal ball was faced."""
+    legal = table['legal_balls'].to_numpy()
+    per_ball = 100 / np.where(legal > 0, legal, 1)
+    table['boundaries'] = table['n4'] + table['n6']
+    table['strike_rate'] = np.where(legal > 0, table['batsman_runs'] * per_ball, 0.0)
+    table['boundary_pct'] = np.where(legal > 0, table['boundaries'] * per_ball, 0.0)
+    table['wicket_pct'] = np.where(legal > 0, table['wickets'] * per_ball, 0.0)
+    return table
+
+
+class MatchupTable:
+    """Every batter x bowler matchup, aggregated once from the cube rows.
+
+    pairs    -- MATCHUP_MEASURES and rates per (batter, bowler), bowlers in order of first meeting
+    meetings -- MATCHUP_MEASURES per (batter, bowler, match), matches in match_id order
+    Lookups go through cached positions, nothing is rescanned per query.
+    """
+
+    def __init__(self, cube, deliveries):
+        self.pairs = _rates(cube.groupby(PAIR_KEYS, sort=False)[MATCHUP_MEASURES].sum())
+        self.meetings = cube.groupby(PAIR_KEYS + ['match_id'])[MATCHUP_MEASURES].sum()
+
+        self._batter_rows = self.pairs.groupby(level='batter', sort=False).indices
+        self._meeting_rows = self.meetings.groupby(level=PAIR_KEYS, sort=False).indices
+        self._delivery_rows = deliveries.groupby(PAIR_KEYS, sort=False).indices
+        self._deliveries = deliveries
+
+    def batters(self):
+        return sorted(self._batter_rows)
+
+    def vs_all_bowlers(self, batter, min_balls=None):
+        """One row per bowler who bowled to the batter, wide-only matchups included.
+
+        With `min_balls`, only bowlers the batter faced more than `min_balls` legal balls from.
+        """
+        rows = self.pairs.iloc[self._batter_rows.get(batter, [])].droplevel('batter')
+        if min_balls is None:
+            return rows
+        return rows[rows['legal_balls'] > min_balls]
+
+    def bowlers_faced(self, batter):
+        return self.vs_all_bowlers(batter).index
+
+    def pair(self, batter, bowler):
+        """Totals of one matchup, None if the two never met."""
+        if (batter, bowler) not in self._delivery_rows:
+            return None
+        return self.pairs.loc[(batter, bowler)]
+
+    def pair_meetings(self, batter, bowler):
+        rows = self.meetings.iloc[self._meeting_rows.get((batter, bowler), [])]
+        return rows.droplevel(PAIR_KEYS)
+
+    def pair_deliveries(self, batter, bowler):
+        """The matchup's deliveries, in file order."""
+        return self._deliveries.iloc[self._delivery_rows.get((batter, bowler), [])]
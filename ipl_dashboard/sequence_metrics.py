@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+# A player's innings/spell: the sequences below never run across these boundaries
+INNINGS_KEYS = ['match_id', 'inning']
+BALL_ORDER = ['over', 'ball']
+
+
+def _in_sequence_order(df, player):
+    """Rows sorted by player, innings and ball, with a flag on the first ball of each innings."""
+    ordered = df.sort_values([player] + INNINGS_KEYS + BALL_ORDER, kind='mergesort')
+    keys = ordered[[player] + INNINGS_KEYS]
+    first = (keys != keys.shift()).any(axis=1).to_numpy()
+    return ordered, first
+
+
+def _innings_start(first):
+    """Position of the first ball of the innings each row belongs to."""
+    idx = np.arange(len(first))
+    return np.maximum.accumulate(np.where(first, idx, 0))
+
+
+def frustration_index(deliveries, player='batter'):
+    """Average run of consecutive dots faced immediately before each boundary, per batter.
+
+    Legal balls only (wides excluded); a 1, 2, 3 or 5 ends the run without counting, and a new
+    innings starts a new run. Batters who never hit a boundary get 0.
+    """
+    legal = deliveries[deliveries['extras_type'] != 'wides']
+    ordered, first = _in_sequence_order(legal[[player, 'batsman_runs'] + INNINGS_KEYS + BALL_ORDER], player)
+    runs = ordered['batsman_runs'].to_numpy()
+    idx = np.arange(len(runs))
+
+    # dots are counted from the ball after the last scoring shot, or from the start of the innings
+    count_from = np.where(runs != 0, idx + 1, 0)
+    count_from = np.concatenate([[0], np.maximum.accumulate(count_from)[:-1]])
+    count_from = np.maximum(count_from, _innings_start(first))
+    dots_before = idx - count_from
+
+    boundary = np.isin(runs, [4, 6])
+    per_boundary = pd.Series(dots_before[boundary], index=ordered[player].to_numpy()[boundary])
+    index = per_boundary.groupby(level=0, sort=False).mean()
+    return index.reindex(deliveries[player].unique(), fill_value=0)
+
+
+def setup_index(deliveries, player='bowler', window=6, runs='runs_conceded'):
+    """Average number of dots in the `window` deliveries before each wicket, per bowler.
+
+    All deliveries count (wides and no-balls too); a dot is a ball with nothing charged to the bowler
+    (`runs` column, see aggregates.add_delivery_measures). The window stops at the start of the innings.
+    Bowlers without a wicket get 0.
+    """
+    ordered, first = _in_sequence_order(deliveries[[player, runs, 'is_wicket'] + INNINGS_KEYS + BALL_ORDER], player)
+    dots = (ordered[runs].to_numpy() == 0).astype(np.int64)
+    idx = np.arange(len(dots))
+
+    # dots in [start, i) from a running total
+    dot_total = np.concatenate([[0], np.cumsum(dots)])
+    start = np.maximum(idx - window, _innings_start(first))
+    dots_before = dot_total[idx] - dot_total[start]
+
+    wicket = ordered['is_wicket'].to_numpy() == 1
+    per_wicket = pd.Series(dots_before[wicket], index=ordered[player].to_numpy()[wicket])
+    index = per_wicket.groupby(level=0, sort=False).mean()
+    return index.reindex(deliveries[player].unique(), fill_value=0)
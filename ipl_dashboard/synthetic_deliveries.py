@@ -0,0 +1,292 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from deliveries_store import COUNT_DTYPES, convert_deliveries
+
+# Written here by default, so a generated file never replaces the real deliveries.csv
+SYNTHETIC_DIR = './ipl_dashboard/synthetic'
+
+COLUMNS = ['match_id', 'inning', 'batting_team', 'bowling_team', 'over', 'ball', 'batter', 'bowler',
+           'non_striker', 'batsman_runs', 'extra_runs', 'total_runs', 'extras_type', 'is_wicket',
+           'player_dismissed', 'dismissal_kind', 'fielder']
+
+FIRST_MATCH_ID = 100001
+OVERS = 20
+
+# Roles of the player pool and their share of it
+ROLES = ['keeper', 'batter', 'allrounder', 'bowler']
+ROLE_SHARE = [0.08, 0.34, 0.22, 0.36]
+# Squad per team and season, and the XI picked from it (batting order: keeper and batters,
+# allrounders, bowlers; the last five bowl four overs each)
+SQUAD = {'keeper': 2, 'batter': 8, 'allrounder': 6, 'bowler': 9}
+XI = {'keeper': 1, 'batter': 5, 'allrounder': 2, 'bowler': 3}
+# Bowler (0-4) of each over: four overs each, never two in a row
+BOWLING_ROTATION = np.array([0, 1, 0, 1, 2, 3, 2, 3, 4, 2, 4, 3, 0, 4, 1, 4, 0, 1, 2, 3])
+
+# Runs off the bat (0, 1, 2, 3, 4, 5, 6) of a ball per phase, about 8 / 7.5 / 10 an over with extras
+RUNS = np.arange(7)
+PHASE_RUNS = np.array([
+    [0.46, 0.28, 0.06, 0.005, 0.14, 0.0005, 0.05],   # Powerplay, overs 0-5
+    [0.36, 0.43, 0.08, 0.004, 0.075, 0.0005, 0.045],  # Middle, overs 6-15
+    [0.30, 0.37, 0.09, 0.004, 0.12, 0.0005, 0.10],   # Death, overs 16-19
+])
+PHASE_WICKET = np.array([0.045, 0.05, 0.09])
+
+EXTRAS = ['wides', 'noballs', 'legbyes', 'byes']
+EXTRAS_P = [0.032, 0.004, 0.018, 0.004]
+# byes / leg byes: 1, 2 or 4 runs; 4% of wides beat the keeper for 4 more
+BYE_RUNS, BYE_P = [1, 2, 4], [0.8, 0.08, 0.12]
+WIDE_BOUNDARY = 0.04
+
+DISMISSALS = ['caught', 'bowled', 'lbw', 'run out', 'stumped', 'caught and bowled', 'hit wicket']
+DISMISSAL_P = [0.60, 0.16, 0.09, 0.09, 0.03, 0.02, 0.01]
+
+CITIES = ['Mumbai', 'Chennai', 'Kolkata', 'Delhi', 'Punjab', 'Rajasthan', 'Bangalore', 'Hyderabad',
+          'Lucknow', 'Gujarat', 'Pune', 'Kochi', 'Indore', 'Nagpur', 'Ranchi', 'Guwahati']
+NICKNAMES = ['Kings', 'Royals', 'Knights', 'Titans', 'Chargers', 'Warriors', 'Strikers', 'Giants']
+SURNAME_STARTS = ['Sha', 'Ku', 'Pa', 'Ra', 'Ja', 'Ve', 'Mi', 'Go', 'Bha', 'Na', 'Su', 'De', 'Chau',
+                  'Ya', 'Tha', 'Ba', 'Ka', 'Sa', 'Ma', 'Ha']
+SURNAME_ENDS = ['rma', 'mar', 'tel', 'hul', 'deja', 'nkat', 'shra', 'swami', 'ndari', 'ir', 'ndar',
+                'sai', 'dhary', 'dav', 'kur']
+
+
+def player_names(n):
+    """Unique 'V Kohli' style names: initial and two syllables, a number once those run out."""
+    capacity = 26 * len(SURNAME_STARTS) * len(SURNAME_ENDS)
+    names = []
+    for i in range(n):
+        initial, rest = chr(ord('A') + i % 26), i // 26
+        start, end = rest % len(SURNAME_STARTS), rest // len(SURNAME_STARTS) % len(SURNAME_ENDS)
+        suffix = str(i // capacity) if i >= capacity else ''
+        names.append('{} {}{}{}'.format(initial, SURNAME_STARTS[start], SURNAME_ENDS[end], suffix))
+    return names
+
+
+def team_names(n):
+    return ['{} {}'.format(CITIES[i % len(CITIES)], NICKNAMES[i // len(CITIES) % len(NICKNAMES)])
+            for i in range(n)]
+
+
+def player_pool(n_players, rng):
+    """Role and skill multipliers of every player.
+
+    aggression scales boundary odds, solidity divides wicket odds (batting); economy scales the
+    boundary odds and threat the wicket odds of the balls a player bowls.
+    """
+    role = rng.choice(len(ROLES), n_players, p=ROLE_SHARE)
+    bats = np.isin(role, [0, 1])
+    bowls = role == 3
+    return pd.DataFrame({
+        'name': player_names(n_players),
+        'role': np.array(ROLES)[role],
+        'aggression': rng.lognormal(np.select([bats, bowls], [0.05, -0.5], -0.1), 0.2),
+        'solidity': rng.lognormal(np.select([bats, bowls], [0.0, -0.8], -0.25), 0.25),
+        'economy': rng.lognormal(np.select([bats, bowls], [0.3, 0.0], 0.1), 0.12),
+        'threat': rng.lognormal(np.select([bats, bowls], [-0.4, 0.0], -0.15), 0.2),
+    })
+
+
+def season_squads(players, n_teams, rng):
+    """Player ids of every team's squad for one season, dealt role by role from a shuffled pool."""
+    squads = [[] for _ in range(n_teams)]
+    for role, size in SQUAD.items():
+        ids = rng.permutation(np.flatnonzero(players['role'].to_numpy() == role))
+        if len(ids) == 0:
+            ids = rng.permutation(len(players))
+        # a pool too small for every squad shares players between teams
+        for t in range(n_teams):
+            squads[t].append(np.resize(np.roll(ids, -t * size), size))
+    return [dict(zip(SQUAD, role_ids)) for role_ids in squads]
+
+
+def pick_xi(squad, rng):
+    """(batting order, position of the keeper): keeper and batters shuffled, allrounders, bowlers."""
+    top = np.concatenate([rng.choice(squad['keeper'], XI['keeper'], replace=False),
+                          rng.choice(squad['batter'], XI['batter'], replace=False)])
+    order = rng.permutation(len(top))
+    xi = np.concatenate([top[order],
+                         rng.choice(squad['allrounder'], XI['allrounder'], replace=False),
+                         rng.choice(squad['bowler'], XI['bowler'], replace=False)])
+    return xi, int(np.flatnonzero(order == 0)[0])
+
+
+def fixtures(players, n_matches, n_teams, matches_per_season, rng):
+    """Teams, XIs (player ids, batting order) and keeper positions of every match, batting side first."""
+    teams = np.empty((n_matches, 2), dtype=np.int64)
+    xis = np.empty((n_matches, 2, 11), dtype=np.int64)
+    keepers = np.empty((n_matches, 2), dtype=np.int64)
+    for m in range(n_matches):
+        if m % matches_per_season == 0:
+            squads = season_squads(players, n_teams, rng)
+        teams[m] = rng.choice(n_teams, 2, replace=False)
+        for side in range(2):
+            xis[m, side], keepers[m, side] = pick_xi(squads[teams[m, side]], rng)
+    return teams, xis, keepers
+
+
+def _sample(p, rng):
+    """One index per row of a probability matrix."""
+    cumulative = np.cumsum(p, axis=1)
+    u = rng.random(len(p))[:, None] * cumulative[:, -1:]
+    return np.minimum((u > cumulative).sum(axis=1), p.shape[1] - 1)
+
+
+def simulate_innings(players, bat_xi, bowl_xi, keeper, rng, target=None):
+    """Every delivery of one innings of all matches, simulated in lockstep (one step = one delivery
+    of every match still batting). Players are batting order positions, mapped to names later.
+    """
+    n = len(bat_xi)
+    rows = np.arange(n)
+    aggression = players['aggression'].to_numpy()[bat_xi]
+    solidity = players['solidity'].to_numpy()[bat_xi]
+    economy = players['economy'].to_numpy()[bowl_xi]
+    threat = players['threat'].to_numpy()[bowl_xi]
+    # bowling XI positions 6-10 bowl, in a per match order of the rotation
+    bowlers = 6 + np.argsort(rng.random((n, 5)), axis=1)[:, BOWLING_ROTATION]
+
+    score = np.zeros(n, dtype=np.int64)
+    wickets = np.zeros(n, dtype=np.int64)
+    striker, non_striker, next_in = np.zeros(n, dtype=np.int64), np.ones(n, dtype=np.int64), np.full(n, 2)
+    done = np.zeros(n, dtype=bool)
+    steps = []
+
+    for over in range(OVERS):
+        phase = 0 if over < 6 else 1 if over < 16 else 2
+        legal = np.zeros(n, dtype=np.int64)
+        ball = 0
+        while True:
+            live = rows[~done & (legal < 6)]
+            if len(live) == 0:
+                break
+            ball += 1
+            k = len(live)
+            bat, bowl = striker[live], bowlers[live, over]
+
+            extras = _sample(np.tile(EXTRAS_P + [1 - sum(EXTRAS_P)], (k, 1)), rng)
+            wide, no_ball, bye = extras == 0, extras == 1, (extras == 2) | (extras == 3)
+            fair = extras == 4
+
+            factor = aggression[live, bat] * economy[live, bowl]
+            weights = PHASE_RUNS[phase] * np.stack([factor ** -0.5, *[np.ones(k)] * 3, factor,
+                                                    np.ones(k), factor ** 1.3], axis=1)
+            batsman_runs = np.where(fair | no_ball, RUNS[_sample(weights, rng)], 0)
+            extra_runs = np.select(
+                [wide, no_ball, bye],
+                [1 + 4 * (rng.random(k) < WIDE_BOUNDARY), 1, rng.choice(BYE_RUNS, k, p=BYE_P)], 0)
+
+            p_wicket = np.minimum(PHASE_WICKET[phase] * threat[live, bowl] / solidity[live, bat], 0.3)
+            wicket = fair & (rng.random(k) < p_wicket)
+            batsman_runs[wicket] = 0
+            kind = np.where(wicket, rng.choice(len(DISMISSALS), k, p=DISMISSAL_P), -1)
+            run_out = kind == DISMISSALS.index('run out')
+            dismissed = np.where(wicket, np.where(run_out & (rng.random(k) < 0.5), non_striker[live], bat), -1)
+            # catches by anyone but the bowler, run outs by anyone, stumpings by the keeper
+            fielder = np.select(
+                [kind == DISMISSALS.index('caught'), run_out, kind == DISMISSALS.index('stumped')],
+                [(bowl + 1 + rng.integers(0, 10, k)) % 11, rng.integers(0, 11, k), keeper[live]], -1)
+
+            steps.append((live, np.full(k, over), np.full(k, ball), bat, non_striker[live], bowl,
+                          batsman_runs, extra_runs, np.where(fair, -1, extras), wicket, dismissed,
+                          kind, fielder))
+
+            score[live] += batsman_runs + extra_runs
+            legal[live] += ~(wide | no_ball)
+            ran = batsman_runs + np.where(bye, extra_runs, 0) + np.where(wide, extra_runs - 1, 0)
+            swap = live[ran % 2 == 1]
+            striker[swap], non_striker[swap] = non_striker[swap], striker[swap]
+
+            out = live[wicket]
+            wickets[out] += 1
+            striker_out = dismissed[wicket] == striker[out]
+            striker[out[striker_out]] = next_in[out[striker_out]]
+            non_striker[out[~striker_out]] = next_in[out[~striker_out]]
+            next_in[out] += 1
+
+            done |= wickets >= 10
+            if target is not None:
+                done |= score > target
+
+        changed = rows[~done]
+        striker[changed], non_striker[changed] = non_striker[changed], striker[changed]
+        if done.all():
+            break
+
+    columns = [np.concatenate(c) for c in zip(*steps)]
+    order = np.argsort(columns[0], kind='stable')
+    return [c[order] for c in columns], score
+
+
+def generate_deliveries(n_matches=740, n_players=600, n_teams=10, matches_per_season=74, seed=0):
+    """deliveries.csv style frame of n_matches simulated T20 matches (about 240 rows each).
+
+    Defaults are about ten seasons of a ten team league; n_players sets the pool the season
+    squads are dealt from, so larger pools spread the same balls over more players.
+    """
+    if n_players < 11 * n_teams:
+        raise ValueError('at least 11 players per team are needed, got {} for {} teams'.format(n_players, n_teams))
+    rng = np.random.default_rng(seed)
+    players = player_pool(n_players, rng)
+    teams, xis, keepers = fixtures(players, n_matches, n_teams, matches_per_season, rng)
+    names = np.array(players['name'].tolist() + [None], dtype=object)
+    team = np.array(team_names(n_teams), dtype=object)
+    extras_type = np.array(EXTRAS + [None], dtype=object)
+    dismissal_kind = np.array(DISMISSALS + [None], dtype=object)
+
+    frames = []
+    target = None
+    for inning, bat in ((1, 0), (2, 1)):
+        bowl = 1 - bat
+        bat_xi, bowl_xi = xis[:, bat], xis[:, bowl]
+        (match, over, ball, striker, non_striker, bowler, batsman_runs, extra_runs, extras, wicket,
+         dismissed, kind, fielder), score = simulate_innings(players, bat_xi, bowl_xi, keepers[:, bowl],
+                                                             rng, target)
+        target = score
+        # position -1 (nobody) maps to the None entry after the last player / value
+        bat_ids = np.append(bat_xi[match], np.full((len(match), 1), -1), axis=1)
+        bowl_ids = np.append(bowl_xi[match], np.full((len(match), 1), -1), axis=1)
+        frames.append(pd.DataFrame({
+            'match_id': FIRST_MATCH_ID + match,
+            'inning': inning,
+            'batting_team': team[teams[match, bat]],
+            'bowling_team': team[teams[match, bowl]],
+            'over': over,
+            'ball': ball,
+            'batter': names[bat_xi[match, striker]],
+            'bowler': names[bowl_xi[match, bowler]],
+            'non_striker': names[bat_xi[match, non_striker]],
+            'batsman_runs': batsman_runs,
+            'extra_runs': extra_runs,
+            'total_runs': batsman_runs + extra_runs,
+            'extras_type': extras_type[extras],
+            'is_wicket': wicket.astype(np.int64),
+            'player_dismissed': names[bat_ids[np.arange(len(match)), dismissed]],
+            'dismissal_kind': dismissal_kind[kind],
+            'fielder': names[bowl_ids[np.arange(len(match)), fielder]],
+        }))
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df.sort_values(['match_id', 'inning'], kind='stable', ignore_index=True)
+    return df.astype(COUNT_DTYPES)[COLUMNS]
+
+
+def write_deliveries(df, out_dir=SYNTHETIC_DIR, parquet=False):
+    """deliveries.csv (and the typed parquet copy the dashboard reads first) in out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    csv_path = os.path.join(out_dir, 'deliveries.csv')
+    df.to_csv(csv_path, index=False)
+    if parquet:
+        convert_deliveries(csv_path, os.path.join(out_dir, 'deliveries.parquet'))
+    return csv_path
+
+
+if __name__ == "__main__":
+    # python ipl_dashboard/synthetic_deliveries.py [out dir] [--matches=N] [--players=N] [--teams=N]
+    #                                              [--season=N] [--seed=N] [--parquet]
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    options = dict((a[2:].split('=') + [''])[:2] for a in sys.argv[1:] if a.startswith('--'))
+    df = generate_deliveries(int(options.get('matches', 740)), int(options.get('players', 600)),
+                             int(options.get('teams', 10)), int(options.get('season', 74)),
+                             int(options.get('seed', 0)))
+    path = write_deliveries(df, args[0] if args else SYNTHETIC_DIR, 'parquet' in options)
+    print('Written {} deliveries of {} matches to {}'.format(len(df), df['match_id'].nunique(), path))